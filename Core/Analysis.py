@@ -0,0 +1,140 @@
+from builtins import object
+import logging
+
+from Core import Machine
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+class Analysis(object):
+    """ Static checks of a machine definition for models starting in ``initial``, see ``Machine.analyze``.
+
+        A transition never fires when its source is unreachable, when it requires a condition to be both true
+        and false, or when an earlier candidate of the same trigger and source has a subset of its conditions:
+        whenever the later one could pass, the earlier one passes first. Conditions are assumed to be free of
+        side effects. An event is dead when none of its transitions can fire. Everything runs in one pass over
+        the states and transitions. """
+
+    __slots__ = 'machine', 'initial', 'reachable', 'dead', 'duplicates', 'shadowed', 'unsatisfiable'
+
+    def __init__(self, machine: Machine, initial: str=None):
+        self.machine = machine
+        self.initial = machine._start(initial)
+        self.reachable = self._reach(self.initial)
+        # ids of the transitions that never fire
+        self.dead = set()
+        self.duplicates = []
+        self.shadowed = []
+        self.unsatisfiable = []
+        for name, event in machine.events.items():
+            for source, transitions in event.transitions.items():
+                if source not in self.reachable:
+                    self.dead.update(id(t) for t in transitions)
+                    continue
+                self._check(name, transitions)
+
+    def _reach(self, start):
+        """ Names of the states a model can be in, ancestors of its state included, ignoring conditions. """
+        states = self.machine.states
+        expand = self.machine._index.expand
+        visited = {start}
+        frontier = [start]
+        reachable = set()
+        while frontier:
+            state = frontier.pop()
+            reachable.update(s.name for s in states[state].lineage)
+            for leaf in expand(state):
+                if leaf not in visited:
+                    visited.add(leaf)
+                    frontier.append(leaf)
+        return reachable
+
+    def _check(self, trigger, transitions):
+        earlier = []
+        for t in transitions:
+            conditions = frozenset((c.func, c.target) for c in t.conditions)
+            if len(set(func for func, _ in conditions)) < len(conditions):
+                self.dead.add(id(t))
+                self.unsatisfiable.append((trigger, t))
+                continue
+            for before, dest in earlier:
+                if before <= conditions:
+                    self.dead.add(id(t))
+                    if before == conditions and dest == t.dest:
+                        self.duplicates.append((trigger, t))
+                    else:
+                        self.shadowed.append((trigger, t))
+                    break
+            else:
+                earlier.append((conditions, t.dest))
+
+    @property
+    def unreachable_states(self) -> list:
+        return [name for name in self.machine.states if name not in self.reachable]
+
+    @property
+    def dead_events(self) -> list:
+        dead = self.dead
+        return [name for name, event in self.machine.events.items()
+                if all(id(t) in dead for ts in event.transitions.values() for t in ts)]
+
+    @staticmethod
+    def _describe(trigger, t):
+        return {'trigger': trigger, 'source': t.source, 'dest': t.dest,
+                'conditions': [c.func for c in t.conditions if c.target],
+                'unless': [c.func for c in t.conditions if not c.target]}
+
+    def report(self) -> dict:
+        return {'initial': self.initial,
+                'unreachable_states': self.unreachable_states,
+                'dead_events': self.dead_events,
+                'duplicate_transitions': [self._describe(*d) for d in self.duplicates],
+                'shadowed_transitions': [self._describe(*s) for s in self.shadowed],
+                'unsatisfiable_transitions': [self._describe(*u) for u in self.unsatisfiable]}
+
+    def optimize(self, **kwargs):
+        """ The spec of the machine without unreachable states and without transitions shadowed or duplicated
+            by an earlier candidate, built into a new machine of the same class; transitions with equal
+            conditions share one condition list. Every event is kept, so triggers that can't fire still
+            return False or raise as on the original machine. """
+        machine = self.machine
+        spec = machine.get_spec()
+        spec['initial'] = self.initial
+        spec['states'] = self._prune(spec['states'], '')
+        redundant = set(id(t) for _, t in self.duplicates + self.shadowed)
+        transitions = [machine._transition_spec(name, t) for name, event in machine.events.items()
+                       for source, ts in event.transitions.items() if source in self.reachable
+                       for t in ts if id(t) not in redundant]
+        spec['transitions'] = transitions
+
+        optimized = machine.__class__.from_spec(spec, **kwargs)
+        missing = [name for name in machine.events if name not in optimized.events]
+        for name in missing:
+            optimized._add_event(name)
+        if missing:
+            optimized._invalidate()
+        shared = {}
+        for event in optimized.events.values():
+            for ts in event.transitions.values():
+                for t in ts:
+                    if t.conditions:
+                        key = tuple((c.func, c.target) for c in t.conditions)
+                        t.conditions = shared.setdefault(key, t.conditions)
+        if logger.isEnabledFor(logging.INFO):
+            total = sum(len(ts) for event in machine.events.values() for ts in event.transitions.values())
+            logger.info("%sOptimized machine: %d of %d states and %d of %d transitions kept.", machine.id,
+                        len(optimized.states), len(machine.states), len(transitions), total)
+        return optimized
+
+    def _prune(self, specs, prefix):
+        kept = []
+        for spec in specs:
+            name = prefix + (spec['name'] if isinstance(spec, dict) else spec)
+            if name not in self.reachable:
+                continue
+            if isinstance(spec, dict) and 'children' in spec:
+                separator = self.machine.states[name].separator
+                spec = dict(spec, children=self._prune(spec['children'], name + separator))
+            kept.append(spec)
+        return kept
@@ -0,0 +1,207 @@
+from functools import partial
+
+import asyncio
+import inspect
+import logging
+
+from Core import EventData
+from Core.Condition import Condition
+from Core.Event import Event
+from Core.Machine import Machine, MachineError
+from Core.State import State
+from Core.Transition import Transition
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+async def _await(result):
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
+class AsyncCondition(Condition):
+
+    async def check(self, event_data: EventData):
+        if isinstance(self.func, str):
+            model = event_data.model
+            method = event_data.machine._resolve(model, self.func)
+            predicate = partial(method, model) if method is not None else getattr(model, self.func)
+        else:
+            predicate = self.func
+
+        if event_data.machine.send_event:
+            return await _await(predicate(event_data)) == self.target
+        else:
+            return await _await(predicate()) == self.target
+
+
+class AsyncState(State):
+
+    async def enter(self, event_data: EventData):
+        logger.debug("%sEntering state %s. Processing callbacks...", event_data.machine.id, self.name)
+        if self.timeout:
+            event_data.machine.scheduler.schedule(event_data.model, self)
+        for oe in self.on_enter:
+            await event_data.machine._callback(oe, event_data)
+        logger.info("%sEntered state %s", event_data.machine.id, self.name)
+
+    async def exit(self, event_data: EventData):
+        logger.debug("%sExiting state %s. Processing callbacks...", event_data.machine.id, self.name)
+        if self.timeout:
+            event_data.machine.scheduler.cancel(event_data.model, self)
+        for oe in self.on_exit:
+            await event_data.machine._callback(oe, event_data)
+        logger.info("%sExited state %s", event_data.machine.id, self.name)
+
+
+class AsyncTransition(Transition):
+
+    condition_cls = AsyncCondition
+
+    async def execute(self, event_data: EventData):
+        logger.debug("%sInitiating transition from state %s to state %s...",
+                     event_data.machine.id, self.source, self.dest)
+
+        for c in self.conditions:
+            if not await c.check(event_data):
+                logger.debug("%sTransition condition failed: %s() does not " +
+                             "return %s. Transition halted.", event_data.machine.id, c.func, c.target)
+                return False
+        await self._change_state(event_data)
+        return True
+
+    async def _change_state(self, event_data: EventData):
+        machine = event_data.machine
+        if machine._hierarchy is not None:
+            exits, enters = machine._hierarchy.route(event_data.state.name, self.dest)
+        else:
+            exits, enters = (machine.get_state(self.source),), (machine.get_state(self.dest),)
+        for state in exits:
+            await state.exit(event_data)
+        event_data.model.state = enters[-1].name
+        event_data.update(event_data.model)
+        for state in enters:
+            await state.enter(event_data)
+
+
+class AsyncEvent(Event):
+
+    async def trigger(self, model, *args, **kwargs):
+        f = partial(self._trigger, model, *args, **kwargs)
+        return await self.machine._process(model, f)
+
+    async def _trigger(self, model, *args, **kwargs) -> bool:
+        state = self.machine.get_state(model.state)
+        transitions = self.candidates(state)
+        if not transitions:
+            msg = "{}Can't trigger event {} from state {}!".format(self.machine.id, self.name, state.name)
+            if state.ignore_invalid_triggers:
+                logger.warning(msg)
+                return False
+            else:
+                raise MachineError(msg)
+        event = EventData.EventData(state, self, self.machine, model)
+        event.args = args
+        event.kwargs = kwargs
+        for t in transitions:
+            if await t.execute(event):
+                if self.machine._journal is not None:
+                    self.machine._journal.record(model, self.name, state.name, model.state)
+                return True
+        return False
+
+
+class AsyncMachine(Machine):
+    """ Machine whose triggers are coroutines. Conditions and state callbacks may be coroutine functions and
+        are awaited. Every model has its own lock, so independent models progress concurrently on the event
+        loop while the triggers of one model run one after the other in arrival order. A trigger fired from
+        a callback of the same model runs immediately, as it would on a synchronous Machine. """
+
+    __slots__ = '_model_locks', '_model_owners'
+
+    scheduler_driver = 'asyncio'
+
+    def __init__(self, *args, **kwargs):
+        self._model_locks = {}
+        self._model_owners = {}
+        super(AsyncMachine, self).__init__(*args, **kwargs)
+        # the queue, the compiled table and the store's bulk path call callbacks without awaiting them, and
+        # conditions are awaited one by one, without memos or reordering
+        for option, enabled in (('queued', self._queued), ('compiled', self._compiled),
+                                ('state_store', self._store is not None),
+                                ('memoize_conditions', self.memoize_conditions),
+                                ('adaptive_conditions', self.adaptive_conditions)):
+            if enabled:
+                raise ValueError("AsyncMachine awaits every callback on its own path, {} is not supported."
+                                 .format(option))
+
+    _pickle_blacklist = Machine._pickle_blacklist + ['_model_locks', '_model_owners']
+
+    def __setstate__(self, state):
+        self._model_locks = {}
+        self._model_owners = {}
+        super(AsyncMachine, self).__setstate__(state)
+
+    @staticmethod
+    def _create_transition(*args, **kwargs):
+        return AsyncTransition(*args, **kwargs)
+
+    @staticmethod
+    def _create_event(*args, **kwargs):
+        return AsyncEvent(*args, **kwargs)
+
+    @staticmethod
+    def _create_state(*args, **kwargs):
+        return AsyncState(*args, **kwargs)
+
+    def compile(self):
+        raise ValueError("AsyncMachine awaits every callback on its own path, compiled is not supported.")
+
+    def dispatch_many(self, trigger: str, models: (list or object)=None):
+        raise ValueError("AsyncMachine can't fire triggers synchronously, await dispatch instead.")
+
+    def instrument(self, enabled: bool=True):
+        if enabled:
+            raise ValueError("AsyncMachine triggers can't be timed by Instruments.")
+        return super(AsyncMachine, self).instrument(False)
+
+    def remove_model(self, model):
+        super(AsyncMachine, self).remove_model(model)
+        for m in model if isinstance(model, (list, tuple)) else [model]:
+            self._model_locks.pop(id(m), None)
+
+    async def _callback(self, func: callable, event_data: EventData):
+        if isinstance(func, str):
+            model = event_data.model
+            method = self._resolve(model, func)
+            func = partial(method, model) if method is not None else getattr(model, func)
+
+        if self.send_event:
+            await _await(func(event_data))
+        else:
+            await _await(func(*event_data.args, **event_data.kwargs))
+
+    async def _process(self, model, trigger):
+        key = id(model)
+        task = asyncio.current_task()
+        if self._model_owners.get(key) is task:
+            return await trigger()
+
+        lock = self._model_locks.get(key)
+        if lock is None:
+            lock = self._model_locks[key] = asyncio.Lock()
+        async with lock:
+            self._model_owners[key] = task
+            try:
+                return await trigger()
+            finally:
+                del self._model_owners[key]
+
+    async def dispatch(self, trigger: str, *args, **kwargs):
+        """ Fire ``trigger`` on all models concurrently and return their results in model order. """
+        if trigger not in self.events:
+            raise MachineError('Event "{}" is not registered.'.format(trigger))
+        event = self.events[trigger]
+        return await asyncio.gather(*[event.trigger(model, *args, **kwargs) for model in self.models])
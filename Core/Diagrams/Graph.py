@@ -1,9 +1,20 @@
 from Core import Machine
 from Core.Diagrams.Diagram import Diagram
-try:
-    import pygraphviz as pgv
-except:
-    pgv = None
+
+# pygraphviz is imported on the first graph, see _pgv
+pgv = None
+
+
+def _pgv():
+    global pgv
+    if pgv is None:
+        try:
+            import pygraphviz
+        except ImportError:
+            raise ImportError('Graph diagrams require pygraphviz. Core.Diagrams.Markup writes DOT, Mermaid and '
+                              'JSON without it.')
+        pgv = pygraphviz
+    return pgv
 
 
 class Graph(Diagram):
@@ -23,7 +34,9 @@ class Graph(Diagram):
     }
 
     def __init__(self, machine: Machine):
-        self.seen = []
+        self.seen = set()
+        self.drawn = set()
+        self.graph = None
         super(Graph, self).__init__(machine)
 
     def _add_nodes(self, states, container):
@@ -31,14 +44,14 @@ class Graph(Diagram):
         for state in states:
             if state.name in self.seen:
                 continue
-            elif hasattr(state, 'children') and len(state.children) > 0:
-                self.seen.append(state.name)
+            elif state.children:
+                self.seen.add(state.name)
                 sub = container.add_subgraph(name="cluster_" + state.name,\
                                              label=state.name, rank='same', color='black')
                 self._add_nodes(state.children, sub)
             else:
                 shape = self.style_attributes['node']['default']['shape']
-                self.seen.append(state.name)
+                self.seen.add(state.name)
                 container.add_node(n=state.name, shape=shape)
 
     def _add_edges(self, events, container):
@@ -48,22 +61,21 @@ class Graph(Diagram):
             for transitions in event.transitions.items():
                 src = self.machine.get_state(transitions[0])
                 ltail = ''
-                if hasattr(src, 'children') and len(src.children) > 0:
+                if src.children:
                     ltail = 'cluster_' + src.name
-                    src = src.children[0]
-                    while len(src.children) > 0:
-                        src = src.children[0]
+                    src = src.leaf
 
                 for t in transitions[1]:
+                    if t in self.drawn:
+                        continue
+                    self.drawn.add(t)
                     dst = self.machine.get_state(t.dest)
                     edge_label = self._transition_label(label, t)
                     lhead = ''
 
-                    if hasattr(dst, 'children') and len(dst.children) > 0:
+                    if dst.children:
                         lhead = 'cluster_' + dst.name
-                        dst = dst.children[0]
-                        while len(dst.children) > 0:
-                            dst = dst.children[0]
+                        dst = dst.leaf
 
                     if dst.name == src.name and transitions[0] != t.dest:
                         continue
@@ -88,17 +100,23 @@ class Graph(Diagram):
         return edge_label
 
     def get_graph(self, title=False):
+        """ The graph of the machine. It is built on the first call; later calls only add the states and
+            transitions the machine gained since. """
         if title is False:
             title = ''
 
-        fsm_graph = pgv.AGraph(label=title, compound=True, **self.machine_attributes)
-        fsm_graph.node_attr.update(self.style_attributes['node']['default'])
+        fsm_graph = self.graph
+        if fsm_graph is None:
+            fsm_graph = _pgv().AGraph(label=title, compound=True, **self.machine_attributes)
+            fsm_graph.node_attr.update(self.style_attributes['node']['default'])
+            setattr(fsm_graph, 'style_attributes', self.style_attributes)  # setting style_attributes to class field
+            self.graph = fsm_graph
+        elif fsm_graph.graph_attr.get('label') != title:
+            fsm_graph.graph_attr['label'] = title
 
         self._add_nodes(self.machine.states, fsm_graph)
 
         self._add_edges(self.machine.events, fsm_graph)
 
-        setattr(fsm_graph, 'style_attributes', self.style_attributes)  # setting style_attributes to class field
-
         return fsm_graph
 
@@ -5,71 +5,114 @@ from Core.Diagrams.TransitionGraphSupport import TransitionGraphSupport
 
 from Core.Diagrams.Graph import Graph
 from Core.Machine import Machine
+from StaticMethod import listify
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
 
 class GraphMachine(Machine):
-    _pickle_blacklist = ['graph']
+    """ Machine with a pygraphviz diagram. The structure of the diagram is built once, when a graph is first
+        requested, and extended in place as states and transitions are added; all models share it. Every model
+        only keeps a highlight overlay (active and previous state, last edge), which a transition replaces in
+        O(1) regardless of the machine's size. ``model.get_graph()`` renders a new graph from the structure
+        with the model's overlay applied; neither the machine nor the model keeps it. """
 
-    def __getstate__(self):
-        return {k: v for k, v in self.__dict__.items() if k not in self._pickle_blacklist}
+    _pickle_blacklist = Machine._pickle_blacklist + ['_diagram', '_overlays']
 
     def __setstate__(self, state):
-        self.__dict__.update(state)
-        for model in self.models:
-            graph = self._get_graph(model, title=self.title)
-            self.set_node_style(graph, model.state, 'active')
+        super(GraphMachine, self).__setstate__(state)
+        self._diagram = None
+        self._stale = True
+        self._overlays = {id(model): self._overlay(model) for model in self.models}
 
     def __init__(self, *args, **kwargs):
         # remove graph config from keywords
         self.title = kwargs.pop('title', 'State Machine')
         self.show_conditions = kwargs.pop('show_conditions', False)
+        self._diagram = None
+        self._stale = True
+        self._overlays = {}
         super(GraphMachine, self).__init__(*args, **kwargs)
 
-        # Create graph at beginning
-        for model in self.models:
-            if hasattr(model, 'get_graph'):
-                raise AttributeError('Model already has a get_graph attribute.')
-            setattr(model, 'get_graph', partial(self._get_graph, model))
-            model.get_graph()
-            self.set_node_state(model.graph, self.initial, 'active')
         # if model is not the machine
         if not hasattr(self, 'get_graph'):
             setattr(self, 'get_graph', self.get_combined_graph)
 
+    def add_model(self, model, initial=None):
+        models = [m for m in listify(model) if id(m) not in self._model_ids]
+        for m in models:
+            if hasattr(m, 'get_graph'):
+                raise AttributeError('Model already has a get_graph attribute.')
+        super(GraphMachine, self).add_model(models, initial)
+        for m in models:
+            setattr(m, 'get_graph', partial(self._get_graph, m))
+            self._overlays[id(m)] = self._overlay(m)
+
+    def remove_model(self, model):
+        super(GraphMachine, self).remove_model(model)
+        for m in listify(model):
+            self._overlays.pop(id(m), None)
+
+    @staticmethod
+    def _overlay(model):
+        return {'nodes': {model.state: 'active'}, 'edges': {}}
+
     def _get_graph(self, model, title=None, force_new=False):
-        if title is None:
-            title = self.title
-        if not hasattr(model, 'graph') or force_new:
-            model.graph = Graph(self).get_graph(title)
-        return model.graph
+        graph = self._render(self._structure(title, force_new))
+        overlay = self._overlays.get(id(model))
+        if overlay is not None:
+            for name, style in overlay['nodes'].items():
+                if graph.has_node(name):
+                    self.set_node_style(graph, name, style)
+            for key, style in overlay['edges'].items():
+                if graph.has_edge(*key):
+                    self.set_edge_style(graph, graph.get_edge(*key), style)
+        return graph
 
     def get_combined_graph(self, title=None, force_new=False):
         logger.info('Returning graph of the first model. In future releases, this ' +
                     'method will return a combined graph of all models.')
+        if not self.models:
+            return self._render(self._structure(title, force_new))
         return self._get_graph(next(iter(self.models)), title, force_new)
 
-    def set_edge_state(self, graph, edge_from, edge_to, state='default'):
-        edge = graph.get_edge(edge_from, edge_to)
+    @staticmethod
+    def _render(structure):
+        # through the DOT source, which keeps the clusters of nested states
+        graph = structure.__class__(string=structure.string())
+        graph.style_attributes = structure.style_attributes
+        return graph
 
-        # Reset all the edges
-        for e in graph.edges_iter():
-            self.set_edge_style(graph, e, 'default')
-        self.set_edge_style(graph, edge, state)
+    def _structure(self, title, force_new):
+        if title is None:
+            title = self.title
+        if self._diagram is None or force_new:
+            self._diagram = Graph(self)
+            self._stale = True
+        if self._stale or self._diagram.graph.graph_attr.get('label') != title:
+            self._diagram.get_graph(title)
+            self._stale = False
+        return self._diagram.graph
+
+    def _highlight(self, model, source, dest):
+        """ Record a transition of ``model`` from ``source`` to ``dest`` in its overlay. """
+        overlay = self._overlays.get(id(model))
+        if overlay is not None:
+            overlay['nodes'] = {source: 'previous', dest: 'active'} if source != dest else {dest: 'active'}
+            overlay['edges'] = {(source, dest): 'previous'}
 
     def add_states(self, *args, **kwargs):
         super(GraphMachine, self).add_states(*args, **kwargs)
-        for model in self.models:
-            if hasattr(model, 'graph'):
-                model.get_graph(force_new=True)
+        self._stale = True
 
     def add_transition(self, *args, **kwargs):
         super(GraphMachine, self).add_transition(*args, **kwargs)
-        for model in self.models:
-            if hasattr(model, 'graph'):
-                model.get_graph(force_new=True)
+        self._stale = True
+
+    def _load(self, states, transitions):
+        super(GraphMachine, self)._load(states, transitions)
+        self._stale = True
 
     def set_node_state(self, graph, node_name, state='default', reset=False):
         if reset:
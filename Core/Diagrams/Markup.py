@@ -0,0 +1,154 @@
+import io
+import json
+import logging
+import re
+
+from Core import Machine
+from Core.Diagrams.Diagram import Diagram
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+_identifier = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+class Markup(Diagram):
+    """ Dependency free diagram backend. Writes the states and transitions of a machine as DOT, Mermaid
+        (``stateDiagram-v2``) or JSON text, streamed line by line from ``machine.states`` and
+        ``machine.events`` to a file-like object, so exporting never holds the whole document in memory.
+        Compound states become DOT clusters and Mermaid composite states. Rendering DOT output is left to
+        Graphviz. """
+
+    formats = ('dot', 'mermaid', 'json')
+
+    style_attributes = {'active': {'color': 'red'}, 'previous': {'color': 'blue'}}
+
+    def __init__(self, machine: Machine, format: str='dot'):
+        if format not in self.formats:
+            raise ValueError("Unknown diagram format {}, expected one of {}.".format(format, ', '.join(self.formats)))
+        self.format = format
+        super(Markup, self).__init__(machine)
+
+    def get_graph(self, title: str=False, model: object=None) -> str:
+        """ The whole diagram as a string; prefer ``write`` for large machines. """
+        stream = io.StringIO()
+        self.write(stream, title, model)
+        return stream.getvalue()
+
+    def write(self, stream, title: str=False, model: object=None):
+        """ Write the diagram to ``stream``. The current state of ``model``, if given, is highlighted. """
+        if title is False:
+            title = getattr(self.machine, 'title', '')
+        active = model.state if model is not None else None
+        getattr(self, '_write_' + self.format)(stream, title or '', active)
+
+    def _transitions(self):
+        for event in self.machine.events.values():
+            for source, transitions in event.transitions.items():
+                for t in transitions:
+                    yield event.name, t
+
+    def _label(self, trigger, transition):
+        label = str(trigger)
+        if getattr(self.machine, 'show_conditions', False) and transition.conditions:
+            label += ' [' + ' & '.join(self._rep(c.func) if c.target else '!' + self._rep(c.func)
+                                       for c in transition.conditions) + ']'
+        return label
+
+    @staticmethod
+    def _rep(f):
+        return f.__name__ if callable(f) else str(f)
+
+    @staticmethod
+    def _quote(text):
+        return '"' + str(text).replace('"', '\\"') + '"'
+
+    def _roots(self):
+        return (state for state in self.machine.states.values() if state.parent is None)
+
+    def _write_dot(self, stream, title, active):
+        stream.write('digraph {\n')
+        stream.write('  label={}; compound=true; rankdir=LR; ratio=0.3;\n'.format(self._quote(title)))
+        stream.write('  node [shape=circle, height=1.2, style=filled, fillcolor=white, color=black];\n')
+        for state in self._roots():
+            self._write_dot_state(stream, state, active, '  ')
+        states = self.machine.states
+        for trigger, t in self._transitions():
+            # edges of compound states end at their initial leaf and are clipped at the cluster
+            source, dest = states[t.source], states[t.dest]
+            attributes = ''
+            if source.children:
+                attributes += ', ltail={}'.format(self._quote('cluster_' + source.name))
+            if dest.children:
+                attributes += ', lhead={}'.format(self._quote('cluster_' + dest.name))
+            stream.write('  {} -> {} [label={}{}];\n'.format(self._quote(source.leaf.name),
+                                                           self._quote(dest.leaf.name),
+                                                           self._quote(self._label(trigger, t)), attributes))
+        stream.write('}\n')
+
+    def _write_dot_state(self, stream, state, active, indent):
+        if state.children:
+            stream.write('{}subgraph {} {{\n'.format(indent, self._quote('cluster_' + state.name)))
+            stream.write('{}  label={}; color=black;\n'.format(indent, self._quote(state.name)))
+            for child in state.children:
+                self._write_dot_state(stream, child, active, indent + '  ')
+            stream.write(indent + '}\n')
+            return
+        attributes = ''
+        if state.name == active:
+            attributes = ' [color={}]'.format(self.style_attributes['active']['color'])
+        elif state.accepting:
+            attributes = ' [shape=doublecircle]'
+        stream.write('{}{}{};\n'.format(indent, self._quote(state.name), attributes))
+
+    def _write_mermaid(self, stream, title, active):
+        if title:
+            stream.write('---\ntitle: {}\n---\n'.format(title))
+        stream.write('stateDiagram-v2\n')
+        ids = {name: str(name) if _identifier.match(str(name)) else 's{}'.format(i)
+               for i, name in enumerate(self.machine.states)}
+        for state in self._roots():
+            self._write_mermaid_state(stream, state, ids, '  ')
+        if self.machine.initial is not None:
+            stream.write('  [*] --> {}\n'.format(ids[self.machine.initial]))
+        for trigger, t in self._transitions():
+            stream.write('  {} --> {} : {}\n'.format(ids[t.source], ids[t.dest],
+                                                     self._label(trigger, t).replace('\n', ' ')))
+        if active is not None:
+            stream.write('  classDef active stroke:{}\n'.format(self.style_attributes['active']['color']))
+            stream.write('  class {} active\n'.format(ids[active]))
+
+    @staticmethod
+    def _write_mermaid_state(stream, state, ids, indent):
+        sid = ids[state.name]
+        if sid != state.name:
+            stream.write('{}state "{}" as {}\n'.format(indent, str(state.name).replace('"', '#quot;'), sid))
+        if state.children:
+            stream.write('{}state {} {{\n'.format(indent, sid))
+            stream.write('{}  [*] --> {}\n'.format(indent, ids[state.initial.name]))
+            for child in state.children:
+                Markup._write_mermaid_state(stream, child, ids, indent + '  ')
+            stream.write(indent + '}\n')
+        elif state.parent is not None and sid == state.name:
+            # a plain child has to be named inside its composite to belong to it
+            stream.write('{}{}\n'.format(indent, sid))
+
+    def _write_json(self, stream, title, active):
+        stream.write('{{"title": {}, "initial": {}, "active": {},\n "states": ['.format(
+            json.dumps(title), json.dumps(self.machine.initial), json.dumps(active)))
+        separator = '\n  '
+        for state in self.machine.states.values():
+            stream.write(separator + json.dumps({'name': state.name,
+                                                 'on_enter': [self._rep(f) for f in state.on_enter],
+                                                 'on_exit': [self._rep(f) for f in state.on_exit],
+                                                 'accepting': state.accepting,
+                                                 'parent': state.parent.name if state.parent else None}))
+            separator = ',\n  '
+        stream.write('],\n "transitions": [')
+        separator = '\n  '
+        for trigger, t in self._transitions():
+            stream.write(separator + json.dumps({'trigger': trigger, 'source': t.source, 'dest': t.dest,
+                                                 'conditions': [{'func': self._rep(c.func), 'target': c.target}
+                                                                for c in t.conditions]}))
+            separator = ',\n  '
+        stream.write(']}\n')
@@ -5,24 +5,10 @@ class TransitionGraphSupport(Transition):
 
     def _change_state(self, event_data):
         machine = event_data.machine
-        model = event_data.model
-        dest = machine.get_state(self.dest)
 
         if self.source is not None:
-            source = machine.get_state(self.source)
-            machine.set_node_state(model.graph, source.name,
-                                   state='previous')
+            # a transition inherited from a compound state fires from the model's current state
+            source = event_data.state if machine._hierarchy is not None else machine.get_state(self.source)
+            machine._highlight(event_data.model, source.name, machine.get_state(self.dest).leaf.name)
 
-            if hasattr(source, 'children'):
-                while len(source.children) > 0:
-                    source = source.children[0]
-                while len(dest.children) > 0:
-                    dest = dest.children[0]
-            if model.graph.has_edge(source.name, dest.name):
-                machine.set_edge_state(model.graph, source.name,
-                                       dest.name, state='previous')
-
-        machine.set_node_state(model.graph, dest.name,
-                               state='active', reset=True)
-
-        super(TransitionGraphSupport, self)._change_state(event_data)
\ No newline at end of file
+        super(TransitionGraphSupport, self)._change_state(event_data)
@@ -13,36 +13,94 @@ logger.addHandler(logging.NullHandler())
 
 
 class Event(object):
-    __slots__ = 'name', 'machine', 'transitions'
+    __slots__ = 'name', 'machine', 'transitions', 'index', '_pool', '_inherited'
 
     def __init__(self, name: str, machine: Machine):
         self.name = name
         self.machine = machine
         self.transitions = defaultdict(list)
+        self.index = None
+        self._pool = []
+        self._inherited = {}
 
     def add_transition(self, transition: Transition):
         self.transitions[transition.source].append(transition)
+        self._inherited.clear()
+
+    def candidates(self, state) -> list:
+        """ Transitions that may fire from ``state``: its own first, then those of its ancestors from the
+            parent up. None if there are none. """
+        if state.parent is None:
+            return self.transitions.get(state.name)
+        candidates = self._inherited.get(state.name)
+        if candidates is None:
+            candidates = [t for s in reversed(state.lineage) for t in self.transitions.get(s.name, ())]
+            self._inherited[state.name] = candidates
+        return candidates or None
 
     def trigger(self, model, *args, **kwargs):
+        machine = self.machine
+        if not machine.has_queue and not machine._transition_queue:
+            if machine._journal is not None:
+                return machine._journal.trigger(self, model, args, kwargs)
+            if machine._instruments is not None:
+                return machine._instruments.trigger(self, model, args, kwargs)
+            if machine.compiled:
+                return machine.table.trigger(self, model, args, kwargs)
+            return self._dispatch(model, args, kwargs)
         f = partial(self._trigger, model, *args, **kwargs)
-        return self.machine._process(f)
+        return machine._process(f)
+
+    def _trigger(self, model, *args, **kwargs) -> bool:
+        if self.machine._journal is not None:
+            return self.machine._journal.trigger(self, model, args, kwargs)
+        return self._fire(model, args, kwargs)
+
+    def _fire(self, model, args, kwargs) -> bool:
+        machine = self.machine
+        if machine._instruments is not None:
+            return machine._instruments.trigger(self, model, args, kwargs)
+        if machine.compiled:
+            return machine.table.trigger(self, model, args, kwargs)
+        return self._dispatch(model, args, kwargs)
 
-    def _trigger(self, model) -> bool:
+    def _dispatch(self, model, args, kwargs) -> bool:
         state = self.machine.get_state(model.state)
-        if state.name not in self.transitions:
+        transitions = self.transitions.get(state.name) if state.parent is None else self.candidates(state)
+        if not transitions:
             msg = "{}Can't trigger event {} from state {}!".format(self.machine.id, self.name, state.name)
             if state.ignore_invalid_triggers:
                 logger.warning(msg)
                 return False
             else:
                 raise Machine.MachineError(msg)
-        event = EventData.EventData(state, self, self.machine, model)
-        for t in self.transitions[state.name]:
-            # event.transition = t
-            event.kwargs = t
-            if t.execute(event):
-                return True
-        return False
+        event = self._event_data(state, model, args, kwargs, len(transitions) > 1)
+        try:
+            for t in transitions:
+                if t.execute(event):
+                    return True
+            return False
+        finally:
+            self._release(event)
+
+    def _event_data(self, state, model, args, kwargs, shared=False):
+        """ EventData for a dispatch; ``shared`` tells that several candidate transitions may check guards. """
+        if self._pool and not self.machine.send_event:
+            event_data = self._pool.pop()
+            event_data.state = state
+            event_data.model = model
+        else:
+            event_data = EventData.EventData(state, self, self.machine, model)
+        event_data.args = args
+        event_data.kwargs = kwargs
+        event_data.memo = {} if shared and self.machine.memoize_conditions else None
+        return event_data
+
+    def _release(self, event_data):
+        # without send_event callbacks never see the EventData, so it can serve the next trigger
+        if not self.machine.send_event:
+            event_data.model = event_data.args = event_data.kwargs = event_data.memo = None
+            self._pool.append(event_data)
 
     def add_callback(self, trigger: str, func: str):
         for t in itertools.chain(*self.transitions.values()):
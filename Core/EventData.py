@@ -6,13 +6,14 @@ from Core import State
 
 
 class EventData(object):
-    __slots__ = 'state', 'event', 'machine', 'model', 'args', 'kwargs'
+    __slots__ = 'state', 'event', 'machine', 'model', 'args', 'kwargs', 'memo'
 
     def __init__(self, state: State, event: Event, machine: Machine, model: object):
         self.state = state
         self.event = event
         self.machine = machine
         self.model = model
+        self.memo = None
 
     def update(self, model):
         self.state = self.machine.get_state(model.state)
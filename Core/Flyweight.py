@@ -0,0 +1,161 @@
+from builtins import object
+from types import FunctionType
+
+import logging
+
+from Core import Machine
+from StaticMethod import get_trigger, new_instance
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+class Flyweight(object):
+    """ Flyweight binding of a machine's models: instead of per-instance partials, a model is switched to a
+        subclass of its class, generated once per class, that carries the triggers and ``is_<state>`` checks
+        as methods. On a machine with a bound StateStore the generated class also reads and writes
+        ``model.state`` through the store. Models whose class can't be swapped keep per-instance bindings. """
+
+    __slots__ = 'machine', 'classes'
+
+    def __init__(self, machine: Machine):
+        self.machine = machine
+        # model class -> generated class
+        self.classes = {}
+
+    def __reduce__(self):
+        # generated classes don't pickle, rebind() creates them again
+        return Flyweight, (self.machine,)
+
+    def bind(self, model) -> bool:
+        cls = type(model)
+        generated = self.classes.get(cls)
+        if generated is None:
+            if cls in self.classes.values():
+                return True
+            if hasattr(cls, '_flyweight_base'):
+                # bound to another machine's generated class already
+                return False
+            generated = self._create_class(cls)
+        try:
+            model.__class__ = generated
+        except TypeError:
+            return False
+        self.classes[cls] = generated
+        return True
+
+    def unbind(self, model) -> bool:
+        """ Switch ``model`` back to its own class; False if it has per-instance bindings. """
+        generated = type(model)
+        base = getattr(generated, '_flyweight_base', None)
+        if base is None or self.classes.get(base) is not generated:
+            return False
+        model.__class__ = base
+        return True
+
+    def bind_store(self, model, initial):
+        if hasattr(model, '_state_slot'):
+            raise Machine.MachineError("Model is already bound to a state store.")
+        vars(model).pop('state', None)
+        if not self.bind(model):
+            raise Machine.MachineError("Models of type {} can't be bound to a state store."
+                                       .format(type(model).__name__))
+        machine = self.machine
+        model._state_slot = machine._store.add(model, machine.table.state_ids[initial.name])
+
+    def unbind_store(self, model):
+        state = model.state
+        self.machine._store.remove(model._state_slot)
+        del model._state_slot
+        self.unbind(model)
+        model.state = state
+
+    def rebind(self, instance_models: list):
+        """ Bind the models of an unpickled machine again; they come back as instances of their own classes. """
+        machine = self.machine
+        store = machine._store
+        if store is not None:
+            for slot, model in enumerate(store.models[:store.size]):
+                if model is not None:
+                    vars(model).pop('state', None)
+                    self.bind(model)
+                    model._state_slot = slot
+            return
+        instance_models = set(id(model) for model in instance_models)
+        for model in machine.models:
+            if id(model) not in instance_models:
+                self.bind(model)
+
+    def _create_class(self, cls):
+        machine = self.machine
+        store = machine._store
+
+        def __reduce_ex__(model, protocol):
+            # pickle flyweight models as instances of their own class, without the machine's bindings
+            reduced = super(generated, model).__reduce_ex__(protocol)
+            if isinstance(reduced, tuple) and reduced[1] and reduced[1][0] is generated:
+                reduced = (new_instance, (cls,)) + tuple(reduced[2:])
+                if store is not None and isinstance(reduced[2], dict):
+                    state = dict(reduced[2])
+                    del state['_state_slot']
+                    state['state'] = model.state
+                    reduced = reduced[:2] + (state,) + reduced[3:]
+            return reduced
+
+        namespace = {'__slots__': (), '__module__': cls.__module__, '__reduce_ex__': __reduce_ex__,
+                     '_flyweight_base': cls}
+        if store is not None:
+            def get_state(model):
+                return machine.table.state_names[store.ids[model._state_slot]]
+
+            def set_state(model, state):
+                sid = machine.table.state_ids.get(state)
+                if sid is None:
+                    raise ValueError("State {} is not a registered state.".format(state))
+                store.ids[model._state_slot] = sid
+            namespace['state'] = property(get_state, set_state)
+
+        generated = type(cls.__name__, (cls,), namespace)
+        if hasattr(cls, 'trigger'):
+            logger.warning("{}Model already contains an attribute 'trigger'. Skip method binding ", machine.id)
+        else:
+            generated.trigger = get_trigger
+        for trigger in machine.events:
+            self._add_trigger(trigger, generated)
+        for state in machine.states.values():
+            self._add_state(state, generated)
+        return generated
+
+    def add_state(self, state):
+        for cls in self.classes.values():
+            self._add_state(state, cls)
+
+    def add_trigger(self, trigger: str):
+        for cls in self.classes.values():
+            self._add_trigger(trigger, cls)
+
+    def _add_state(self, state, cls):
+        machine = self.machine
+        name = state.name
+
+        def is_state(model):
+            return machine.is_state(name, model)
+        is_state.__name__ = 'is_{}'.format(name)
+        is_state.__qualname__ = '{}.{}'.format(cls.__qualname__, is_state.__name__)
+        setattr(cls, is_state.__name__, is_state)
+
+        enter_callback = 'on_enter_' + name
+        if enter_callback not in state.on_enter and isinstance(getattr(cls, enter_callback, None), FunctionType):
+            state.add_callback('enter', enter_callback)
+        exit_callback = 'on_exit_' + name
+        if exit_callback not in state.on_exit and isinstance(getattr(cls, exit_callback, None), FunctionType):
+            state.add_callback('exit', exit_callback)
+
+    def _add_trigger(self, trigger, cls):
+        event = self.machine.events[trigger]
+
+        def trig_func(model, *args, **kwargs):
+            return event.trigger(model, *args, **kwargs)
+        trig_func.__name__ = trigger
+        trig_func.__qualname__ = '{}.{}'.format(cls.__qualname__, trigger)
+        setattr(cls, trigger, trig_func)
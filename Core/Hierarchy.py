@@ -0,0 +1,58 @@
+from builtins import object
+
+from Core import Machine
+from StaticMethod import listify
+
+
+class Hierarchy(object):
+    """ Compound states of a machine. A machine gets one when its first compound state is added, and checks
+        for it to tell whether triggers have to look at the ancestors of a model's state. ``route`` is
+        computed once per (source, dest) pair. """
+
+    __slots__ = 'machine', 'routes'
+
+    def __init__(self, machine: Machine):
+        self.machine = machine
+        self.routes = {}
+
+    def __reduce__(self):
+        return Hierarchy, (self.machine,)
+
+    def add_children(self, parent, children: list, initial: str=None):
+        """ Create the children of ``parent``; their names are prefixed with the parent's. """
+        prefix = parent.name + parent.separator
+        for child in children:
+            if isinstance(child, str):
+                child = prefix + child
+            elif isinstance(child, dict):
+                child = dict(child, name=prefix + child['name'])
+            else:
+                for s in child.walk():
+                    s.name = prefix + s.name
+            parent.add_child(self.machine._make_state(child, ignore_invalid_triggers=parent.ignore_invalid_triggers))
+        if initial is not None:
+            for child in parent.children:
+                if child.name == prefix + initial:
+                    parent.initial = child
+                    break
+            else:
+                raise ValueError("State {} has no child {}.".format(parent.name, initial))
+
+    def route(self, source: str, dest: str) -> tuple:
+        """ States exited and entered, in callback order, when a model in ``source`` transitions to ``dest``:
+            exits go up from ``source`` to below the least common ancestor of both, entries go down from there
+            to ``dest`` and on through the initial children to a leaf. ``dest`` itself is always left and
+            entered again. """
+        route = self.routes.get((source, dest))
+        if route is None:
+            up = self.machine.get_state(source).lineage
+            down = self.machine.get_state(dest).lineage
+            common = 0
+            limit = min(len(up), len(down) - 1)
+            while common < limit and up[common] is down[common]:
+                common += 1
+            enters = list(down[common:])
+            while enters[-1].initial is not None:
+                enters.append(enters[-1].initial)
+            route = self.routes[(source, dest)] = (tuple(reversed(up[common:])), tuple(enters))
+        return route
@@ -0,0 +1,111 @@
+from builtins import object
+
+from Core import Machine
+
+
+class Index(object):
+    """ Triggers, successors and predecessors of every state, maintained incrementally as transitions are
+        added, so that ``get_triggers`` and the path queries never scan the events. Breadth first search trees
+        are cached per source until a transition adds a new edge. """
+
+    __slots__ = 'machine', 'rank', 'triggers_of', 'successors_of', 'predecessors_of', 'paths'
+
+    def __init__(self, machine: Machine):
+        self.machine = machine
+        # position of every event in definition order
+        self.rank = {}
+        self.triggers_of = {}
+        self.successors_of = {}
+        self.predecessors_of = {}
+        self.paths = {}
+
+    def __getstate__(self):
+        return self.machine, self.rank, self.triggers_of, self.successors_of, self.predecessors_of
+
+    def __setstate__(self, state):
+        self.machine, self.rank, self.triggers_of, self.successors_of, self.predecessors_of = state
+        self.paths = {}
+
+    def add_event(self, trigger: str):
+        self.rank[trigger] = len(self.rank)
+
+    def add(self, trigger: str, source: str, dest: str):
+        triggers = self.triggers_of.get(source)
+        if triggers is None:
+            triggers = self.triggers_of[source] = {}
+        triggers[trigger] = None
+
+        successors = self.successors_of.get(source)
+        if successors is None:
+            successors = self.successors_of[source] = {}
+        names = successors.get(dest)
+        if names is None:
+            successors[dest] = [trigger]
+            self.predecessors_of.setdefault(dest, {})[source] = None
+            # a new edge may shorten or extend every cached search
+            self.paths.clear()
+        elif trigger not in names:
+            names.append(trigger)
+
+    def triggers(self, states) -> list:
+        if self.machine._hierarchy is not None:
+            # triggers of ancestors fire from their descendants too
+            known = self.machine.states
+            states = [s.name for name in states if name in known for s in known[name].lineage]
+        if len(states) == 1:
+            names = self.triggers_of.get(states[0], ())
+        else:
+            names = set()
+            for state in states:
+                names.update(self.triggers_of.get(state, ()))
+        return sorted(names, key=self.rank.__getitem__)
+
+    def expand(self, state: str) -> dict:
+        """ Leaf states a model in ``state`` enters by one transition, those inherited from its ancestors
+            included, mapped to the triggers leading there. """
+        machine = self.machine
+        if machine._hierarchy is None:
+            return self.successors_of.get(state, {})
+        states = machine.states
+        expanded = {}
+        if state in states:
+            for s in states[state].lineage:
+                for dest, triggers in self.successors_of.get(s.name, {}).items():
+                    names = expanded.setdefault(states[dest].leaf.name, [])
+                    names.extend(t for t in triggers if t not in names)
+        return expanded
+
+    def successors(self, state: str) -> dict:
+        return {dest: list(triggers) for dest, triggers in self.expand(state).items()}
+
+    def predecessors(self, state: str) -> list:
+        return list(self.predecessors_of.get(state, ()))
+
+    def search(self, source: str) -> dict:
+        """ Every state reachable from ``source`` mapped to its parent on a shortest path (None for
+            ``source``). """
+        parents = self.paths.get(source)
+        if parents is None:
+            self.machine.get_state(source)
+            parents = {source: None}
+            frontier = [source]
+            while frontier:
+                following = []
+                for state in frontier:
+                    for dest in self.expand(state):
+                        if dest not in parents:
+                            parents[dest] = state
+                            following.append(dest)
+                frontier = following
+            self.paths[source] = parents
+        return parents
+
+    def path(self, source: str, dest: str) -> list:
+        parents = self.search(source)
+        if dest not in parents:
+            self.machine.get_state(dest)
+            return None
+        path = [dest]
+        while parents[path[-1]] is not None:
+            path.append(parents[path[-1]])
+        return path[::-1]
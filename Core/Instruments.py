@@ -0,0 +1,126 @@
+from builtins import object
+from time import perf_counter_ns
+import logging
+
+from Core import Machine
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+class Histogram(object):
+    """ Latency histogram in nanoseconds with power of two buckets: bucket ``b`` counts samples below
+        ``2 ** b`` ns and at least ``2 ** (b - 1)`` ns. """
+
+    __slots__ = 'count', 'total', 'min', 'max', 'buckets'
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self.buckets = [0] * 64
+
+    def add(self, value: int):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.buckets[min(value.bit_length(), 63)] += 1
+
+    def percentile(self, fraction: float) -> int:
+        """ Upper bound of the bucket holding the ``fraction`` quantile. """
+        rank = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(1 << bucket, self.max)
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {'count': self.count, 'total_ns': self.total, 'mean_ns': self.total / self.count if self.count else 0,
+                'min_ns': self.min or 0, 'max_ns': self.max, 'p50_ns': self.percentile(0.5),
+                'p90_ns': self.percentile(0.9), 'p99_ns': self.percentile(0.99),
+                'buckets': {1 << b: c for b, c in enumerate(self.buckets) if c}}
+
+
+class Instruments(object):
+    """ Counters and latency histograms of a synchronous machine, enabled with ``Machine.instrument()``:
+        transitions per (source, event, dest), failed checks per condition, trigger latency per event,
+        callback latency per (state, on_enter/on_exit, callback), and the depth of the transition queue.
+        A machine without instruments only pays one attribute test per trigger. """
+
+    __slots__ = 'machine', 'transitions', 'condition_failures', 'triggers', 'callbacks', 'queue_depth'
+
+    def __init__(self, machine: Machine):
+        self.machine = machine
+        self.reset()
+
+    def reset(self):
+        self.transitions = {}
+        self.condition_failures = {}
+        self.triggers = {}
+        self.callbacks = {}
+        self.queue_depth = Histogram()
+
+    def trigger(self, event, model, args, kwargs) -> bool:
+        machine = self.machine
+        source = model.state
+        start = perf_counter_ns()
+        try:
+            if machine.compiled:
+                result = machine.table.trigger(event, model, args, kwargs)
+            else:
+                result = event._dispatch(model, args, kwargs)
+        finally:
+            elapsed = perf_counter_ns() - start
+            histogram = self.triggers.get(event.name)
+            if histogram is None:
+                histogram = self.triggers[event.name] = Histogram()
+            histogram.add(elapsed)
+        if result:
+            key = source, event.name, model.state
+            self.transitions[key] = self.transitions.get(key, 0) + 1
+        return result
+
+    def count(self, source: str, trigger: str, dest: str, count: int):
+        """ Add ``count`` transitions taken without a trigger call, see ``StateStore.dispatch``. """
+        key = source, trigger, dest
+        self.transitions[key] = self.transitions.get(key, 0) + count
+
+    def callback(self, state, kind: str, func, event_data):
+        start = perf_counter_ns()
+        try:
+            self.machine._callback(func, event_data)
+        finally:
+            elapsed = perf_counter_ns() - start
+            key = state.name, kind, func if isinstance(func, str) else getattr(func, '__name__', repr(func))
+            histogram = self.callbacks.get(key)
+            if histogram is None:
+                histogram = self.callbacks[key] = Histogram()
+            histogram.add(elapsed)
+
+    def condition_failed(self, transition, condition, event_data):
+        func = condition.func
+        key = (transition.source, event_data.event.name, transition.dest,
+               func if isinstance(func, str) else getattr(func, '__name__', repr(func)))
+        self.condition_failures[key] = self.condition_failures.get(key, 0) + 1
+
+    def queued(self, depth: int):
+        self.queue_depth.add(depth)
+
+    def snapshot(self) -> dict:
+        """ Plain, JSON serializable copy of every counter and histogram. """
+        return {
+            'transitions': [{'source': s, 'event': e, 'dest': d, 'count': n}
+                            for (s, e, d), n in self.transitions.items()],
+            'condition_failures': [{'source': s, 'event': e, 'dest': d, 'condition': c, 'count': n}
+                                   for (s, e, d, c), n in self.condition_failures.items()],
+            'triggers': {name: h.snapshot() for name, h in self.triggers.items()},
+            'callbacks': [dict(state=s, kind=k, callback=c, **h.snapshot())
+                          for (s, k, c), h in self.callbacks.items()],
+            'queue_depth': self.queue_depth.snapshot(),
+        }
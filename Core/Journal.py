@@ -0,0 +1,221 @@
+from builtins import object
+from collections import deque
+
+import logging
+import os
+import pickle
+import threading
+
+from Core import Machine
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+VERSION = 1
+
+
+class Journal(object):
+    """ Append-only log of the transitions of a machine's models, enabled with ``Machine.journal(path)``.
+        A trigger only appends a ``(key, event, source, dest)`` record to an in-memory buffer; a background
+        thread writes pending records as one pickled batch every ``interval`` seconds, or as soon as ``batch``
+        records are waiting. Once ``snapshot_every`` records are written, the states of all models go to
+        ``path + '.snapshot'`` and the log starts over, so recovery reads one snapshot and a short tail.
+
+        Models are identified by their ``key`` attribute, which has to survive restarts; models without one
+        are rejected when the journal starts and by ``add_model``. Batches and snapshots carry a generation
+        number, and batches older than the snapshot are skipped on recovery, so a crash between writing a
+        snapshot and truncating the log is harmless; a torn last batch is dropped. States set with
+        ``set_state`` are not journaled. """
+
+    __slots__ = 'machine', 'path', 'key', 'interval', 'batch', 'snapshot_every', 'sync', 'generation', 'written',\
+                '_buffer', '_file', '_lock', '_wake', '_closed', '_thread'
+
+    def __init__(self, machine: Machine, path: str, key: str='id', interval: float=0.05, batch: int=10000,
+                 snapshot_every: int=1000000, sync: bool=False):
+        self.machine = machine
+        self.path = path
+        self.key = key
+        self.check(machine.models)
+        self.interval = interval
+        self.batch = batch
+        self.snapshot_every = snapshot_every
+        self.sync = sync
+        self.generation = self._read_generation(path)
+        self.written = 0
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+
+        end = 0
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                for _, end in self._frames(f):
+                    pass
+        self._file = open(path, 'ab')
+        if self._file.tell() > end:
+            logger.warning("Journal %s ends with a torn batch, dropping %d bytes.", path, self._file.tell() - end)
+            self._file.truncate(end)
+
+        self._thread = threading.Thread(target=self._run, name='journal-flush', daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _snapshot_path(path):
+        return path + '.snapshot'
+
+    @classmethod
+    def _read_generation(cls, path):
+        try:
+            with open(cls._snapshot_path(path), 'rb') as f:
+                return cls._header(f)
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def _header(f):
+        version, generation = pickle.load(f)
+        if version != VERSION:
+            raise ValueError("Unsupported journal snapshot version {}.".format(version))
+        return generation
+
+    @staticmethod
+    def _frames(f):
+        """ The complete batches of an open log, each with the offset where it ends. """
+        while True:
+            try:
+                frame = pickle.load(f)
+            except (EOFError, pickle.UnpicklingError):
+                return
+            yield frame, f.tell()
+
+    def check(self, models: list):
+        """ Raise ValueError unless every model carries the journal's key. """
+        key = self.key
+        for model in models:
+            if not hasattr(model, key):
+                raise ValueError("Journaled models need a {!r} attribute, {!r} has none.".format(key, model))
+
+    def trigger(self, event, model, args, kwargs) -> bool:
+        # the key is read first, so a model without one fails before it moves
+        key = getattr(model, self.key)
+        source = model.state
+        result = event._fire(model, args, kwargs)
+        if result:
+            buffer = self._buffer
+            buffer.append((key, event.name, source, model.state))
+            if len(buffer) >= self.batch:
+                self._wake.set()
+        return result
+
+    def record(self, model, event: str, source: str, dest: str):
+        """ Journal one transition that did not go through ``trigger``. """
+        self._buffer.append((getattr(model, self.key), event, source, dest))
+        if len(self._buffer) >= self.batch:
+            self._wake.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Writing journal %s failed.", self.path)
+
+    def flush(self):
+        """ Write the pending records now. """
+        with self._lock:
+            self._flush()
+            if self.snapshot_every and self.written >= self.snapshot_every:
+                self._snapshot()
+
+    def _flush(self):
+        buffer = self._buffer
+        count = len(buffer)
+        if not count or self._file is None:
+            return
+        keys, events, sources, dests = zip(*[buffer.popleft() for _ in range(count)])
+        pickle.dump((self.generation, keys, events, sources, dests), self._file, pickle.HIGHEST_PROTOCOL)
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+        self.written += count
+
+    def snapshot(self):
+        """ Write the states of all models and start the log over. Raises ValueError once the journal is
+            closed. """
+        with self._lock:
+            if self._file is None:
+                raise ValueError("Journal {} is closed.".format(self.path))
+            self._flush()
+            self._snapshot()
+
+    def _snapshot(self):
+        key = self.key
+        states = {getattr(model, key): model.state for model in list(self.machine.models)}
+        generation = self.generation + 1
+        path = self._snapshot_path(self.path)
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump((VERSION, generation), f, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(states, f, pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        # batches written from here on belong to the new snapshot
+        self.generation = generation
+        self._file.truncate(0)
+        self.written = 0
+
+    def close(self):
+        """ Stop the writer thread and write what is pending. """
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        with self._lock:
+            self._flush()
+            self._file.close()
+            self._file = None
+
+    @classmethod
+    def read(cls, path: str) -> dict:
+        """ The last journaled state of every model key: the snapshot with the later batches applied. """
+        states = {}
+        generation = 0
+        try:
+            with open(cls._snapshot_path(path), 'rb') as f:
+                generation = cls._header(f)
+                states = pickle.load(f)
+        except FileNotFoundError:
+            pass
+        try:
+            with open(path, 'rb') as f:
+                for (batch, keys, _, _, dests), _ in cls._frames(f):
+                    if batch >= generation:
+                        states.update(zip(keys, dests))
+        except FileNotFoundError:
+            pass
+        return states
+
+    @classmethod
+    def restore(cls, machine: Machine, path: str, models: list=None, key: str='id') -> int:
+        """ Put ``models`` (all of the machine's by default) back in their journaled states without running
+            callbacks and return how many were found in the journal. Timeouts move as with ``set_state``. """
+        states = cls.read(path)
+        known = machine.states
+        timed = any(s.timeout for s in known.values())
+        restored = 0
+        for model in machine.models if models is None else models:
+            state = states.get(getattr(model, key))
+            if state is None:
+                continue
+            if state not in known:
+                raise ValueError("State {} is not a registered state.".format(state))
+            if timed:
+                machine.set_state(state, model)
+            else:
+                model.state = state
+            restored += 1
+        return restored
@@ -0,0 +1,261 @@
+from collections import deque
+from functools import partial
+
+import logging
+import threading
+
+from Core.Event import Event
+from Core.Machine import Machine, MachineError
+from StaticMethod import listify
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+class LockedEvent(Event):
+    __slots__ = ()
+
+    def trigger(self, model, *args, **kwargs):
+        """ Fire the event on ``model``. A trigger fired from a callback while another thread holds the
+            model's stripe is deferred until the outer trigger returns; it returns True without having run,
+            as queued triggers do. """
+        f = partial(self._trigger, model, *args, **kwargs)
+        return self.machine._locked(model, f)
+
+
+class ConfigLock(object):
+    """ Reentrant readers-writer lock guarding a LockedMachine's configuration: triggers hold it shared,
+        configuration changes exclusively. Waiting writers keep new readers out, and a writer leaving lets the
+        readers that queued meanwhile in before the next writer, so neither side starves. A thread holding it
+        shared may take it exclusively, e.g. to add a transition from a callback, once the other readers
+        left; two threads doing so at the same time would wait for each other, so the second one raises
+        MachineError instead. """
+
+    __slots__ = '_condition', '_readers', '_writer', '_writes', '_waiting', '_upgrading', '_queued', '_handoff',\
+                '_local'
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writes = 0
+        self._waiting = 0
+        self._upgrading = None
+        # readers waiting, and how many of them may pass waiting writers
+        self._queued = 0
+        self._handoff = 0
+        self._local = threading.local()
+
+    def acquire_shared(self):
+        local = self._local
+        held = getattr(local, 'shared', 0)
+        with self._condition:
+            if not held and self._writer != threading.get_ident() and (self._writer is not None or self._waiting):
+                self._queued += 1
+                while self._writer is not None or self._waiting and not self._handoff:
+                    self._condition.wait()
+                self._queued -= 1
+                if self._handoff:
+                    self._handoff -= 1
+            self._readers += 1
+        local.shared = held + 1
+
+    def release_shared(self):
+        self._local.shared -= 1
+        with self._condition:
+            self._readers -= 1
+            if self._waiting:
+                self._condition.notify_all()
+
+    def acquire(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._writes += 1
+                return
+            held = getattr(self._local, 'shared', 0)
+            if held:
+                if self._upgrading is not None:
+                    raise MachineError("Another thread is changing the machine from a callback.")
+                self._upgrading = me
+            self._waiting += 1
+            try:
+                while self._writer is not None or self._readers > held or self._handoff:
+                    self._condition.wait()
+            finally:
+                self._waiting -= 1
+                if held:
+                    self._upgrading = None
+            self._writer = me
+            self._writes = 1
+
+    def release(self):
+        with self._condition:
+            self._writes -= 1
+            if not self._writes:
+                self._writer = None
+                self._handoff = self._queued
+                self._condition.notify_all()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class LockedMachine(Machine):
+    """ Thread safe Machine. Triggers take one of ``stripes`` reentrant locks chosen by model identity, so
+        threads driving different models rarely contend, and with ``queued=True`` every model drains its own
+        queue. A trigger fired from a callback never waits for a stripe while its thread holds one: if the
+        stripe is busy, the trigger is deferred until the outer trigger released its stripe and returns True,
+        as queued triggers do. Triggers hold the ConfigLock shared and configuration changes take it
+        exclusively; ``get_triggers`` and ``is_<state>`` read immutable snapshots. """
+
+    __slots__ = '_config_lock', '_stripes', '_model_queues', '_triggers', '_local'
+
+    scheduler_driver = 'thread'
+
+    def __init__(self, *args, **kwargs):
+        stripes = kwargs.pop('stripes', 64)
+        self._config_lock = ConfigLock()
+        self._stripes = [threading.RLock() for _ in range(stripes)]
+        self._model_queues = {}
+        self._triggers = None
+        self._local = threading.local()
+        super(LockedMachine, self).__init__(*args, **kwargs)
+
+    _pickle_blacklist = Machine._pickle_blacklist + ['_config_lock', '_model_queues', '_triggers', '_local']
+
+    def __getstate__(self):
+        state = super(LockedMachine, self).__getstate__()
+        state['_stripes'] = len(self._stripes)
+        return state
+
+    def __setstate__(self, state):
+        self._config_lock = ConfigLock()
+        self._stripes = [threading.RLock() for _ in range(state.pop('_stripes'))]
+        self._model_queues = {}
+        self._triggers = None
+        self._local = threading.local()
+        super(LockedMachine, self).__setstate__(state)
+
+    @staticmethod
+    def _create_event(*args, **kwargs):
+        return LockedEvent(*args, **kwargs)
+
+    def _lock_of(self, model):
+        return self._stripes[(id(model) >> 4) % len(self._stripes)]
+
+    @property
+    def table(self):
+        table = self._table
+        if table is None:
+            # concurrent readers may both build it, the results are equal
+            self._config_lock.acquire_shared()
+            try:
+                table = Machine.table.fget(self)
+            finally:
+                self._config_lock.release_shared()
+        return table
+
+    def _invalidate(self):
+        super(LockedMachine, self)._invalidate()
+        self._triggers = None
+
+    def add_model(self, model, initial=None):
+        with self._config_lock:
+            super(LockedMachine, self).add_model(model, initial)
+
+    def remove_model(self, model):
+        with self._config_lock:
+            super(LockedMachine, self).remove_model(model)
+
+    def add_states(self, *args, **kwargs):
+        with self._config_lock:
+            super(LockedMachine, self).add_states(*args, **kwargs)
+
+    def add_transition(self, *args, **kwargs):
+        with self._config_lock:
+            super(LockedMachine, self).add_transition(*args, **kwargs)
+
+    def _load(self, states, transitions):
+        with self._config_lock:
+            super(LockedMachine, self)._load(states, transitions)
+
+    def get_triggers(self, *args):
+        snapshot = self._triggers
+        if snapshot is None:
+            self._config_lock.acquire_shared()
+            try:
+                states = self.states if self._hierarchy is not None else self._index.triggers_of
+                index = {state: tuple(Machine.get_triggers(self, state)) for state in states}
+                snapshot = self._triggers = index, dict(self._index.rank)
+            finally:
+                self._config_lock.release_shared()
+        index, rank = snapshot
+        if len(args) == 1:
+            return list(index.get(args[0], ()))
+        names = set()
+        for state in args:
+            names.update(index.get(state, ()))
+        return sorted(names, key=rank.__getitem__)
+
+    def _locked(self, model, trigger):
+        local = self._local
+        lock = self._lock_of(model)
+        if getattr(local, 'depth', 0):
+            # fired from a callback while this thread holds a stripe
+            if not lock.acquire(blocking=False):
+                local.deferred.append((model, trigger))
+                return True
+            local.depth += 1
+            try:
+                return self._run(model, trigger)
+            finally:
+                local.depth -= 1
+                lock.release()
+
+        deferred = local.deferred = deque()
+        # the stripe first: a thread waiting for the config lock must not hold up a writer's callbacks
+        with lock:
+            self._config_lock.acquire_shared()
+            local.depth = 1
+            try:
+                result = self._run(model, trigger)
+            finally:
+                local.depth = 0
+                self._config_lock.release_shared()
+        while deferred:
+            self._locked(*deferred.popleft())
+        return result
+
+    def set_state(self, state, model=None):
+        for m in self.models if model is None else listify(model):
+            # in the order triggers take them
+            with self._lock_of(m):
+                self._config_lock.acquire_shared()
+                try:
+                    super(LockedMachine, self).set_state(state, m)
+                finally:
+                    self._config_lock.release_shared()
+
+    def _run(self, model, trigger):
+        if not self._queued:
+            return trigger()
+
+        key = id(model)
+        queue = self._model_queues.get(key)
+        if queue is None:
+            queue = self._model_queues[key] = deque()
+        queue.append(trigger)
+        if self._instruments is not None:
+            self._instruments.queued(len(queue))
+        if len(queue) > 1:
+            return True
+        try:
+            while queue:
+                queue[0]()
+                queue.popleft()
+        finally:
+            del self._model_queues[key]
+        return True
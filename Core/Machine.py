@@ -1,16 +1,17 @@
 from collections import OrderedDict
 from collections import deque
 from functools import partial
-from six import string_types
 from builtins import object
+from types import FunctionType, MethodType
 
-import inspect
+import gc
 import logging
 
 from Core import EventData
 from Core import State
 from Core import Event
 from Core import Transition
+from Core import Index
 from StaticMethod import listify, get_trigger
 
 logger = logging.getLogger(__name__)
@@ -18,21 +19,53 @@ logger.addHandler(logging.NullHandler())
 
 
 class Machine(object):
-    __slots__ = 'models', 'states', '_initial', 'send_event', 'ignore_invalid_triggers',\
-                '_queued', '_transition_queue', '_initial', 'events', 'id'
+    __slots__ = 'models', 'states', '_initial', 'send_event', 'ignore_invalid_triggers', 'memoize_conditions',\
+                'adaptive_conditions',\
+                '_queued', '_transition_queue', '_initial', 'events', 'id', '_compiled', '_table',\
+                '_flyweight', '_instance_models', '_model_ids', '_store', '_resolved', '_index', '_instruments',\
+                '_hierarchy', '_journal', '_scheduler'
+
+    _pickle_blacklist = ['_table', '_resolved', '_instruments', '_journal', '_scheduler']
+
+    # how the Scheduler created for timed states runs due timeouts, 'manual' waits for scheduler.run_pending()
+    scheduler_driver = 'manual'
 
     def __init__(self, model: object=None, states: State=None, initial:str=None, transitions: list=None,
-                 ordered_transitions: bool=False, ignore_invalid_triggers: bool=False, queued: bool=False):
+                 ordered_transitions: bool=False, ignore_invalid_triggers: bool=False, queued: bool=False,
+                 send_event: bool=False, compiled: bool=False, flyweight: bool=False, state_store: bool=False,
+                 memoize_conditions: bool=False, adaptive_conditions: bool=False):
 
         super(Machine, self).__init__()
 
         self.states = OrderedDict()
         self.events = {}
         self.ignore_invalid_triggers = ignore_invalid_triggers
+        self.send_event = send_event
+        self.memoize_conditions = memoize_conditions
+        self.adaptive_conditions = adaptive_conditions
         self.id = "Mohammad Forouhesh -> transient"
         self._queued = queued
         self._transition_queue = deque()
         self.models = []
+        self._compiled = compiled
+        self._table = None
+        self._resolved = {}
+        self._flyweight = None
+        if flyweight or state_store:
+            from Core import Flyweight
+            self._flyweight = Flyweight.Flyweight(self)
+        self._store = None
+        if state_store:
+            from Core import StateStore
+            self._store = StateStore.StateStore(self, bound=True)
+        self._instance_models = []
+        self._model_ids = set()
+        self._index = Index.Index(self)
+        self._instruments = None
+        # set once a compound state is added
+        self._hierarchy = None
+        self._journal = None
+        self._scheduler = None
 
         if model and initial is None:
             initial = 'initial'
@@ -56,6 +89,138 @@ class Machine(object):
         if model:
             self.add_model(model)
 
+    def __getstate__(self):
+        state = dict(getattr(self, '__dict__', {}))
+        for cls in type(self).__mro__:
+            slots = getattr(cls, '__slots__', ())
+            for name in [slots] if isinstance(slots, str) else slots:
+                if hasattr(self, name):
+                    state[name] = getattr(self, name)
+        return {k: v for k, v in state.items() if k not in self._pickle_blacklist}
+
+    def __setstate__(self, state):
+        self._table = None
+        self._resolved = {}
+        self._instruments = None
+        self._journal = None
+        self._scheduler = None
+        for k, v in state.items():
+            setattr(self, k, v)
+        self._model_ids = set(id(model) for model in self.models)
+        if self._flyweight is not None:
+            self._flyweight.rebind(self._instance_models)
+
+    def get_spec(self) -> dict:
+        states = [self._state_spec(state, state.name) for state in self.states.values() if state.parent is None]
+
+        transitions = [self._transition_spec(name, t) for name, event in self.events.items()
+                       for ts in event.transitions.values() for t in ts]
+
+        return {'states': states, 'initial': self._initial, 'transitions': transitions,
+                'ignore_invalid_triggers': self.ignore_invalid_triggers, 'queued': self._queued,
+                'send_event': self.send_event, 'compiled': self._compiled,
+                'memoize_conditions': self.memoize_conditions, 'adaptive_conditions': self.adaptive_conditions}
+
+    @staticmethod
+    def _transition_spec(trigger, t):
+        if not t.conditions:
+            return [trigger, t.source, t.dest]
+        spec = {'trigger': trigger, 'source': t.source, 'dest': t.dest}
+        conditions = [c.func for c in t.conditions if c.target]
+        unless = [c.func for c in t.conditions if not c.target]
+        if conditions:
+            spec['conditions'] = conditions
+        if unless:
+            spec['unless'] = unless
+        return spec
+
+    def _state_spec(self, state, name):
+        spec = {'name': name}
+        if state.on_enter:
+            spec['on_enter'] = list(state.on_enter)
+        if state.on_exit:
+            spec['on_exit'] = list(state.on_exit)
+        if state.ignore_invalid_triggers:
+            spec['ignore_invalid_triggers'] = True
+        if state.accepting:
+            spec['accepting'] = True
+        if state.timeout:
+            spec['timeout'] = state.timeout
+            spec['on_timeout'] = state.on_timeout
+        if state.children:
+            prefix = len(state.name) + len(state.separator)
+            spec['children'] = [self._state_spec(child, child.name[prefix:]) for child in state.children]
+            if state.initial is not state.children[0]:
+                spec['initial'] = state.initial.name[prefix:]
+        return spec if len(spec) > 1 else name
+
+    @classmethod
+    def from_spec(cls, spec: dict, model: (list or object)=None, **kwargs):
+        """ Build a machine from a spec such as ``get_spec()`` without replaying add_states and add_transition;
+            subclasses that keep derived state there update it in ``_load`` as well. """
+        options = dict(spec)
+        options.update(kwargs)
+        states = listify(options.pop('states', None))
+        transitions = listify(options.pop('transitions', None))
+        ordered = options.pop('ordered_transitions', False)
+        if model and options.get('initial') is None:
+            options['initial'] = 'initial'
+            states = ['initial'] + list(states)
+
+        machine = cls(**options)
+        machine._load(states, transitions)
+        if ordered:
+            machine.add_ordered_transitions()
+        if model:
+            machine.add_model(model)
+        return machine
+
+    def _load(self, states: list, transitions: list):
+        # the bulk build only allocates objects that stay referenced, so cyclic collection passes triggered
+        # by the allocation count are pure overhead
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            for state in states:
+                state = self._make_state(state)
+                for s in state.walk():
+                    if s.name in self.states:
+                        raise ValueError("State {} is defined twice.".format(s.name))
+                    self.states[s.name] = s
+
+            names = list(self.states)
+            for t in transitions:
+                if isinstance(t, dict):
+                    trigger, source, dest, conditions = t['trigger'], t['source'], t['dest'], t.get('conditions')
+                    unless = t.get('unless')
+                else:
+                    trigger, source, dest = t[:3]
+                    conditions = t[3] if len(t) > 3 else None
+                    unless = t[4] if len(t) > 4 else None
+                if source == '*':
+                    sources = names
+                else:
+                    sources = [source] if isinstance(source, str) else\
+                        [s.name if self._has_state(s) else s for s in listify(source)]
+                    for s in sources:
+                        if s not in self.states:
+                            raise ValueError("State {} is not a registered state.".format(s))
+                if self._has_state(dest):
+                    dest = dest.name
+                if dest not in self.states:
+                    raise ValueError("State {} is not a registered state.".format(dest))
+
+                event = self.events.get(trigger)
+                if event is None:
+                    event = self._add_event(trigger)
+                for s in sources:
+                    event.add_transition(self._create_transition(s, dest, conditions, unless))
+                    self._index.add(trigger, s, dest)
+        finally:
+            if collecting:
+                gc.enable()
+        self._invalidate()
+
     def add_model(self, model, initial=None):
         models = listify(model)
 
@@ -65,28 +230,49 @@ class Machine(object):
             else:
                 initial = self._initial
 
+        initial = self.get_state(initial).leaf
+        if self._journal is not None:
+            self._journal.check(models)
         for model in models:
-            if model not in self.models:
+            if id(model) not in self._model_ids:
 
-                if hasattr(model, 'trigger'):
-                    logger.warning("{}Model already contains an attribute 'trigger'. Skip method binding ", self.id)
-                else:
-                    model.trigger = partial(get_trigger, model)
+                if self._store is not None:
+                    self._flyweight.bind_store(model, initial)
+                elif not (self._flyweight is not None and self._flyweight.bind(model)):
+                    if hasattr(model, 'trigger'):
+                        logger.warning("{}Model already contains an attribute 'trigger'. Skip method binding ",
+                                       self.id)
+                    else:
+                        model.trigger = partial(get_trigger, model)
 
-                for trigger, _ in self.events.items():
-                    self._add_trigger_to_model(trigger, model)
+                    for trigger, _ in self.events.items():
+                        self._add_trigger_to_model(trigger, model)
 
-                for _, state in self.states.items():
-                    self._add_model_to_state(state, model)
+                    for _, state in self.states.items():
+                        self._add_model_to_state(state, model)
+                    self._instance_models.append(model)
 
-                self.set_state(initial, model=model)
+                model.state = initial.name
                 self.models.append(model)
+                self._model_ids.add(id(model))
+                for state in initial.lineage:
+                    if state.timeout:
+                        self.scheduler.schedule(model, state)
 
     def remove_model(self, model):
         models = listify(model)
 
         for model in models:
+            if self._scheduler is not None:
+                for state in self.states[model.state].lineage:
+                    if state.timeout:
+                        self._scheduler.cancel(model, state)
             self.models.remove(model)
+            self._model_ids.discard(id(model))
+            if self._store is not None:
+                self._flyweight.unbind_store(model)
+            elif self._flyweight is None or not self._flyweight.unbind(model):
+                self._instance_models.remove(model)
 
     @staticmethod
     def _create_transition(*args, **kwargs):
@@ -96,6 +282,10 @@ class Machine(object):
     def _create_event(*args, **kwargs):
         return Event.Event(*args, **kwargs)
 
+    @staticmethod
+    def _create_state(*args, **kwargs):
+        return State.State(*args, **kwargs)
+
     @property
     def initial(self):
         return self._initial
@@ -104,6 +294,74 @@ class Machine(object):
     def has_queue(self):
         return self._queued
 
+    @property
+    def compiled(self):
+        return self._compiled
+
+    @property
+    def table(self):
+        if self._table is None:
+            from Core import TransitionTable
+            self._table = TransitionTable.TransitionTable(self)
+        return self._table
+
+    def compile(self):
+        self._compiled = True
+        self._table = None
+        return self.table
+
+    @property
+    def instruments(self):
+        return self._instruments
+
+    def instrument(self, enabled: bool=True):
+        if not enabled:
+            instruments, self._instruments = self._instruments, None
+            return instruments
+        if self._instruments is None:
+            from Core import Instruments
+            self._instruments = Instruments.Instruments(self)
+        return self._instruments
+
+    @property
+    def journaled(self):
+        return self._journal
+
+    def journal(self, path: str=None, **kwargs):
+        journal = self._journal
+        if journal is not None:
+            self._journal = None
+            journal.close()
+        if path is None:
+            return journal
+        from Core import Journal
+        self._journal = Journal.Journal(self, path, **kwargs)
+        return self._journal
+
+    def restore(self, path: str, models: (list or object)=None, key: str='id') -> int:
+        from Core import Journal
+        return Journal.Journal.restore(self, path, None if models is None else listify(models), key)
+
+    @property
+    def scheduler(self):
+        if self._scheduler is None:
+            from Core import Scheduler
+            self._scheduler = Scheduler.Scheduler(self, self.scheduler_driver)
+        return self._scheduler
+
+    @scheduler.setter
+    def scheduler(self, scheduler):
+        if self._scheduler is not None and self._scheduler is not scheduler:
+            self._scheduler.close()
+        self._scheduler = scheduler
+
+    def _invalidate(self):
+        self._table = None
+        self._resolved.clear()
+        self._index.paths.clear()
+        if self._hierarchy is not None:
+            self._hierarchy.routes.clear()
+
     @property
     def model(self):
         if len(self.models) == 1:
@@ -112,7 +370,9 @@ class Machine(object):
             return self.models
 
     def is_state(self, state, model):
-        return model.state == state
+        if model.state == state:
+            return True
+        return self._hierarchy is not None and any(s.name == state for s in self.states[model.state].lineage)
 
     def get_state(self, state):
         if state not in self.states:
@@ -120,13 +380,25 @@ class Machine(object):
         return self.states[state]
 
     def set_state(self, state, model=None):
-        """ Set the current state. """
-        if isinstance(state, string_types):
+        """ Set the current state without running callbacks; the timeouts of timed states left are cancelled
+            and those of timed states entered are scheduled. """
+        if isinstance(state, str):
             state = self.get_state(state)
         models = self.models if model is None else listify(model)
         for m in models:
+            self._retime(m, getattr(m, 'state', None), state)
             m.state = state.name
 
+    def _retime(self, model, source: str, dest: State):
+        before = self.states[source].lineage if source in self.states else ()
+        after = dest.lineage
+        for state in before:
+            if state.timeout and state not in after and self._scheduler is not None:
+                self._scheduler.cancel(model, state)
+        for state in after:
+            if state.timeout and state not in before:
+                self.scheduler.schedule(model, state)
+
     def add_states(self, states: (list or str or dict or State), on_enter: (str or list)=None,
                    on_exit: (str or list)=None, ignore_invalid_triggers: bool=False):
 
@@ -136,26 +408,116 @@ class Machine(object):
 
         states = listify(states)
         for state in states:
-            if isinstance(state, string_types):
-                state = State.State(state, on_enter=on_enter, on_exit=on_exit, ignore_invalid_triggers=ignore)
-            elif isinstance(state, dict):
-                if 'ignore_invalid_triggers' not in state:
-                    state['ignore_invalid_triggers'] = ignore
-                state = State.State(**state)
-            self.states[state.name] = state
-            for model in self.models:
-                self._add_model_to_state(state, model)
+            state = self._make_state(state, on_enter, on_exit, ignore)
+            for s in state.walk():
+                self.states[s.name] = s
+                if self._flyweight is not None:
+                    self._flyweight.add_state(s)
+                for model in self._instance_models:
+                    self._add_model_to_state(s, model)
+        self._invalidate()
+
+    def _make_state(self, state, on_enter=None, on_exit=None, ignore_invalid_triggers=False):
+        if isinstance(state, str):
+            return self._create_state(state, on_enter=on_enter, on_exit=on_exit,
+                                      ignore_invalid_triggers=ignore_invalid_triggers)
+        elif isinstance(state, dict):
+            state = dict(state)
+            if 'ignore_invalid_triggers' not in state:
+                state['ignore_invalid_triggers'] = ignore_invalid_triggers
+            children = state.pop('children', None)
+            initial = state.pop('initial', None)
+            state = self._create_state(**state)
+            if children:
+                if self._hierarchy is None:
+                    from Core import Hierarchy
+                    self._hierarchy = Hierarchy.Hierarchy(self)
+                self._hierarchy.add_children(state, listify(children), initial)
+        return state
+
+    def dispatch_many(self, trigger: str, models: (list or object)=None):
+        from Core import StateStore
+        if self._store is not None:
+            return self._store.dispatch(trigger, None if models is None else
+                                        [model._state_slot for model in listify(models)])
+        return StateStore.dispatch_each(self, trigger, self.models if models is None else listify(models))
+
+    def run(self, symbols, initial: str=None) -> str:
+        table = self.table
+        sid, rejected = table.consume(symbols, table.state_ids[self._start(initial)])
+        if rejected is not None:
+            raise MachineError("{}Can't trigger event {} from state {}!".format(self.id, rejected,
+                                                                                table.state_names[sid]))
+        return table.state_names[sid]
+
+    def accepts(self, symbols, accepting_states: (str or list)=None, initial: str=None) -> bool:
+        table = self.table
+        sid, rejected = table.consume(symbols, table.state_ids[self._start(initial)])
+        if rejected is not None:
+            return False
+        if accepting_states is None:
+            return table.states[sid].accepting
+        return table.state_names[sid] in listify(accepting_states)
+
+    def minimize(self, accepting_states: (str or list)=None, **kwargs):
+        table = self.table
+        if accepting_states is None:
+            accepting = set(sid for sid, s in enumerate(table.states) if s.accepting)
+        else:
+            accepting = set(table.state_ids[name] for name in listify(accepting_states))
+        start = table.state_ids[self._start(None)]
+        blocks = table.equivalence_classes(start, accepting) or [[start]]
+        block_of = {sid: b[0] for b in blocks for sid in b}
+
+        states = [{'name': table.state_names[b[0]], 'accepting': b[0] in accepting} for b in blocks]
+        machine = self.__class__(states=states, initial=table.state_names[block_of[start]], **kwargs)
+        successors = table.successors
+        for b in blocks:
+            sid = b[0]
+            for eid, name in enumerate(table.event_names):
+                nxt = successors[sid * table.width + eid]
+                if nxt == table.IGNORED:
+                    nxt = sid
+                if nxt in block_of:
+                    machine.add_transition(name, table.state_names[sid], table.state_names[block_of[nxt]])
+        return machine
+
+    def analyze(self, initial: str=None) -> dict:
+        from Core import Analysis
+        return Analysis.Analysis(self, initial).report()
+
+    def optimize(self, initial: str=None, **kwargs):
+        from Core import Analysis
+        return Analysis.Analysis(self, initial).optimize(**kwargs)
+
+    def _start(self, initial):
+        initial = self._initial if initial is None else initial
+        if initial is None:
+            raise MachineError("No initial state configured for machine, must specify when running symbols.")
+        return self.get_state(initial).leaf.name
+
+    def count_states(self) -> dict:
+        return self._get_store().counts()
+
+    def models_in(self, state: str) -> list:
+        return self._get_store().find(state)
+
+    def snapshot(self) -> memoryview:
+        return self._get_store().snapshot()
+
+    def _get_store(self):
+        if self._store is None:
+            raise MachineError("Machine has no state store, create it with state_store=True.")
+        return self._store
 
     def _add_model_to_state(self, state, model):
         setattr(model, 'is_{}'.format(state.name),
                 partial(self.is_state, state.name, model))
         enter_callback = 'on_enter_' + state.name
-        if hasattr(model, enter_callback) and \
-                inspect.ismethod(getattr(model, enter_callback)):
+        if enter_callback not in state.on_enter and self._is_method(model, enter_callback):
             state.add_callback('enter', enter_callback)
         exit_callback = 'on_exit_' + state.name
-        if hasattr(model, exit_callback) and \
-                inspect.ismethod(getattr(model, exit_callback)):
+        if exit_callback not in state.on_exit and self._is_method(model, exit_callback):
             state.add_callback('exit', exit_callback)
 
     def _add_trigger_to_model(self, trigger, model):
@@ -163,17 +525,27 @@ class Machine(object):
         setattr(model, trigger, trig_func)
 
     def get_triggers(self, *args):
-        states = set(args)
-        return [t for (t, ev) in self.events.items() if any(state in ev.transitions for state in states)]
+        return self._index.triggers(args)
+
+    def get_successors(self, state: str) -> dict:
+        return self._index.successors(state)
+
+    def get_predecessors(self, state: str) -> list:
+        return self._index.predecessors(state)
 
-    def add_transition(self, trigger: str, source: str, dest: str, conditions:(str or list)=None):
+    def reachable_from(self, state: str) -> set:
+        return set(self._index.search(state))
+
+    def path(self, source: str, dest: str) -> list:
+        return self._index.path(source, dest)
+
+    def add_transition(self, trigger: str, source: str, dest: str, conditions:(str or list)=None,
+                       unless:(str or list)=None):
 
         if trigger not in self.events:
-            self.events[trigger] = self._create_event(trigger, self)
-            for model in self.models:
-                self._add_trigger_to_model(trigger, model)
+            self._add_event(trigger)
 
-        if isinstance(source, string_types):
+        if isinstance(source, str):
             source = list(self.states.keys()) if source == '*' else [source]
         else:
             source = [s.name if self._has_state(s) else s for s in listify(source)]
@@ -181,8 +553,19 @@ class Machine(object):
         for s in source:
             if self._has_state(dest):
                 dest = dest.name
-            t = self._create_transition(s, dest, conditions)
+            t = self._create_transition(s, dest, conditions, unless)
             self.events[trigger].add_transition(t)
+            self._index.add(trigger, s, dest)
+        self._invalidate()
+
+    def _add_event(self, trigger):
+        event = self.events[trigger] = self._create_event(trigger, self)
+        self._index.add_event(trigger)
+        if self._flyweight is not None:
+            self._flyweight.add_trigger(trigger)
+        for model in self._instance_models:
+            self._add_trigger_to_model(trigger, model)
+        return event
 
     def add_ordered_transitions(self, states: list=None, trigger: str='next_state',
                                 loop: bool=True, loop_includes_initial: bool=True):
@@ -198,9 +581,40 @@ class Machine(object):
                 states.remove(self._initial)
             self.add_transition(trigger, states[-1], states[0])
 
+    def _resolve(self, model, name):
+        cls = model.__class__
+        try:
+            attr, func = self._resolved[cls][name]
+            # assigning another attribute to the class replaces the one kept with the function
+            stale = attr is not getattr(cls, name, None)
+        except KeyError:
+            stale = True
+        if stale:
+            func = None
+            if cls.__getattribute__ is object.__getattribute__ and not hasattr(cls, '__getattr__'):
+                for klass in cls.__mro__:
+                    if name in klass.__dict__:
+                        attr = klass.__dict__[name]
+                        func = attr if isinstance(attr, FunctionType) else None
+                        break
+            self._resolved.setdefault(cls, {})[name] = getattr(cls, name, None), func
+        if func is not None and name in getattr(model, '__dict__', ()):
+            return None
+        return func
+
+    def _is_method(self, model, name):
+        return self._resolve(model, name) is not None or isinstance(getattr(model, name, None), MethodType)
+
     def _callback(self, func: callable, event_data: EventData):
-        if isinstance(func, string_types):
-            func = getattr(event_data.model, func)
+        if isinstance(func, str):
+            model = event_data.model
+            method = self._resolve(model, func)
+            if method is None:
+                func = getattr(model, func)
+            elif self.send_event:
+                return method(model, event_data)
+            else:
+                return method(model, *event_data.args, **event_data.kwargs)
 
         if self.send_event:
             func(event_data)
@@ -209,7 +623,7 @@ class Machine(object):
 
     def _has_state(self, s):
         if isinstance(s, State.State):
-            if s in self.states.values():
+            if self.states.get(s.name) is s:
                 return True
             else:
                 raise ValueError('State {} has not been added to the machine'.format(s.name))
@@ -226,6 +640,8 @@ class Machine(object):
                 raise MachineError("Attempt to process events synchronously while transition queue is not empty!")
 
         self._transition_queue.append(trigger)
+        if self._instruments is not None:
+            self._instruments.queued(len(self._transition_queue))
         if len(self._transition_queue) > 1:
             return True
 
@@ -0,0 +1,297 @@
+from array import array
+from builtins import object
+import logging
+import mmap
+import struct
+import sys
+
+from Core import Machine
+from Core import TransitionTable
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+MAGIC = b'TTBL'
+VERSION = 1
+# magic, version, byte order, states, events, transitions, conditions, callbacks, strings, string bytes, initial
+HEADER = struct.Struct('=4s10i')
+
+IGNORE = 1
+ACCEPTING = 2
+
+INVALID = TransitionTable.TransitionTable.INVALID
+IGNORED = TransitionTable.TransitionTable.IGNORED
+GUARDED = TransitionTable.TransitionTable.GUARDED
+
+
+class MachineImage(object):
+    """ Read-only binary image of a machine definition: states with their flags and callback names, events,
+        every transition with its condition names, and the successor codes of the compiled table, all as
+        int32 arrays followed by one UTF-8 string blob. ``load`` maps the file into memory, so processes
+        loading the same image share its pages through the page cache; no Python object is created per
+        transition, and strings are decoded on access. Callbacks and conditions must be given by name and
+        are looked up on the model; they are called with the trigger's arguments, as with send_event=False. """
+
+    __slots__ = 'buffer', 'initial', 'state_count', 'event_count', 'width', 'successors',\
+                'cell_offsets', 'dests', 'condition_offsets', 'conditions', 'callback_offsets', 'callbacks',\
+                'state_flags', 'state_strings', 'event_strings', 'string_offsets', 'blob', '_view', '_mmap',\
+                '_state_names', '_state_ids', '_event_ids'
+
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        magic, version, byteorder, states, events, transitions, conditions, callbacks, strings, size, initial =\
+            HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("Not a machine image.")
+        if version != VERSION:
+            raise ValueError("Unsupported machine image version {}.".format(version))
+        if byteorder != (sys.byteorder == 'little'):
+            raise ValueError("Machine image was written on a machine with a different byte order.")
+
+        self.buffer = buffer
+        self._view = view
+        self._mmap = None
+        self.state_count = states
+        self.event_count = events
+        self.width = events
+        self.initial = initial
+        offset = HEADER.size
+        sections = []
+        for count in (states, states, events, states * events, states * events + 1, transitions, transitions + 1,
+                      2 * conditions, 2 * states + 1, callbacks, strings + 1):
+            sections.append(view[offset:offset + 4 * count].cast('i'))
+            offset += 4 * count
+        self.state_flags, self.state_strings, self.event_strings, self.successors, self.cell_offsets,\
+            self.dests, self.condition_offsets, self.conditions, self.callback_offsets, self.callbacks,\
+            self.string_offsets = sections
+        self.blob = view[offset:offset + size]
+        self._state_names = None
+        self._state_ids = None
+        self._event_ids = None
+
+    @classmethod
+    def load(cls, path: str):
+        """ Map the image at ``path`` into memory. """
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        image = cls(mapped)
+        image._mmap = mapped
+        return image
+
+    def close(self):
+        """ Release the mapping of a loaded image; its arrays can't be used afterwards. """
+        if self._mmap is not None:
+            for name in ('state_flags', 'state_strings', 'event_strings', 'successors', 'cell_offsets', 'dests',
+                         'condition_offsets', 'conditions', 'callback_offsets', 'callbacks', 'string_offsets',
+                         'blob'):
+                getattr(self, name).release()
+            self._view.release()
+            self._mmap.close()
+            self._mmap = None
+
+    @staticmethod
+    def dump(machine: Machine, file):
+        """ Write the image of ``machine`` to ``file``, a path or a binary file object. Raises ValueError for
+            callables given as callbacks or conditions, and for send_event, nested machines and timed states. """
+        if machine.send_event:
+            raise ValueError("Machine images call callbacks with the trigger's arguments, send_event is not "
+                             "supported.")
+        if machine._hierarchy is not None:
+            raise ValueError("Machine images hold flat machines, nested states are not supported.")
+        if any(state.timeout for state in machine.states.values()):
+            raise ValueError("Machine images don't schedule timeouts, timed states are not supported.")
+        table = machine.table
+        strings = []
+        string_ids = {}
+
+        def string(name, what):
+            if not isinstance(name, str):
+                raise ValueError("{} {!r} is not a name; only callbacks and conditions given by name can be "
+                                 "serialized.".format(what, name))
+            sid = string_ids.get(name)
+            if sid is None:
+                sid = string_ids[name] = len(strings)
+                strings.append(name.encode('utf-8'))
+            return sid
+
+        state_flags = array('i', (IGNORE * s.ignore_invalid_triggers | ACCEPTING * s.accepting
+                                  for s in table.states))
+        state_strings = array('i', (string(name, 'State') for name in table.state_names))
+        event_strings = array('i', (string(name, 'Event') for name in table.event_names))
+        successors = array('i', table.successors)
+
+        cell_offsets = array('i', [0])
+        dests = array('i')
+        condition_offsets = array('i', [0])
+        conditions = array('i')
+        for cell in table.cells:
+            for t, _, dest, _ in cell or ():
+                dests.append(table.state_ids[dest.name])
+                for c in t.conditions:
+                    conditions.append(string(c.func, 'Condition'))
+                    conditions.append(int(bool(c.target)))
+                condition_offsets.append(len(conditions) // 2)
+            cell_offsets.append(len(dests))
+
+        callback_offsets = array('i', [0])
+        callbacks = array('i')
+        for state in table.states:
+            for listing in (state.on_enter, state.on_exit):
+                callbacks.extend(string(f, 'Callback') for f in listing)
+                callback_offsets.append(len(callbacks))
+
+        string_offsets = array('i', [0])
+        for encoded in strings:
+            string_offsets.append(string_offsets[-1] + len(encoded))
+        blob = b''.join(strings)
+
+        initial = table.state_ids[machine.initial] if machine.initial in table.state_ids else -1
+        header = HEADER.pack(MAGIC, VERSION, sys.byteorder == 'little', len(table.states), table.width,
+                             len(dests), len(conditions) // 2, len(callbacks), len(strings), len(blob), initial)
+
+        close = isinstance(file, str)
+        f = open(file, 'wb') if close else file
+        try:
+            f.write(header)
+            for section in (state_flags, state_strings, event_strings, successors, cell_offsets, dests,
+                            condition_offsets, conditions, callback_offsets, callbacks, string_offsets):
+                f.write(section.tobytes())
+            f.write(blob)
+        finally:
+            if close:
+                f.close()
+
+    def string(self, index: int) -> str:
+        offsets = self.string_offsets
+        return bytes(self.blob[offsets[index]:offsets[index + 1]]).decode('utf-8')
+
+    @property
+    def state_names(self) -> list:
+        if self._state_names is None:
+            self._state_names = [self.string(i) for i in self.state_strings]
+        return self._state_names
+
+    @property
+    def event_names(self) -> list:
+        return [self.string(i) for i in self.event_strings]
+
+    @property
+    def state_ids(self) -> dict:
+        if self._state_ids is None:
+            self._state_ids = {name: i for i, name in enumerate(self.state_names)}
+        return self._state_ids
+
+    @property
+    def event_ids(self) -> dict:
+        if self._event_ids is None:
+            self._event_ids = {name: i for i, name in enumerate(self.event_names)}
+        return self._event_ids
+
+    def _state_id(self, name):
+        sid = self.state_ids.get(name)
+        if sid is None:
+            raise ValueError("State {} is not a registered state.".format(name))
+        return sid
+
+    def _names(self, start, end, table):
+        return [self.string(table[i]) for i in range(start, end)]
+
+    def on_enter(self, sid: int) -> list:
+        return self._names(self.callback_offsets[2 * sid], self.callback_offsets[2 * sid + 1], self.callbacks)
+
+    def on_exit(self, sid: int) -> list:
+        return self._names(self.callback_offsets[2 * sid + 1], self.callback_offsets[2 * sid + 2], self.callbacks)
+
+    def to_spec(self) -> dict:
+        """ The definition as a spec for ``Machine.from_spec``, for when a full Machine is needed. """
+        names = self.state_names
+        states = []
+        for sid, name in enumerate(names):
+            spec = {'name': name}
+            if self.on_enter(sid):
+                spec['on_enter'] = self.on_enter(sid)
+            if self.on_exit(sid):
+                spec['on_exit'] = self.on_exit(sid)
+            if self.state_flags[sid] & IGNORE:
+                spec['ignore_invalid_triggers'] = True
+            if self.state_flags[sid] & ACCEPTING:
+                spec['accepting'] = True
+            states.append(spec if len(spec) > 1 else name)
+
+        transitions = []
+        for eid, event in enumerate(self.event_names):
+            for sid, source in enumerate(names):
+                cell = sid * self.width + eid
+                for t in range(self.cell_offsets[cell], self.cell_offsets[cell + 1]):
+                    first, last = self.condition_offsets[t], self.condition_offsets[t + 1]
+                    if first == last:
+                        transitions.append([event, source, names[self.dests[t]]])
+                        continue
+                    transition = {'trigger': event, 'source': source, 'dest': names[self.dests[t]]}
+                    for key, target in (('conditions', 1), ('unless', 0)):
+                        guards = [self.string(self.conditions[2 * i]) for i in range(first, last)
+                                  if self.conditions[2 * i + 1] == target]
+                        if guards:
+                            transition[key] = guards
+                    transitions.append(transition)
+        return {'states': states, 'initial': names[self.initial] if self.initial >= 0 else None,
+                'transitions': transitions}
+
+    def trigger(self, model, event: str, *args, **kwargs) -> bool:
+        """ Fire ``event`` on ``model``, whose ``state`` attribute holds a state name. """
+        sid = self._state_id(model.state)
+        eid = self.event_ids.get(event)
+        if eid is None:
+            raise Machine.MachineError('Event "{}" is not registered.'.format(event))
+        cell = sid * self.width + eid
+        start, end = self.cell_offsets[cell], self.cell_offsets[cell + 1]
+        if start == end:
+            msg = "Can't trigger event {} from state {}!".format(event, model.state)
+            if self.state_flags[sid] & IGNORE:
+                logger.warning(msg)
+                return False
+            raise Machine.MachineError(msg)
+
+        conditions = self.conditions
+        for t in range(start, end):
+            for c in range(self.condition_offsets[t], self.condition_offsets[t + 1]):
+                if getattr(model, self.string(conditions[2 * c]))() != bool(conditions[2 * c + 1]):
+                    break
+            else:
+                dest = self.dests[t]
+                for name in self.on_exit(sid):
+                    getattr(model, name)(*args, **kwargs)
+                model.state = self.state_names[dest]
+                for name in self.on_enter(dest):
+                    getattr(model, name)(*args, **kwargs)
+                return True
+        return False
+
+    def run(self, symbols, initial: str=None) -> str:
+        """ Consume event names as an automaton without models or callbacks and return the final state. A string
+            is read as one event per character, which needs single character event names. """
+        if isinstance(symbols, str) and any(len(name) != 1 for name in self.event_ids):
+            raise ValueError("A string of symbols needs single character event names, pass a sequence of event "
+                             "names instead.")
+        if initial is None and self.initial < 0:
+            raise Machine.MachineError("No initial state configured for machine, must specify when running "
+                                       "symbols.")
+        sid = self.initial if initial is None else self._state_id(initial)
+        event_ids = self.event_ids
+        successors = self.successors
+        for symbol in symbols:
+            eid = event_ids.get(symbol)
+            if eid is not None:
+                nxt = successors[sid * self.width + eid]
+            else:
+                nxt = IGNORED if self.state_flags[sid] & IGNORE else INVALID
+            if nxt < 0:
+                if nxt == GUARDED:
+                    raise Machine.MachineError("Event {} from state {} is conditional and can not be run as an "
+                                               "automaton.".format(symbol, self.state_names[sid]))
+                if nxt == INVALID:
+                    raise Machine.MachineError("Can't trigger event {} from state {}!".format(
+                        symbol, self.state_names[sid]))
+                continue
+            sid = nxt
+        return self.state_names[sid]
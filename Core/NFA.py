@@ -0,0 +1,174 @@
+from builtins import object
+import logging
+
+from Core import Machine
+from StaticMethod import listify
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+class NFA(object):
+    """ Nondeterministic automaton over event names. A transition may have several destinations and a
+        trigger of None is an epsilon transition. The set of active states is an int bitset (bit i is state i),
+        and every transition mask already includes the epsilon closure of its destinations. """
+
+    __slots__ = 'states', 'state_ids', 'initial', 'accepting', 'transitions', '_delta', '_closure'
+
+    def __init__(self, states: list=None, initial: (str or list)=None, transitions: list=None,
+                 accepting: (str or list)=None):
+        self.states = []
+        self.state_ids = {}
+        self.initial = []
+        self.accepting = set()
+        self.transitions = []
+        self._delta = None
+        self._closure = None
+
+        if states is not None:
+            self.add_states(states)
+        if initial is not None:
+            self.initial = [self._state(s) for s in listify(initial)]
+        for name in listify(accepting):
+            self.accepting.add(self._state(name))
+        if transitions is not None:
+            for t in listify(transitions):
+                if isinstance(t, list):
+                    self.add_transition(*t)
+                else:
+                    self.add_transition(**t)
+
+    @classmethod
+    def from_machine(cls, machine: Machine, accepting_states: (str or list)=None):
+        """ Read every candidate transition of ``machine`` as a nondeterministic choice, ignoring conditions. """
+        if accepting_states is None:
+            accepting_states = [s.name for s in machine.states.values() if s.accepting]
+        nfa = cls(states=list(machine.states.keys()), initial=machine.initial, accepting=accepting_states)
+        for event in machine.events.values():
+            for source, transitions in event.transitions.items():
+                nfa.add_transition(event.name, source, [t.dest for t in transitions])
+        return nfa
+
+    def add_states(self, states: (list or str)):
+        for name in listify(states):
+            if name not in self.state_ids:
+                self.state_ids[name] = len(self.states)
+                self.states.append(name)
+        self._invalidate()
+
+    def add_transition(self, trigger: str, source: (str or list), dest: (str or list)):
+        dests = [self._state(d) for d in listify(dest)]
+        sources = self.states if source == '*' else listify(source)
+        for s in [self._state(s) for s in sources]:
+            self.transitions.append((trigger, s, dests))
+        self._invalidate()
+
+    def _state(self, name):
+        if name not in self.state_ids:
+            raise ValueError("State {} is not a registered state.".format(name))
+        return self.state_ids[name]
+
+    def _invalidate(self):
+        self._delta = None
+        self._closure = None
+
+    def _compile(self):
+        size = len(self.states)
+        epsilon = [1 << i for i in range(size)]
+        for trigger, s, dests in self.transitions:
+            if trigger is None:
+                for d in dests:
+                    epsilon[s] |= 1 << d
+
+        # transitive closure, iterated until no mask grows
+        changed = True
+        while changed:
+            changed = False
+            for i in range(size):
+                mask = self._union(epsilon, epsilon[i])
+                if mask != epsilon[i]:
+                    epsilon[i] = mask
+                    changed = True
+
+        delta = {}
+        for trigger, s, dests in self.transitions:
+            if trigger is None:
+                continue
+            row = delta.setdefault(trigger, [0] * size)
+            for d in dests:
+                row[s] |= epsilon[d]
+        self._closure = epsilon
+        self._delta = delta
+
+    @staticmethod
+    def _union(masks, active):
+        result = 0
+        while active:
+            low = active & -active
+            result |= masks[low.bit_length() - 1]
+            active ^= low
+        return result
+
+    def _names(self, active):
+        return [name for i, name in enumerate(self.states) if active >> i & 1]
+
+    @property
+    def start(self) -> int:
+        """ Bitset of the initial states and their epsilon closure. """
+        if self._delta is None:
+            self._compile()
+        return self._union(self._closure, sum(1 << i for i in set(self.initial)))
+
+    def step(self, active: int, symbol: str) -> int:
+        if self._delta is None:
+            self._compile()
+        row = self._delta.get(symbol)
+        return self._union(row, active) if row is not None else 0
+
+    def run(self, symbols) -> list:
+        """ Names of the states active after consuming ``symbols``; empty once every branch rejected. """
+        active = self.start
+        for symbol in symbols:
+            active = self.step(active, symbol)
+            if not active:
+                break
+        return self._names(active)
+
+    def accepts(self, symbols) -> bool:
+        accepting = sum(1 << i for i in self.accepting)
+        active = self.start
+        for symbol in symbols:
+            active = self.step(active, symbol)
+            if not active:
+                return False
+        return bool(active & accepting)
+
+    def determinize(self, **kwargs) -> Machine:
+        """ Subset construction. Returns a deterministic Machine whose states are the reachable sets of NFA
+            states, named ``{a,b}``, flagged ``accepting`` when they contain an accepting state. Keyword
+            arguments are passed on to the Machine. """
+        start = self.start
+        accepting = sum(1 << i for i in self.accepting)
+        symbols = sorted(self._delta, key=str)
+        names = {start: self._subset_name(start)}
+        pending = [start]
+        transitions = []
+        while pending:
+            active = pending.pop()
+            for symbol in symbols:
+                nxt = self.step(active, symbol)
+                if not nxt:
+                    continue
+                if nxt not in names:
+                    names[nxt] = self._subset_name(nxt)
+                    pending.append(nxt)
+                transitions.append([symbol, names[active], names[nxt]])
+
+        states = [{'name': name, 'accepting': bool(active & accepting)} for active, name in names.items()]
+        machine = Machine.Machine(states=states, initial=names[start], **kwargs)
+        for t in transitions:
+            machine.add_transition(*t)
+        return machine
+
+    def _subset_name(self, active):
+        return '{' + ','.join(str(name) for name in self._names(active)) + '}'
@@ -0,0 +1,209 @@
+from builtins import object
+from heapq import heapify, heappop, heappush
+
+import asyncio
+import inspect
+import itertools
+import logging
+import threading
+import time
+
+from Core import Machine
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+# entry fields, entries are lists so that cancelling can clear the model in place
+DEADLINE, SEQUENCE, MODEL, STATE, TRIGGER = range(5)
+
+
+class Scheduler(object):
+    """ The pending timeouts of all models of a machine in one heap, see ``State(timeout=..., on_timeout=...)``.
+        A model entering a timed state adds one entry; leaving it cancels the entry in O(1) by clearing it in
+        place, and cleared entries are dropped when they reach the top of the heap or when they make up half
+        of it. A due timeout fires the state's ``on_timeout`` trigger on the model.
+
+        ``driver`` runs due timeouts: ``'manual'`` only when ``run_pending`` is called, ``'asyncio'`` from
+        one timer handle on the event loop, rearmed when an earlier deadline arrives, and ``'thread'`` from
+        one daemon thread sleeping until the earliest deadline. The thread fires triggers concurrently with
+        the rest of the program and therefore requires a LockedMachine. """
+
+    drivers = ('thread', 'asyncio', 'manual')
+
+    __slots__ = 'machine', 'driver', 'clock', '_heap', '_pending', '_cancelled', '_sequence', '_lock', '_wake',\
+                '_thread', '_closed', '_loop', '_handle'
+
+    def __init__(self, machine: Machine, driver: str='manual', loop: asyncio.AbstractEventLoop=None):
+        if driver not in self.drivers:
+            raise ValueError("Unknown scheduler driver {}, expected one of {}.".format(driver,
+                                                                                     ', '.join(self.drivers)))
+        if driver == 'thread':
+            from Core import LockedMachine
+            if not isinstance(machine, LockedMachine.LockedMachine):
+                raise ValueError("The thread driver fires triggers from its own thread and requires a "
+                                 "LockedMachine.")
+        self.machine = machine
+        self.driver = driver
+        self.clock = time.monotonic
+        self._heap = []
+        self._pending = {}
+        self._cancelled = 0
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread = None
+        self._closed = False
+        self._loop = loop
+        self._handle = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def schedule(self, model, state):
+        """ Fire ``state.on_timeout`` on ``model`` in ``state.timeout`` seconds, replacing a pending timeout of
+            the same model and state. """
+        key = id(model), state.name
+        entry = [self.clock() + state.timeout, next(self._sequence), model, state.name, state.on_timeout]
+        with self._lock:
+            previous = self._pending.pop(key, None)
+            if previous is not None:
+                previous[MODEL] = None
+                self._cancelled += 1
+            self._pending[key] = entry
+            heappush(self._heap, entry)
+            earliest = self._heap[0] is entry
+            if earliest and self.driver == 'thread':
+                self._wake.notify()
+        if earliest:
+            self._rearm()
+
+    def cancel(self, model, state) -> bool:
+        """ Drop the pending timeout of ``model`` in ``state``; False if there was none. """
+        with self._lock:
+            entry = self._pending.pop((id(model), state.name), None)
+            if entry is None:
+                return False
+            entry[MODEL] = None
+            self._cancelled += 1
+            if self._cancelled > 64 and 2 * self._cancelled > len(self._heap):
+                self._heap = [e for e in self._heap if e[MODEL] is not None]
+                heapify(self._heap)
+                self._cancelled = 0
+        return True
+
+    def next_deadline(self) -> float:
+        """ Clock time of the earliest pending timeout, or None. """
+        with self._lock:
+            self._prune()
+            return self._heap[0][DEADLINE] if self._heap else None
+
+    def _prune(self):
+        heap = self._heap
+        while heap and heap[0][MODEL] is None:
+            heappop(heap)
+            self._cancelled -= 1
+
+    def run_pending(self, now: float=None) -> int:
+        """ Fire every timeout due at ``now`` (the clock's current time by default) and return how many fired. """
+        if now is None:
+            now = self.clock()
+        fired = 0
+        while True:
+            with self._lock:
+                self._prune()
+                heap = self._heap
+                if not heap or heap[0][DEADLINE] > now:
+                    break
+                entry = heappop(heap)
+                del self._pending[(id(entry[MODEL]), entry[STATE])]
+            self._fire(entry)
+            fired += 1
+        return fired
+
+    def _fire(self, entry):
+        machine = self.machine
+        model, state, trigger = entry[MODEL], entry[STATE], entry[TRIGGER]
+        with self._lock:
+            # the model left and re-entered the state after the entry was popped, its new timeout is pending
+            if (id(model), state) in self._pending:
+                return
+        try:
+            if not machine.is_state(state, model):
+                return
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("%sState %s timed out, firing %s.", machine.id, state, trigger)
+            result = machine.events[trigger].trigger(model)
+            if inspect.isawaitable(result):
+                asyncio.ensure_future(result)
+        except Exception:
+            logger.exception("%sTimeout trigger %s from state %s failed.", machine.id, trigger, state)
+
+    def _rearm(self):
+        if self.driver == 'thread':
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='timeout-scheduler', daemon=True)
+                self._thread.start()
+        elif self.driver == 'asyncio':
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if self._loop is None:
+                # timeouts scheduled before the loop runs wait for the first one scheduled on it, or start()
+                if running is None:
+                    return
+                self._loop = running
+            if running is self._loop:
+                self._arm()
+            else:
+                self._loop.call_soon_threadsafe(self._arm)
+
+    def start(self, loop: asyncio.AbstractEventLoop=None):
+        """ Start the driver now instead of on the first timeout, on ``loop`` or the running event loop. """
+        if loop is not None:
+            self._loop = loop
+        self._closed = False
+        if self.driver == 'asyncio' and self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        self._rearm()
+
+    def _arm(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        deadline = self.next_deadline()
+        if deadline is not None and not self._closed:
+            self._handle = self._loop.call_later(max(0.0, deadline - self.clock()), self._on_timer)
+
+    def _on_timer(self):
+        self._handle = None
+        self.run_pending()
+        self._arm()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._closed:
+                    self._prune()
+                    if self._heap:
+                        delay = self._heap[0][DEADLINE] - self.clock()
+                        if delay <= 0:
+                            break
+                        self._wake.wait(delay)
+                    else:
+                        self._wake.wait()
+                if self._closed:
+                    return
+            self.run_pending()
+
+    def close(self):
+        """ Stop the driver; pending timeouts stay queued for ``run_pending``. """
+        with self._lock:
+            self._closed = True
+            self._wake.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
@@ -0,0 +1,122 @@
+from builtins import object
+from concurrent.futures import ProcessPoolExecutor
+
+import hashlib
+import logging
+import os
+import pickle
+
+from Core import Machine
+from StaticMethod import listify
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+# machines rebuilt inside a worker process, keyed by the digest of their spec
+_machines = {}
+
+
+def _rebuild(func, args, state=None, *_):
+    """ The inverse of ``__reduce_ex__`` for plain objects, ``__slots__`` included, as pickle does it. """
+    model = func(*args)
+    if state is None:
+        return model
+    setstate = getattr(model, '__setstate__', None)
+    if setstate is not None:
+        setstate(state)
+        return model
+    slots = None
+    if isinstance(state, tuple):
+        state, slots = state
+    if state:
+        model.__dict__.update(state)
+    for name, value in (slots or {}).items():
+        setattr(model, name, value)
+    return model
+
+
+def _run_shard(key, spec, payloads, batch):
+    machine = _machines.get(key)
+    if machine is None:
+        machine = _machines[key] = Machine.Machine.from_spec(spec)
+
+    models = []
+    for reduced, state in payloads:
+        model = _rebuild(*reduced)
+        machine.add_model(model, initial=state)
+        models.append(model)
+    try:
+        for index, trigger, args, kwargs in batch:
+            machine.events[trigger].trigger(models[index], *args, **kwargs)
+    finally:
+        machine.remove_model(models)
+    return [(i, model.state) for i, model in enumerate(models) if model.state != payloads[i][1]]
+
+
+class ShardedRunner(object):
+    """ Applies trigger batches to the models of a machine in a process pool. The models are split into
+        ``shards`` partitions; each worker rebuilds the machine once with ``Machine.from_spec(machine.get_spec())``,
+        receives the pickle state of its shard's models (``__slots__`` included) and sends back only
+        ``(index, state)`` pairs of the models whose state changed. Models must be picklable once the
+        machine's bound triggers are removed. """
+
+    __slots__ = 'machine', 'shards', 'executor', '_spec', '_key', '_bound'
+
+    def __init__(self, machine: Machine, shards: int=None, executor: ProcessPoolExecutor=None):
+        self.machine = machine
+        self.shards = shards or os.cpu_count() or 1
+        self.executor = executor if executor is not None else ProcessPoolExecutor(self.shards)
+        spec = machine.get_spec()
+        spec['compiled'] = True
+        spec['queued'] = False
+        spec['flyweight'] = True
+        self._spec = spec
+        self._key = hashlib.sha1(pickle.dumps(spec)).hexdigest()
+        self._bound = set(machine.events) | set('is_' + name for name in machine.states) |\
+            {'trigger', 'graph', 'get_graph'}
+
+    def _payload(self, model):
+        # the model's pickle state without the machine's per-instance bindings
+        reduced = model.__reduce_ex__(pickle.HIGHEST_PROTOCOL)
+        state = reduced[2] if len(reduced) > 2 else None
+        if state is not None:
+            slots = None
+            if isinstance(state, tuple):
+                state, slots = state
+            if state:
+                state = {k: v for k, v in state.items() if k not in self._bound}
+            state = (state, slots) if slots is not None else state
+        return (reduced[0], reduced[1], state), model.state
+
+    def run(self, batch: list) -> int:
+        """ Apply ``batch``, a list of ``(model, trigger)`` or ``(model, trigger, args, kwargs)`` items, in
+            order per model, and return the number of models whose state changed. """
+        shards = [([], {}, []) for _ in range(self.shards)]
+        for item in batch:
+            model, trigger = item[0], item[1]
+            args = item[2] if len(item) > 2 else ()
+            kwargs = item[3] if len(item) > 3 else {}
+            models, slots, ops = shards[(id(model) >> 4) % self.shards]
+            slot = slots.get(id(model))
+            if slot is None:
+                slot = slots[id(model)] = len(models)
+                models.append(model)
+            ops.append((slot, trigger, tuple(args), kwargs))
+
+        futures = [(models, self.executor.submit(_run_shard, self._key, self._spec,
+                                                 [self._payload(m) for m in models], ops))
+                   for models, _, ops in shards if ops]
+        changed = 0
+        for models, future in futures:
+            for index, state in future.result():
+                self.machine.set_state(state, model=models[index])
+                changed += 1
+        return changed
+
+    def dispatch(self, trigger: str, models: (list or object)=None, *args, **kwargs) -> int:
+        """ Fire ``trigger`` on every model (all of the machine's by default) across the pool. """
+        models = self.machine.models if models is None else listify(models)
+        return self.run([(model, trigger, args, kwargs) for model in models])
+
+    def shutdown(self, wait: bool=True):
+        self.executor.shutdown(wait)
@@ -9,34 +9,90 @@ logger.addHandler(logging.NullHandler())
 
 
 class State(object):
+    # joins the names of a compound state and its children
+    separator = '_'
+
     def __init__(self, name: str, on_enter:(str or list) =None, on_exit:(str or list) =None,
-                 ignore_invalid_triggers: bool =False):
+                 ignore_invalid_triggers: bool =False, accepting: bool =False, timeout: float =0,
+                 on_timeout: str =None):
+        if timeout and not on_timeout:
+            raise ValueError("State {} has a timeout but no on_timeout trigger.".format(name))
 
         self.name = name
         self.on_enter = listify(on_enter) if on_enter else []
         self.on_exit = listify(on_exit) if on_exit else []
         self.ignore_invalid_triggers = ignore_invalid_triggers
+        self.accepting = accepting
+        # seconds a model stays in the state before on_timeout fires on it, see Scheduler
+        self.timeout = timeout
+        self.on_timeout = on_timeout
+        self.parent = None
+        self.children = []
+        self.initial = None
+        # the state's ancestors from the root down, and the state itself
+        self.lineage = (self,)
 
     def __str__(self):
         return str(self.name) + "*/*" + str(self.ignore_invalid_triggers) + "*/*" + str(self.on_enter) + "*/*" +\
                 str(self.on_exit)
 
     def enter(self, event_data: EventData):
-        logger.debug("{}Entering state {}. Processing callbacks...".format(event_data.machine.id, self.name))
+        machine = event_data.machine
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%sEntering state %s. Processing callbacks...", machine.id, self.name)
+        if self.timeout:
+            machine.scheduler.schedule(event_data.model, self)
+        instruments = machine._instruments
         for oe in self.on_enter:
-            event_data.machine._callback(oe, event_data)
-        logger.info("%sEntered state %s", event_data.machine.id, self.name)
+            if instruments is None:
+                machine._callback(oe, event_data)
+            else:
+                instruments.callback(self, 'on_enter', oe, event_data)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("%sEntered state %s", machine.id, self.name)
 
     def exit(self, event_data: EventData):
-        logger.debug("{}Exiting state {}. Processing callbacks...".format(event_data.machine.id, self.name))
+        machine = event_data.machine
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%sExiting state %s. Processing callbacks...", machine.id, self.name)
+        if self.timeout:
+            machine.scheduler.cancel(event_data.model, self)
+        instruments = machine._instruments
         for oe in self.on_exit:
-            event_data.machine._callback(oe, event_data)
-        logger.info("{}Exited state {}".format(event_data.machine.id, self.name))
+            if instruments is None:
+                machine._callback(oe, event_data)
+            else:
+                instruments.callback(self, 'on_exit', oe, event_data)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("%sExited state %s", machine.id, self.name)
 
     def add_callback(self, trigger: str, func: str):
         callback_list = getattr(self, 'on_' + trigger)
         callback_list.append(func)
 
+    def add_child(self, child, initial: bool=False):
+        """ Nest ``child`` in this state. The first child is the initial one unless another is flagged. """
+        child.parent = self
+        self.children.append(child)
+        if initial or self.initial is None:
+            self.initial = child
+        for state in child.walk():
+            state.lineage = state.parent.lineage + (state,)
+
+    def walk(self):
+        """ The state and all its descendants, parents first. """
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    @property
+    def leaf(self):
+        """ The state a model ends up in when entering this one, following the initial children. """
+        state = self
+        while state.initial is not None:
+            state = state.initial
+        return state
+
 if __name__ == '__main__':
     s = State("drink")
     print(s)
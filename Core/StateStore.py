@@ -0,0 +1,199 @@
+from array import array
+from builtins import object
+from collections import Counter
+import logging
+
+from Core import Machine
+from Core import TransitionTable
+from StaticMethod import listify
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+class StateStore(object):
+    """ State ids of a population of models held in one int32 vector (NumPy when available, ``array``
+        otherwise), indexed by model slot. A trigger can advance every model with a plain transition in a
+        single gather over the machine's transition table.
+
+        A detached store is loaded from ``model.state`` and writes changed states back after a dispatch. A
+        machine created with ``state_store=True`` owns a bound store instead: its models read and write
+        ``model.state`` through a property on their flyweight class, so the vector is the only copy. """
+
+    __slots__ = 'machine', 'models', 'ids', 'size', 'bound', '_free', '_table', '_successors', '_callbacks',\
+                '_has_exit', '_has_enter'
+
+    def __init__(self, machine: Machine, models: (list or object)=None, bound: bool=False):
+        self.machine = machine
+        self.bound = bound
+        self.models = []
+        self.ids = self._allocate(0)
+        self.size = 0
+        self._free = []
+        self._table = None
+        self._successors = None
+        self._callbacks = None
+        self._has_exit = None
+        self._has_enter = None
+        if not bound:
+            state_ids = machine.table.state_ids
+            for model in (machine.models if models is None else listify(models)):
+                self.add(model, state_ids[model.state])
+
+    @staticmethod
+    def _allocate(size):
+        if np is not None:
+            return np.full(size, -1, dtype=np.int32)
+        return array('i', [-1]) * size
+
+    def add(self, model, sid: int) -> int:
+        if self._free:
+            slot = self._free.pop()
+            self.models[slot] = model
+        else:
+            slot = self.size
+            if slot == len(self.ids):
+                ids = self._allocate(max(16, 2 * slot))
+                ids[:slot] = self.ids[:slot]
+                self.ids = ids
+            self.models.append(model)
+            self.size += 1
+        self.ids[slot] = sid
+        return slot
+
+    def remove(self, slot: int):
+        self.ids[slot] = -1
+        self.models[slot] = None
+        self._free.append(slot)
+
+    def counts(self) -> dict:
+        """ Number of models per state name. """
+        names = self.machine.table.state_names
+        ids = self.ids[:self.size]
+        if np is not None:
+            counts = np.bincount(ids[ids >= 0], minlength=len(names)).tolist()
+        else:
+            found = Counter(ids)
+            counts = [found[sid] for sid in range(len(names))]
+        return dict(zip(names, counts))
+
+    def find(self, state: str) -> list:
+        """ Models currently in ``state``. """
+        sid = self.machine.table.state_ids[state]
+        ids = self.ids[:self.size]
+        if np is not None:
+            return [self.models[i] for i in np.flatnonzero(ids == sid)]
+        return [self.models[i] for i, s in enumerate(ids) if s == sid]
+
+    def snapshot(self) -> memoryview:
+        """ Read-only, zero-copy view of the state id of every slot (-1 for free slots). The view follows
+            later transitions until the store grows; copy it to keep a frozen snapshot. """
+        return memoryview(self.ids)[:self.size].toreadonly()
+
+    def _successors_of(self, table: TransitionTable):
+        if self._table is not table:
+            successors = np.array(table.successors, dtype=np.int32)
+            self._successors = successors.reshape(len(table.states), table.width)
+            self._table = table
+            self._callbacks = None
+        # callbacks can be added to states without recompiling the table, their number tells when to look again
+        callbacks = sum(len(s.on_exit) + len(s.on_enter) for s in table.states)
+        if self._callbacks != callbacks:
+            # the callbacks and timeouts of ancestors run as well, so nested states count them up their lineage
+            self._has_exit = np.fromiter((any(a.on_exit or a.timeout for a in s.lineage) for s in table.states),
+                                         dtype=bool, count=len(table.states))
+            self._has_enter = np.fromiter((any(a.on_enter or a.timeout for a in s.lineage) for s in table.states),
+                                          dtype=bool, count=len(table.states))
+            self._callbacks = callbacks
+        return self._successors
+
+    def dispatch(self, trigger: str, slots: list=None):
+        """ Fire ``trigger`` on every model of the store, or on the models in ``slots``, and return a boolean
+            array telling which models changed state. Conditional transitions and states with callbacks run
+            through the regular per model path. If ``trigger`` is invalid in the state of any model, a
+            MachineError is raised before any model moves. Transitions taken in bulk are counted by the
+            machine's Instruments but add no trigger latency. Requires numpy. """
+        if np is None:
+            raise ImportError('StateStore.dispatch requires numpy.')
+        machine = self.machine
+        event = _event(machine, trigger)
+
+        table = machine.table
+        if slots is None:
+            ids = self.ids[:self.size]
+        else:
+            slots = np.asarray(slots, dtype=np.intp)
+            ids = self.ids[slots]
+        dest = self._successors_of(table)[:, event.index][ids]
+        if self._free:
+            dest[ids < 0] = table.IGNORED
+
+        invalid = np.flatnonzero(dest == table.INVALID)
+        if len(invalid):
+            state = table.states[ids[invalid[0]]]
+            raise Machine.MachineError("{}Can't trigger event {} from state {}!".format(machine.id, trigger,
+                                                                                         state.name))
+
+        has_exit, has_enter = self._has_exit, self._has_enter
+        moved = dest >= 0
+        slow = dest == table.GUARDED
+        slow |= moved & (has_exit[ids] | has_enter[np.where(moved, dest, 0)])
+        fast = moved & ~slow
+
+        models = self.models if slots is None else [self.models[slot] for slot in slots]
+        names = table.state_names
+        journal = machine._journal
+        if journal is not None:
+            for i in np.flatnonzero(fast):
+                journal.record(models[i], trigger, names[ids[i]], names[dest[i]])
+        instruments = machine._instruments
+        if instruments is not None:
+            moves, counts = np.unique(ids[fast].astype(np.int64) * len(names) + dest[fast], return_counts=True)
+            for move, count in zip(moves.tolist(), counts.tolist()):
+                instruments.count(names[move // len(names)], trigger, names[move % len(names)], count)
+        ids[fast] = dest[fast]
+        if slots is not None:
+            # ids is a copy of the selected slots
+            self.ids[slots] = ids
+        if not self.bound:
+            for i in np.flatnonzero(fast):
+                models[i].state = names[ids[i]]
+
+        result = fast
+        for i in np.flatnonzero(slow):
+            model = models[i]
+            result[i] = event.trigger(model)
+            if not self.bound:
+                self.ids[i if slots is None else slots[i]] = table.state_ids[model.state]
+        return result
+
+
+def _event(machine: Machine, trigger: str):
+    if machine._transition_queue:
+        raise Machine.MachineError("Attempt to process events synchronously while transition queue is not empty!")
+    if trigger not in machine.events:
+        raise Machine.MachineError('Event "{}" is not registered.'.format(trigger))
+    return machine.events[trigger]
+
+
+def dispatch_each(machine: Machine, trigger: str, models: list):
+    """ Fire ``trigger`` on each of ``models`` through the regular path and return a boolean array telling
+        which models changed state, like ``StateStore.dispatch``; an invalid trigger raises before any model
+        moves as well. Requires numpy. """
+    if np is None:
+        raise ImportError('StateStore.dispatch_each requires numpy.')
+    event = _event(machine, trigger)
+    checked = set()
+    for model in models:
+        if model.state not in checked:
+            state = machine.get_state(model.state)
+            if not event.candidates(state) and not state.ignore_invalid_triggers:
+                raise Machine.MachineError("{}Can't trigger event {} from state {}!".format(machine.id, trigger,
+                                                                                             state.name))
+            checked.add(state.name)
+    fire = event.trigger
+    return np.fromiter((fire(model) for model in models), dtype=bool, count=len(models))
@@ -6,42 +6,102 @@ logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
 from builtins import object
+from time import perf_counter_ns
 
 from Core import EventData
 from Core.Condition import Condition
 
+# checks of a transition between two reorderings of its conditions on machines with adaptive_conditions
+REORDER_INTERVAL = 64
+
 
 class Transition(object):
-    __slots__ = 'source', 'dest', 'conditions', 'unless', 'before', 'after', 'prepare'
+    __slots__ = 'source', 'dest', 'conditions', 'unless', 'before', 'after', 'prepare', 'checks'
+
+    condition_cls = Condition
 
-    def __init__(self, source: str, dest: str, conditions:(str or list) =None):
+    def __init__(self, source: str, dest: str, conditions:(str or list) =None, unless:(str or list) =None):
 
         self.source = source
         self.dest = dest
 
+        self.checks = 0
         self.conditions = []
         if conditions is not None:
             for c in listify(conditions):
-                self.conditions.append(Condition(c))
+                self.conditions.append(self.condition_cls(c))
+        if unless is not None:
+            for u in listify(unless):
+                self.conditions.append(self.condition_cls(u, target=False))
 
     def execute(self, event_data: EventData):
-        logger.debug("%sInitiating transition from state %s to state %s...",
-                     event_data.machine.id, self.source, self.dest)
         machine = event_data.machine
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%sInitiating transition from state %s to state %s...", machine.id, self.source, self.dest)
+
+        if not self.check(event_data):
+            return False
+        self._change_state(event_data)
+        return True
 
+    def check(self, event_data: EventData) -> bool:
+        """ Whether all conditions hold, stopping at the first that fails. """
+        if event_data.machine.adaptive_conditions:
+            return self._check_adaptive(event_data)
         for c in self.conditions:
             if not c.check(event_data):
-                logger.debug("%sTransition condition failed: %s() does not " +
-                             "return %s. Transition halted.", event_data.machine.id, c.func, c.target)
+                self._failed(c, event_data)
                 return False
-        self._change_state(event_data)
         return True
 
+    def _check_adaptive(self, event_data):
+        conditions = self.conditions
+        passed = True
+        for c in conditions:
+            start = perf_counter_ns()
+            passed = c.check(event_data)
+            c.cost += perf_counter_ns() - start
+            c.calls += 1
+            if not passed:
+                c.failures += 1
+                self._failed(c, event_data)
+                break
+        self.checks += 1
+        if not self.checks % REORDER_INTERVAL and len(conditions) > 1:
+            # replaced rather than sorted in place, a concurrent check keeps iterating the old list
+            self.conditions = sorted(conditions, key=Condition.rank)
+        return passed
+
+    def _failed(self, condition, event_data):
+        machine = event_data.machine
+        if machine._instruments is not None:
+            machine._instruments.condition_failed(self, condition, event_data)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%sTransition condition failed: %s() does not return %s. Transition halted.",
+                         machine.id, condition.func, condition.target)
+
     def _change_state(self, event_data: EventData):
-        event_data.machine.get_state(self.source).exit(event_data)
-        event_data.machine.set_state(self.dest, event_data.model)
-        event_data.update(event_data.model)
-        event_data.machine.get_state(self.dest).enter(event_data)
+        machine = event_data.machine
+        if machine._hierarchy is not None:
+            self._traverse(machine._hierarchy.route(event_data.state.name, self.dest), event_data)
+            return
+        dest = machine.get_state(self.dest)
+        machine.get_state(self.source).exit(event_data)
+        event_data.model.state = dest.name
+        event_data.state = dest
+        dest.enter(event_data)
+
+    @staticmethod
+    def _traverse(route: tuple, event_data: EventData):
+        """ Follow an ``(exits, enters)`` route of Hierarchy.route; the model ends in the last state entered. """
+        exits, enters = route
+        for state in exits:
+            state.exit(event_data)
+        dest = enters[-1]
+        event_data.model.state = dest.name
+        event_data.state = dest
+        for state in enters:
+            state.enter(event_data)
 
     def add_callback(self, trigger: str, func: str):
         callback_list = getattr(self, trigger)
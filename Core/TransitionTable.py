@@ -0,0 +1,273 @@
+from builtins import object
+import logging
+
+from Core import Machine
+from Core import Transition
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+class TransitionTable(object):
+    """ Frozen, integer indexed view of a machine: cell ``state_id * width + event_id`` holds the
+        candidate transitions of that pair as ``(transition, source, dest, route)`` entries, or None. ``dest``
+        is the state the model ends up in; ``route`` is the ``(exits, enters)`` pair of Hierarchy.route when
+        the transition crosses compound states, and None when it only leaves ``source`` and enters ``dest``. """
+
+    INVALID = -1
+    IGNORED = -2
+    GUARDED = -3
+
+    __slots__ = 'machine', 'state_names', 'state_ids', 'states', 'event_names', 'event_ids', 'events',\
+                'width', 'cells', '_successors', '_symbol_rows', '_byte_rows'
+
+    def __init__(self, machine: Machine):
+        self.machine = machine
+        self.states = list(machine.states.values())
+        self.state_names = [s.name for s in self.states]
+        self.state_ids = {name: i for i, name in enumerate(self.state_names)}
+        self.events = list(machine.events.values())
+        self.event_names = [e.name for e in self.events]
+        self.event_ids = {name: i for i, name in enumerate(self.event_names)}
+        self.width = len(self.events)
+        self.cells = [None] * (len(self.states) * self.width)
+        self._successors = None
+        self._symbol_rows = None
+        self._byte_rows = None
+
+        for eid, event in enumerate(self.events):
+            event.index = eid
+            if machine._hierarchy is not None:
+                # inherited transitions and the routes of every cell are resolved here, not per trigger
+                for sid, state in enumerate(self.states):
+                    transitions = event.candidates(state)
+                    if transitions:
+                        self.cells[sid * self.width + eid] = tuple(self._entry(t, state) for t in transitions)
+                continue
+            for source, transitions in event.transitions.items():
+                sid = self.state_ids.get(source)
+                if sid is None or not transitions:
+                    continue
+                self.cells[sid * self.width + eid] = tuple(self._flat_entry(t, self.states[sid])
+                                                           for t in transitions)
+
+    def _entry(self, transition, source):
+        exits, enters = route = self.machine._hierarchy.route(source.name, self._resolve(transition.dest).name)
+        if exits == (source,) and len(enters) == 1 and not (source.timeout or enters[0].timeout):
+            route = None
+        return transition, source, enters[-1], route
+
+    def _flat_entry(self, transition, source):
+        # timed states get a route so that leaving and entering them always reaches the scheduler
+        dest = self._resolve(transition.dest)
+        return transition, source, dest, ((source,), (dest,)) if source.timeout or dest.timeout else None
+
+    def _resolve(self, name):
+        if name not in self.state_ids:
+            raise ValueError("State {} is not a registered state.".format(name))
+        return self.states[self.state_ids[name]]
+
+    def cell(self, state: str, event: str):
+        return self.cells[self.state_ids[state] * self.width + self.event_ids[event]]
+
+    @property
+    def successors(self):
+        """ Flat list parallel to ``cells`` with the destination id of every cell whose first candidate
+            is an unconditional plain Transition, or one of INVALID, IGNORED and GUARDED otherwise. """
+        if self._successors is None:
+            successors = []
+            for i, cell in enumerate(self.cells):
+                if cell is None:
+                    state = self.states[i // self.width]
+                    successors.append(self.IGNORED if state.ignore_invalid_triggers else self.INVALID)
+                    continue
+                t, _, dest, _ = cell[0]
+                if t.conditions or type(t) is not Transition.Transition:
+                    successors.append(self.GUARDED)
+                else:
+                    successors.append(self.state_ids[dest.name])
+            self._successors = successors
+        return self._successors
+
+    def _missing(self, state):
+        return self.IGNORED if state.ignore_invalid_triggers else self.INVALID
+
+    @property
+    def symbol_rows(self):
+        """ Per state, a dict mapping event names to successor codes. """
+        if self._symbol_rows is None:
+            successors = self.successors
+            self._symbol_rows = [dict(zip(self.event_names, successors[sid * self.width:(sid + 1) * self.width]))
+                                 for sid in range(len(self.states))]
+        return self._symbol_rows
+
+    @property
+    def byte_rows(self):
+        """ Per state, a list of 256 successor codes indexed by byte value; byte ``b`` fires event ``chr(b)``. """
+        if self._byte_rows is None:
+            columns = [(ord(name), eid) for eid, name in enumerate(self.event_names)
+                       if len(name) == 1 and ord(name) < 256]
+            successors = self.successors
+            rows = []
+            for sid, state in enumerate(self.states):
+                row = [self._missing(state)] * 256
+                for byte, eid in columns:
+                    row[byte] = successors[sid * self.width + eid]
+                rows.append(row)
+            self._byte_rows = rows
+        return self._byte_rows
+
+    def consume(self, symbols, sid: int):
+        """ Run the table as an automaton from state id ``sid`` over ``symbols``: a sequence of event names, a
+            string of single character event names (only when every event name is one character long) or a
+            buffer of unsigned bytes. Returns ``(sid, None)`` with the final state id, or ``(sid, symbol)`` with
+            the state and the symbol that was rejected. """
+        guarded = self.GUARDED
+        if isinstance(symbols, str):
+            if any(len(name) != 1 for name in self.event_names):
+                raise ValueError("A string of symbols needs single character event names, pass a sequence of "
+                                 "event names instead.")
+        elif not isinstance(symbols, (list, tuple)):
+            try:
+                view = memoryview(symbols)
+            except TypeError:
+                view = None
+            if view is not None:
+                if view.format != 'B' or view.ndim != 1:
+                    raise ValueError("Symbol buffers have to hold unsigned bytes, got format {!r}."
+                                     .format(view.format))
+                rows = self.byte_rows
+                for symbol in view:
+                    nxt = rows[sid][symbol]
+                    if nxt < 0:
+                        if nxt == guarded:
+                            self._guarded(sid, chr(symbol))
+                        if nxt == self.INVALID:
+                            return sid, chr(symbol)
+                        continue
+                    sid = nxt
+                return sid, None
+
+        rows = self.symbol_rows
+        missing = [self._missing(s) for s in self.states]
+        for symbol in symbols:
+            nxt = rows[sid].get(symbol, missing[sid])
+            if nxt < 0:
+                if nxt == guarded:
+                    self._guarded(sid, symbol)
+                if nxt == self.INVALID:
+                    return sid, symbol
+                continue
+            sid = nxt
+        return sid, None
+
+    def _guarded(self, sid, symbol):
+        raise Machine.MachineError("{}Event {} from state {} is conditional and can not be run as an automaton."
+                                   .format(self.machine.id, symbol, self.state_names[sid]))
+
+    def equivalence_classes(self, start: int, accepting) -> list:
+        """ Hopcroft partition refinement over the states reachable from state id ``start``, reading the table
+            as a DFA over event names (ignored triggers are self loops, invalid ones go to a dead state).
+            ``accepting`` is a set of state ids. Returns the blocks of equivalent state ids, dead ones excluded. """
+        successors = self.successors
+        width = self.width
+        if self.GUARDED in successors:
+            raise Machine.MachineError("{}Machine has conditional transitions and can not be minimized."
+                                       .format(self.machine.id))
+
+        reachable = [start]
+        seen = {start}
+        for sid in reachable:
+            for nxt in successors[sid * width:(sid + 1) * width]:
+                if nxt >= 0 and nxt not in seen:
+                    seen.add(nxt)
+                    reachable.append(nxt)
+
+        dead = -1
+        inverse = [dict() for _ in range(width)]
+        for sid in reachable:
+            for eid in range(width):
+                nxt = successors[sid * width + eid]
+                if nxt == self.IGNORED:
+                    nxt = sid
+                elif nxt < 0:
+                    nxt = dead
+                inverse[eid].setdefault(nxt, []).append(sid)
+        for eid in range(width):
+            inverse[eid].setdefault(dead, []).append(dead)
+
+        final = set(sid for sid in reachable if sid in accepting)
+        blocks = [b for b in (final, seen - final | {dead}) if b]
+        block_of = {sid: i for i, b in enumerate(blocks) for sid in b}
+        work = [min(range(len(blocks)), key=lambda i: len(blocks[i]))]
+        pending = set(work)
+        while work:
+            splitter = work.pop()
+            pending.discard(splitter)
+            splitter = set(blocks[splitter])
+            for eid in range(width):
+                predecessors = inverse[eid]
+                touched = {}
+                for sid in splitter:
+                    for p in predecessors.get(sid, ()):
+                        touched.setdefault(block_of[p], set()).add(p)
+                for b, members in touched.items():
+                    if len(members) == len(blocks[b]):
+                        continue
+                    blocks[b] -= members
+                    blocks.append(members)
+                    for p in members:
+                        block_of[p] = len(blocks) - 1
+                    if b in pending:
+                        split = len(blocks) - 1
+                    else:
+                        split = b if len(blocks[b]) < len(members) else len(blocks) - 1
+                    work.append(split)
+                    pending.add(split)
+        return [sorted(b) for b in blocks if dead not in b]
+
+    def trigger(self, event, model, args, kwargs) -> bool:
+        sid = self.state_ids.get(model.state)
+        if sid is None:
+            raise ValueError("State {} is not a registered state.".format(model.state))
+        cell = self.cells[sid * self.width + event.index]
+        if cell is None:
+            state = self.states[sid]
+            msg = "{}Can't trigger event {} from state {}!".format(self.machine.id, event.name, state.name)
+            if state.ignore_invalid_triggers:
+                logger.warning(msg)
+                return False
+            raise Machine.MachineError(msg)
+
+        event_data = None
+        try:
+            for t, source, dest, route in cell:
+                if type(t) is not Transition.Transition:
+                    if event_data is None:
+                        event_data = event._event_data(source, model, args, kwargs, len(cell) > 1)
+                    if t.execute(event_data):
+                        return True
+                    continue
+                if t.conditions:
+                    if event_data is None:
+                        event_data = event._event_data(source, model, args, kwargs, len(cell) > 1)
+                    if not t.check(event_data):
+                        continue
+                if route is not None:
+                    if event_data is None:
+                        event_data = event._event_data(source, model, args, kwargs, len(cell) > 1)
+                    t._traverse(route, event_data)
+                elif source.on_exit or dest.on_enter:
+                    if event_data is None:
+                        event_data = event._event_data(source, model, args, kwargs, len(cell) > 1)
+                    source.exit(event_data)
+                    model.state = dest.name
+                    event_data.state = dest
+                    dest.enter(event_data)
+                else:
+                    model.state = dest.name
+                return True
+            return False
+        finally:
+            if event_data is not None:
+                event._release(event_data)
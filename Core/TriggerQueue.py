@@ -0,0 +1,202 @@
+from builtins import object
+from collections import deque
+
+import logging
+import threading
+import time
+
+from Core import Machine
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+class TriggerQueue(object):
+    """ Bounded queue of ``(model, trigger, args, kwargs)`` items for bursts of triggers, drained in batches.
+
+        ``put_many`` enqueues a whole burst under one lock. When ``capacity`` is reached, ``policy`` decides:
+        ``'block'`` waits for room (up to ``timeout`` seconds, then raises MachineError), ``'reject'`` raises
+        MachineError without enqueuing any of the items, ``'drop_new'`` discards the items that don't fit and
+        ``'drop_old'`` discards the oldest queued items to make room; dropped items are counted in ``dropped``.
+
+        ``drain`` takes up to ``batch`` items at a time and fires them grouped by trigger, resolving each event
+        once per group. A model's triggers still run in the order they were queued. An exception fails only
+        its own item: it is passed to ``on_error(model, trigger, exception)``, or kept in ``errors`` (the
+        latest ``max_errors``) when no handler is given, and the drain goes on. ``processed`` counts the
+        items taken from the queue and ``failed`` those that raised. ``start`` drains from a background thread
+        instead. """
+
+    policies = ('block', 'reject', 'drop_new', 'drop_old')
+
+    __slots__ = 'machine', 'capacity', 'policy', 'timeout', 'batch', 'on_error', 'errors', 'processed', 'failed',\
+                'dropped', '_items', '_lock', '_not_full', '_not_empty', '_thread', '_running'
+
+    def __init__(self, machine: Machine, capacity: int=None, policy: str='block', timeout: float=None,
+                 batch: int=1024, on_error: callable=None, max_errors: int=100):
+        if policy not in self.policies:
+            raise ValueError("Unknown queue policy {}, expected one of {}.".format(policy, ', '.join(self.policies)))
+        self.machine = machine
+        self.capacity = capacity
+        self.policy = policy
+        self.timeout = timeout
+        self.batch = batch
+        self.on_error = on_error
+        self.errors = deque(maxlen=max_errors)
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._not_empty = threading.Condition(self._lock)
+        self._thread = None
+        self._running = False
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, model, trigger: str, *args, **kwargs) -> int:
+        return self.put_many([(model, trigger, args, kwargs)])
+
+    def put_many(self, items: list) -> int:
+        """ Enqueue ``(model, trigger)``, ``(model, trigger, args)`` or ``(model, trigger, args, kwargs)``
+            items and return how many were queued. """
+        items = [item if len(item) == 4 else (item[0], item[1], tuple(item[2]) if len(item) > 2 else (), {})
+                 for item in items]
+        queue = self._items
+        capacity = self.capacity
+        with self._lock:
+            if capacity is None or len(queue) + len(items) <= capacity:
+                queue.extend(items)
+                self._not_empty.notify()
+                return len(items)
+
+            if self.policy == 'reject':
+                raise Machine.MachineError("Trigger queue is full: {} of {} items queued, {} more offered."
+                                           .format(len(queue), capacity, len(items)))
+            if self.policy == 'drop_new':
+                accepted = items[:max(0, capacity - len(queue))]
+                queue.extend(accepted)
+                self.dropped += len(items) - len(accepted)
+            elif self.policy == 'drop_old':
+                overflow = len(queue) + len(items) - capacity
+                self.dropped += overflow
+                if len(items) > capacity:
+                    items = items[-capacity:]
+                    queue.clear()
+                else:
+                    for _ in range(overflow):
+                        queue.popleft()
+                queue.extend(items)
+                accepted = items
+            else:
+                accepted = self._put_blocking(items)
+            self._not_empty.notify()
+            return len(accepted)
+
+    def _put_blocking(self, items):
+        queue = self._items
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        start = 0
+        while start < len(items):
+            room = self.capacity - len(queue)
+            if room > 0:
+                queue.extend(items[start:start + room])
+                start += room
+                self._not_empty.notify()
+                continue
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0 or not self._not_full.wait(remaining):
+                raise Machine.MachineError("Trigger queue stayed full for {} seconds, {} of {} items queued."
+                                           .format(self.timeout, start, len(items)))
+        return items
+
+    def drain(self, limit: int=None) -> int:
+        """ Fire queued items until the queue is empty, or ``limit`` items were taken, and return how many
+            were taken. """
+        taken = 0
+        queue = self._items
+        while limit is None or taken < limit:
+            with self._lock:
+                count = min(len(queue), self.batch if limit is None else min(self.batch, limit - taken))
+                if not count:
+                    break
+                batch = [queue.popleft() for _ in range(count)]
+                self.processed += count
+                self._not_full.notify_all()
+            self._fire(batch)
+            taken += count
+        return taken
+
+    def _fire(self, batch):
+        # a model's n-th item of the batch goes to round n, so grouping a round by trigger keeps every
+        # model's triggers in order
+        rounds = []
+        seen = {}
+        for item in batch:
+            key = id(item[0])
+            n = seen.get(key, 0)
+            seen[key] = n + 1
+            if n == len(rounds):
+                rounds.append({})
+            group = rounds[n].get(item[1])
+            if group is None:
+                group = rounds[n][item[1]] = []
+            group.append(item)
+
+        events = self.machine.events
+        for groups in rounds:
+            for trigger, items in groups.items():
+                event = events.get(trigger)
+                if event is None:
+                    error = Machine.MachineError('Event "{}" is not registered.'.format(trigger))
+                    for model, _, _, _ in items:
+                        self._error(model, trigger, error)
+                    continue
+                fire = event.trigger
+                for model, _, args, kwargs in items:
+                    try:
+                        fire(model, *args, **kwargs)
+                    except Exception as error:
+                        self._error(model, trigger, error)
+
+    def _error(self, model, trigger, error):
+        # drains may run in several threads at once
+        with self._lock:
+            self.failed += 1
+            if self.on_error is None:
+                self.errors.append((model, trigger, error))
+        if self.on_error is not None:
+            self.on_error(model, trigger, error)
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%sQueued trigger %s failed: %r", self.machine.id, trigger, error)
+
+    def start(self):
+        """ Drain from a daemon thread as items arrive. """
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='trigger-queue', daemon=True)
+        self._thread.start()
+
+    def stop(self, drain: bool=True):
+        """ Stop the background thread, after emptying the queue unless ``drain`` is False. """
+        thread = self._thread
+        if thread is None:
+            return
+        with self._lock:
+            self._running = False
+            self._not_empty.notify_all()
+        thread.join()
+        self._thread = None
+        if drain:
+            self.drain()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while self._running and not self._items:
+                    self._not_empty.wait()
+                if not self._running:
+                    return
+            self.drain()
@@ -11,3 +11,7 @@ def get_trigger(model, trigger_name, *args, **kwargs):
     if func:
         return func(*args, **kwargs)
     raise AttributeError("Model has no trigger named %s" % trigger_name)
+
+
+def new_instance(cls):
+    return cls.__new__(cls)
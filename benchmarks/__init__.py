@@ -0,0 +1,2 @@
+""" Benchmarks of the Core package. Run them with ``python -m benchmarks.run`` from the repository root and
+    compare two result files with ``python -m benchmarks.compare``. """
@@ -0,0 +1,52 @@
+""" Memory allocated per trigger, measured with tracemalloc against an empty loop of the same shape.
+
+    Target: a plain or guarded transition of a machine that is neither queued nor ``send_event`` retains
+    nothing, and the transient peak of thousands of triggers stays within ``PEAK_BUDGET`` bytes above the
+    empty loop, i.e. it does not grow with the number of triggers. """
+from Core.Machine import Machine
+from benchmarks.common import Model, result, traced_bytes
+
+PEAK_BUDGET = 1024
+
+
+def _model(compiled, flyweight, conditions):
+    transitions = [['go', 'a', 'b'], ['back', 'b', 'a']]
+    if conditions:
+        for t in transitions:
+            t.append('passes')
+    model = Model()
+    Machine(model=model, states=['a', 'b'], initial='a', transitions=transitions, compiled=compiled,
+            flyweight=flyweight)
+    return model
+
+
+def _loop(step, n):
+    def loop():
+        for _ in range(n):
+            step()
+    for _ in range(1000):
+        step()
+    return loop
+
+
+def run(quick: bool=False) -> list:
+    n = 2000 if quick else 20000
+    _, baseline = traced_bytes(_loop(lambda: (None, None), n))
+    results = []
+    for compiled in (False, True):
+        for flyweight in (False, True):
+            for conditions in (False, True):
+                model = _model(compiled, flyweight, conditions)
+                retained, peak = traced_bytes(_loop(lambda: (model.go(), model.back()), n))
+                params = {'compiled': compiled, 'flyweight': flyweight, 'conditions': conditions}
+                results.append(result('allocations', params, 'retained_bytes_per_trigger', retained / (2 * n),
+                                      'B', False))
+                results.append(result('allocations', params, 'peak_bytes', max(0, peak - baseline), 'B', False))
+    return results
+
+
+def check(results: list) -> list:
+    """ The measurements that miss the target. """
+    return [r for r in results if r['benchmark'] == 'allocations' and
+            (r['metric'] == 'retained_bytes_per_trigger' and r['value'] >= 1 or
+             r['metric'] == 'peak_bytes' and r['value'] > PEAK_BUDGET)]
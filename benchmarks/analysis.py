@@ -0,0 +1,23 @@
+""" Time of ``Machine.analyze`` and ``Machine.optimize`` on definitions where half of the transitions are
+    shadowed, as happens when a ``'*'`` fallback is declared after the regular transitions. """
+from Core.Machine import Machine
+from benchmarks.common import result, time_per_call
+
+
+def spec(transitions: int) -> dict:
+    size = transitions // 2
+    states = [str(i) for i in range(size)]
+    listing = [['next', states[i], states[(i + 1) % size]] for i in range(size)]
+    listing.append(['next', '*', states[0]])
+    return {'states': states, 'initial': states[0], 'transitions': listing}
+
+
+def run(quick: bool=False) -> list:
+    results = []
+    for transitions in (10000,) if quick else (10000, 100000):
+        machine = Machine.from_spec(spec(transitions))
+        for step in ('analyze', 'optimize'):
+            seconds = time_per_call(getattr(machine, step), repeat=3, min_time=0.1, collect=True)
+            results.append(result('analysis', {'transitions': transitions, 'step': step}, 'seconds', seconds, 's',
+                                  False))
+    return results
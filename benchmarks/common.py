@@ -0,0 +1,42 @@
+import gc
+import timeit
+import tracemalloc
+
+
+class Model(object):
+    """ Plain model for the benchmarks; ``passes`` and ``fails`` serve as conditions. """
+
+    def passes(self):
+        return True
+
+    def fails(self):
+        return False
+
+
+def result(benchmark: str, params: dict, metric: str, value: float, unit: str, higher_is_better: bool=True):
+    """ One machine readable measurement. ``benchmark`` and ``params`` identify it across runs. """
+    return {'benchmark': benchmark, 'params': params, 'metric': metric, 'value': value, 'unit': unit,
+            'higher_is_better': higher_is_better}
+
+
+def time_per_call(func: callable, repeat: int=5, min_time: float=0.2, collect: bool=False) -> float:
+    """ Best of ``repeat`` runs of ``func`` in seconds per call, every run lasting at least ``min_time``. The
+        cyclic garbage collector is paused while timing, as timeit does, unless ``collect`` is set. """
+    timer = timeit.Timer(func, 'import gc; gc.enable()' if collect else 'pass')
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat, number)) / number
+
+
+def traced_bytes(func: callable):
+    """ Bytes retained and transient peak bytes allocated while running ``func``. """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return current - before, peak - before
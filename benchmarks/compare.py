@@ -0,0 +1,57 @@
+""" Compare two result files of ``benchmarks.run``.
+
+    python -m benchmarks.compare base.json new.json [--threshold 0.1]
+
+    Prints the relative change of every measurement present in both files and exits with 1 when one of
+    them got worse by more than ``threshold``. """
+import argparse
+import json
+import sys
+
+
+def _key(r):
+    return r['benchmark'], r['metric'], tuple(sorted(r['params'].items()))
+
+
+def compare(base: dict, new: dict) -> list:
+    """ ``(base result, new result, change)`` for every measurement of both, where a positive change is an
+        improvement. """
+    previous = {_key(r): r for r in base['results']}
+    changes = []
+    for r in new['results']:
+        old = previous.get(_key(r))
+        if old is None or not old['value']:
+            continue
+        change = (r['value'] - old['value']) / old['value']
+        changes.append((old, r, change if r['higher_is_better'] else -change))
+    return changes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files.')
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative slowdown counted as regression')
+    options = parser.parse_args(argv)
+
+    with open(options.base) as f:
+        base = json.load(f)
+    with open(options.new) as f:
+        new = json.load(f)
+
+    regressions = 0
+    for old, r, change in compare(base, new):
+        params = ' '.join('{}={}'.format(k, v) for k, v in r['params'].items())
+        flag = ''
+        if change < -options.threshold:
+            flag = 'REGRESSION'
+            regressions += 1
+        print('{:<12} {:<48} {:<28} {:>12.6g} -> {:<12.6g} {:+7.1%} {}'.format(
+            r['benchmark'], params, r['metric'], old['value'], r['value'], change, flag))
+    print('{} {} ({}) against {} ({})'.format(regressions, 'regression' if regressions == 1 else 'regressions',
+                                              new.get('revision'), base.get('revision'), options.threshold))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
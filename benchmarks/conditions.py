@@ -0,0 +1,32 @@
+""" Transitions guarded by many conditions: ``candidates`` transitions share the trigger and source, all but
+    the last fail on their final condition, and every transition checks ``conditions`` conditions. The
+    ``guards`` runs compare plain checks with memoized and adaptive ones on four candidates of four conditions. """
+from Core.Machine import Machine
+from benchmarks.common import Model, result, time_per_call
+
+
+def run(quick: bool=False) -> list:
+    results = []
+    for candidates in (1, 4):
+        for conditions in (1, 4, 16):
+            for compiled in (False, True):
+                model = Model()
+                machine = Machine(model=model, states=['a', 'b'], initial='a', compiled=compiled)
+                for i in range(candidates):
+                    guards = ['passes'] * (conditions - 1) + ['passes' if i == candidates - 1 else 'fails']
+                    machine.add_transition('go', 'a', 'b', conditions=guards)
+                machine.add_transition('back', 'b', 'a')
+                seconds = time_per_call(lambda: (model.go(), model.back())) / 2
+                params = {'candidates': candidates, 'conditions': conditions, 'compiled': compiled}
+                results.append(result('conditions', params, 'triggers_per_sec', 1 / seconds, 'triggers/s'))
+
+    for mode in ('plain', 'memoize', 'adaptive'):
+        model = Model()
+        machine = Machine(model=model, states=['a', 'b'], initial='a', compiled=True,
+                          memoize_conditions=mode == 'memoize', adaptive_conditions=mode == 'adaptive')
+        for i in range(4):
+            machine.add_transition('go', 'a', 'b', conditions=['passes'] * 3 + ['passes' if i == 3 else 'fails'])
+        machine.add_transition('back', 'b', 'a')
+        seconds = time_per_call(lambda: (model.go(), model.back())) / 2
+        results.append(result('guards', {'mode': mode}, 'triggers_per_sec', 1 / seconds, 'triggers/s'))
+    return results
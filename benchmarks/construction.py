@@ -0,0 +1,45 @@
+""" Cold start cost: importing ``Core.Machine`` in a fresh interpreter, and building a machine from a spec
+    through the constructor against ``Machine.from_spec`` and against mapping its ``MachineImage``. """
+import os
+import subprocess
+import sys
+import tempfile
+
+from Core.Machine import Machine
+from Core.MachineImage import MachineImage
+from benchmarks.common import result, time_per_call
+
+IMPORT = 'import time; t = time.perf_counter(); import Core.Machine; print(time.perf_counter() - t)'
+
+
+def spec(size: int) -> dict:
+    states = [str(i) for i in range(size)]
+    transitions = [['next', states[i], states[(i + 1) % size]] for i in range(size)]
+    transitions.append(['reset', '*', states[0]])
+    return {'states': states, 'initial': states[0], 'transitions': transitions}
+
+
+def run(quick: bool=False) -> list:
+    seconds = min(float(subprocess.check_output([sys.executable, '-c', IMPORT])) for _ in range(3 if quick else 10))
+    results = [result('construction', {'step': 'import'}, 'seconds', seconds, 's', False)]
+    for size in (10, 1000) if quick else (10, 1000, 20000):
+        definition = spec(size)
+        for name, build in (('constructor', lambda: Machine(**definition)),
+                            ('from_spec', lambda: Machine.from_spec(definition))):
+            seconds = time_per_call(build, repeat=3, min_time=0.1, collect=True)
+            results.append(result('construction', {'states': size, 'step': name}, 'seconds', seconds, 's', False))
+
+        handle, path = tempfile.mkstemp(suffix='.img')
+        os.close(handle)
+        try:
+            MachineImage.dump(Machine.from_spec(definition), path)
+
+            def load():
+                image = MachineImage.load(path)
+                image.run(['next'])
+                image.close()
+            seconds = time_per_call(load, repeat=3, min_time=0.1, collect=True)
+            results.append(result('construction', {'states': size, 'step': 'image'}, 'seconds', seconds, 's', False))
+        finally:
+            os.remove(path)
+    return results
@@ -0,0 +1,35 @@
+""" Overhead of ``GraphMachine`` per transition against a plain Machine, before and after the model's graph
+    was requested, and the cost of building the graph. """
+from Core.Diagrams import Graph
+from Core.Machine import Machine
+from benchmarks.common import Model, result, time_per_call
+
+
+def run(quick: bool=False) -> list:
+    try:
+        Graph._pgv()
+    except ImportError:
+        return []
+    from Core.Diagrams.GraphMachine import GraphMachine
+
+    results = []
+    for size in (10, 100) if quick else (10, 100, 1000):
+        states = [str(i) for i in range(size)]
+        transitions = [['next', states[i], states[(i + 1) % size]] for i in range(size)]
+        variants = [('Machine', Machine, {}), ('GraphMachine', GraphMachine, {}),
+                    ('GraphMachine_shown', GraphMachine, {})]
+        for name, cls, kwargs in variants:
+            model = Model()
+            cls(model=model, states=states, initial=states[0], transitions=transitions, **kwargs)
+            if name.startswith('GraphMachine_'):
+                # transitions only update the overlay, whether or not the graph was shown
+                model.get_graph()
+            seconds = time_per_call(model.next, repeat=3, min_time=0.1)
+            results.append(result('diagrams', {'states': size, 'machine': name},
+                                  'triggers_per_sec', 1 / seconds, 'triggers/s'))
+
+        machine = GraphMachine(states=states, initial=states[0], transitions=transitions)
+        seconds = time_per_call(lambda: Graph.Graph(machine).get_graph(machine.title), repeat=3, min_time=0.1)
+        results.append(result('diagrams', {'states': size, 'machine': 'build_graph'},
+                              'seconds_per_graph', seconds, 's', False))
+    return results
@@ -0,0 +1,57 @@
+""" Cost of journaling: triggers per second with and without a journal, and the time to restore a population
+    of models from a snapshot plus a log holding one transition per model. """
+import os
+import shutil
+import tempfile
+
+from Core.Machine import Machine
+from benchmarks.common import Model, result, time_per_call
+
+STATES = ['a', 'b', 'c']
+TRANSITIONS = [['next', 'a', 'b'], ['next', 'b', 'c'], ['next', 'c', 'a']]
+
+
+def population(count: int):
+    models = []
+    for i in range(count):
+        model = Model()
+        model.id = i
+        models.append(model)
+    return models
+
+
+def run(quick: bool=False) -> list:
+    results = []
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'journal')
+    try:
+        for journaled in (False, True):
+            model = population(1)[0]
+            machine = Machine(model=model, states=STATES, initial='a', transitions=TRANSITIONS, compiled=True)
+            if journaled:
+                machine.journal(path, snapshot_every=0)
+            seconds = time_per_call(model.next)
+            machine.journal()
+            results.append(result('journal', {'journaled': journaled}, 'triggers_per_sec', 1 / seconds,
+                                  'triggers/s'))
+            if os.path.exists(path):
+                os.remove(path)
+
+        count = 100000 if quick else 1000000
+        models = population(count)
+        machine = Machine(states=STATES, initial='a', transitions=TRANSITIONS, compiled=True, flyweight=True)
+        machine.add_model(models)
+        journal = machine.journal(path, snapshot_every=0)
+        journal.snapshot()
+        for model in models:
+            model.next()
+        machine.journal()
+
+        restored = Machine(states=STATES, initial='a', transitions=TRANSITIONS, compiled=True, flyweight=True)
+        fresh = population(count)
+        restored.add_model(fresh)
+        seconds = time_per_call(lambda: restored.restore(path), repeat=3, min_time=0.1)
+        results.append(result('journal', {'models': count}, 'restore_seconds', seconds, 's', False))
+    finally:
+        shutil.rmtree(directory)
+    return results
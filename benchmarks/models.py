@@ -0,0 +1,33 @@
+""" Cost of ``Machine.add_model``: time and retained memory per model, for each binding mode. """
+from Core.Machine import Machine
+from benchmarks.common import Model, result, time_per_call, traced_bytes
+
+MODES = {'instance': {}, 'flyweight': {'flyweight': True}, 'state_store': {'state_store': True}}
+
+
+def _machine(states, **kwargs):
+    names = [str(i) for i in range(states)]
+    transitions = [['next', names[i], names[(i + 1) % states]] for i in range(states)]
+    return Machine(states=names, initial=names[0], transitions=transitions, **kwargs)
+
+
+def run(quick: bool=False) -> list:
+    count = 1000 if quick else 10000
+    results = []
+    for states in (10, 100):
+        for mode, kwargs in MODES.items():
+            params = {'states': states, 'mode': mode}
+            machine = _machine(states, **kwargs)
+
+            def add():
+                model = Model()
+                machine.add_model(model)
+                machine.remove_model(model)
+            seconds = time_per_call(add, repeat=3, min_time=0.1)
+            results.append(result('add_model', params, 'seconds_per_model', seconds, 's', False))
+
+            machine = _machine(states, **kwargs)
+            models = [Model() for _ in range(count)]
+            retained, _ = traced_bytes(lambda: machine.add_model(models))
+            results.append(result('add_model', params, 'bytes_per_model', retained / count, 'B', False))
+    return results
@@ -0,0 +1,49 @@
+""" A protocol of ``groups`` phases with ``size`` steps each, modelled with compound states against the same
+    protocol flattened by hand: every phase can be aborted, which the nested machine declares once per
+    phase and the flat one once per step. Reports declared transitions, retained memory and triggers per
+    second of a step within a phase and of an abort crossing the hierarchy. """
+from Core.Machine import Machine
+from benchmarks.common import Model, result, time_per_call, traced_bytes
+
+
+def nested(groups: int, size: int, **kwargs):
+    steps = [str(i) for i in range(size)]
+    states = ['failed'] + [{'name': 'p{}'.format(g), 'children': steps} for g in range(groups)]
+    transitions = [['abort', 'p{}'.format(g), 'failed'] for g in range(groups)]
+    transitions += [['step', 'p{}_{}'.format(g, steps[i]), 'p{}_{}'.format(g, steps[(i + 1) % size])]
+                    for g in range(groups) for i in range(size)]
+    transitions.append(['retry', 'failed', 'p0'])
+    return Machine(states=states, initial='p0', transitions=transitions, **kwargs)
+
+
+def flat(groups: int, size: int, **kwargs):
+    names = [['p{}_{}'.format(g, i) for i in range(size)] for g in range(groups)]
+    transitions = [['abort', name, 'failed'] for phase in names for name in phase]
+    transitions += [['step', phase[i], phase[(i + 1) % size]] for phase in names for i in range(size)]
+    transitions.append(['retry', 'failed', 'p0_0'])
+    return Machine(states=['failed'] + [name for phase in names for name in phase], initial='p0_0',
+                   transitions=transitions, **kwargs)
+
+
+def run(quick: bool=False) -> list:
+    results = []
+    for groups, size in ((10, 10),) if quick else ((10, 10), (50, 20)):
+        for layout, build in (('nested', nested), ('flat', flat)):
+            params = {'groups': groups, 'size': size, 'layout': layout}
+            machine = build(groups, size)
+            declared = sum(len(ts) for event in machine.events.values() for ts in event.transitions.values())
+            results.append(result('nested', params, 'transitions', declared, 'transitions', False))
+            retained, _ = traced_bytes(lambda: build(groups, size))
+            results.append(result('nested', params, 'machine_bytes', retained, 'B', False))
+
+            for compiled in (False, True):
+                model = Model()
+                build(groups, size, compiled=compiled).add_model(model)
+                params = dict(params, compiled=compiled)
+                seconds = time_per_call(model.step)
+                results.append(result('nested', dict(params, trigger='step'), 'triggers_per_sec', 1 / seconds,
+                                      'triggers/s'))
+                seconds = time_per_call(lambda: (model.abort(), model.retry())) / 2
+                results.append(result('nested', dict(params, trigger='abort'), 'triggers_per_sec', 1 / seconds,
+                                      'triggers/s'))
+    return results
@@ -0,0 +1,17 @@
+""" Structural queries: ``get_triggers`` for one state of a machine with many events, and shortest paths. """
+from Core.Machine import Machine
+from benchmarks.common import result, time_per_call
+
+
+def run(quick: bool=False) -> list:
+    results = []
+    for events in (10, 1000) if quick else (10, 1000, 10000):
+        states = [str(i) for i in range(100)]
+        transitions = [['e{}'.format(i), states[i % 100], states[(i + 1) % 100]] for i in range(events)]
+        machine = Machine.from_spec({'states': states, 'initial': states[0], 'transitions': transitions})
+        seconds = time_per_call(lambda: machine.get_triggers(states[0]))
+        results.append(result('queries', {'events': events, 'query': 'get_triggers'}, 'seconds', seconds, 's',
+                              False))
+        seconds = time_per_call(lambda: machine.path(states[0], states[-1]))
+        results.append(result('queries', {'events': events, 'query': 'path'}, 'seconds', seconds, 's', False))
+    return results
@@ -0,0 +1,36 @@
+""" Queued against unqueued processing of triggers, with and without the compiled table and instruments, and
+    bursts pushed through a TriggerQueue with ``put_many`` and ``drain``. """
+from Core.Machine import Machine
+from Core.TriggerQueue import TriggerQueue
+from benchmarks.common import Model, result, time_per_call
+
+
+def run(quick: bool=False) -> list:
+    results = []
+    for queued in (False, True):
+        for compiled in (False, True):
+            for instrumented in (False, True):
+                model = Model()
+                machine = Machine(model=model, states=['a', 'b'], initial='a', queued=queued, compiled=compiled,
+                                  transitions=[['go', 'a', 'b'], ['back', 'b', 'a']])
+                if instrumented:
+                    machine.instrument()
+                seconds = time_per_call(lambda: (model.go(), model.back())) / 2
+                params = {'queued': queued, 'compiled': compiled, 'instrumented': instrumented}
+                results.append(result('queued', params, 'triggers_per_sec', 1 / seconds, 'triggers/s'))
+
+    burst = 10000 if quick else 50000
+    for compiled in (False, True):
+        models = [Model() for _ in range(1000)]
+        machine = Machine(model=models, states=['a', 'b'], initial='a', compiled=compiled, flyweight=True,
+                          transitions=[['go', 'a', 'b'], ['back', 'b', 'a']])
+        items = [(models[i % len(models)], 'go' if i // len(models) % 2 == 0 else 'back') for i in range(burst)]
+        queue = TriggerQueue(machine)
+
+        def bulk():
+            queue.put_many(items)
+            queue.drain()
+        seconds = time_per_call(bulk, repeat=3, min_time=0.1) / burst
+        results.append(result('queued', {'bulk': burst, 'compiled': compiled}, 'triggers_per_sec', 1 / seconds,
+                              'triggers/s'))
+    return results
@@ -0,0 +1,62 @@
+""" Run the benchmark suites and write their results as JSON.
+
+    python -m benchmarks.run [--quick] [--only triggers,queued] [--output results.json]
+
+    The output carries the git revision and interpreter so that files of different commits can be compared
+    with ``python -m benchmarks.compare``. The run fails when the allocation targets are missed. """
+import argparse
+import datetime
+import importlib
+import json
+import platform
+import subprocess
+import sys
+
+SUITES = ['construction', 'queries', 'triggers', 'models', 'queued', 'conditions', 'nested', 'journal', 'analysis',
+          'timeouts', 'diagrams', 'allocations']
+
+
+def revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def describe(r):
+    params = ' '.join('{}={}'.format(k, v) for k, v in r['params'].items())
+    return '{:<12} {:<48} {:<28} {:>14.6g} {}'.format(r['benchmark'], params, r['metric'], r['value'], r['unit'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the Core benchmarks.')
+    parser.add_argument('--quick', action='store_true', help='smaller sizes, for a smoke run')
+    parser.add_argument('--only', help='comma separated suites, out of ' + ', '.join(SUITES))
+    parser.add_argument('--output', help='write the results to this JSON file')
+    options = parser.parse_args(argv)
+
+    suites = options.only.split(',') if options.only else SUITES
+    results = []
+    for name in suites:
+        if name not in SUITES:
+            parser.error('unknown suite {}'.format(name))
+        for r in importlib.import_module('benchmarks.' + name).run(options.quick):
+            print(describe(r))
+            results.append(r)
+
+    if options.output:
+        report = {'revision': revision(), 'python': platform.python_version(),
+                  'implementation': platform.python_implementation(), 'machine': platform.machine(),
+                  'date': datetime.datetime.now().isoformat(), 'quick': options.quick, 'results': results}
+        with open(options.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    from benchmarks import allocations
+    missed = allocations.check(results)
+    for r in missed:
+        print('allocation target missed: ' + describe(r), file=sys.stderr)
+    return 1 if missed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
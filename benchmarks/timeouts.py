@@ -0,0 +1,42 @@
+""" Timed states with one Scheduler per machine: bytes retained per pending timeout, the cost of a trigger
+    that enters or leaves a timed state, and how fast due timeouts fire, for a population of models that all
+    wait in a timed state at once. """
+import time
+
+from Core.Machine import Machine
+from Core.Scheduler import Scheduler
+from benchmarks.common import Model, result, time_per_call, traced_bytes
+
+STATES = ['idle', {'name': 'active', 'timeout': 3600, 'on_timeout': 'expire'}, 'expired']
+TRANSITIONS = [['login', 'idle', 'active'], ['logout', 'active', 'idle'], ['expire', 'active', 'expired']]
+
+
+def _machine(models):
+    machine = Machine(states=STATES, initial='idle', transitions=TRANSITIONS, compiled=True, flyweight=True)
+    machine.scheduler = Scheduler(machine, 'manual')
+    machine.add_model(models)
+    return machine
+
+
+def run(quick: bool=False) -> list:
+    count = 20000 if quick else 200000
+    models = [Model() for _ in range(count)]
+    machine = _machine(models)
+
+    def login():
+        for model in models:
+            model.login()
+    retained, _ = traced_bytes(login)
+    results = [result('timeouts', {'models': count}, 'bytes_per_pending_timeout', retained / count, 'B', False)]
+
+    model = models[0]
+    model.logout()
+    results.append(result('timeouts', {'models': count}, 'enter_leave_per_sec',
+                          2 / time_per_call(lambda: (model.login(), model.logout())), 'triggers/s'))
+
+    scheduler = machine.scheduler
+    start = time.perf_counter()
+    fired = scheduler.run_pending(scheduler.clock() + 7200)
+    seconds = time.perf_counter() - start
+    results.append(result('timeouts', {'models': count}, 'fired_per_sec', fired / seconds, 'timeouts/s'))
+    return results
@@ -0,0 +1,25 @@
+""" Triggers per second through ``Event.trigger`` on a ring of states, for growing machine sizes. """
+from Core.Machine import Machine
+from benchmarks.common import Model, result, time_per_call
+
+SIZES = [10, 1000, 10000, 100000]
+
+
+def ring(size: int, **kwargs):
+    states = [str(i) for i in range(size)]
+    transitions = [['next', states[i], states[(i + 1) % size]] for i in range(size)]
+    model = Model()
+    machine = Machine(model=model, states=states, initial=states[0], transitions=transitions, **kwargs)
+    return machine, model
+
+
+def run(quick: bool=False) -> list:
+    results = []
+    for size in SIZES[:2] if quick else SIZES:
+        for compiled in (False, True):
+            machine, model = ring(size, compiled=compiled, flyweight=True)
+            event = machine.events['next']
+            seconds = time_per_call(lambda: event.trigger(model))
+            results.append(result('triggers', {'states': size, 'compiled': compiled},
+                                  'triggers_per_sec', 1 / seconds, 'triggers/s'))
+    return results
@@ -25,7 +25,7 @@ class Matter(object):
 
     # graph object is created by the machine
     def show_graph(self, name: str):
-        self.graph.draw('state' + name + '.png', prog='dot')
+        self.get_graph().draw('state' + name + '.png', prog='dot')
 
 states=[str(0), str(1)]
 transitions = [
@@ -0,0 +1,84 @@
+from Core.Machine import Machine, MachineError
+
+
+class Matter(object):
+    def __init__(self):
+        self.checked = []
+
+    def is_valid(self):
+        self.checked.append('is_valid')
+        return True
+
+    def is_cold(self):
+        self.checked.append('is_cold')
+        return False
+
+
+states = ['solid', 'liquid', 'gas', 'orphan']
+transitions = [
+    ['melt', 'solid', 'liquid'],
+    ['melt', 'solid', 'gas'],
+    ['evaporate', 'liquid', 'gas', 'is_valid'],
+    ['evaporate', 'liquid', 'solid', ['is_valid', 'is_cold']],
+    {'trigger': 'freeze', 'source': 'liquid', 'dest': 'solid', 'conditions': 'is_valid', 'unless': 'is_valid'},
+    ['thaw', 'orphan', 'liquid'],
+    ['cool', 'gas', 'liquid'],
+]
+
+
+def fire(model, trigger):
+    try:
+        return getattr(model, trigger)(), model.state
+    except MachineError:
+        return 'error', model.state
+
+
+def test_report():
+    report = Machine(states=states, initial='solid', transitions=transitions).analyze()
+    assert report['unreachable_states'] == ['orphan']
+    assert report['dead_events'] == ['freeze', 'thaw']
+    assert [t['dest'] for t in report['duplicate_transitions']] == []
+    assert [(t['trigger'], t['dest']) for t in report['shadowed_transitions']] == [('melt', 'gas'),
+                                                                                   ('evaporate', 'solid')]
+    assert report['unsatisfiable_transitions'][0]['trigger'] == 'freeze'
+
+
+def test_optimize_drops_redundant_candidates():
+    machine = Machine(states=states, initial='solid', transitions=transitions)
+    optimized = machine.optimize()
+    assert 'orphan' not in optimized.states
+    assert len(optimized.events['melt'].transitions['solid']) == 1
+    assert len(optimized.events['evaporate'].transitions['liquid']) == 1
+    assert optimized.events['melt'].transitions['solid'][0].conditions == []
+    assert optimized.run(['melt']) == machine.run(['melt']) == 'liquid'
+
+
+def test_optimize_keeps_trigger_results():
+    paths = [['melt', 'freeze', 'evaporate', 'thaw', 'cool', 'melt'], ['thaw', 'melt', 'melt', 'evaporate'],
+             ['cool', 'melt', 'freeze', 'freeze', 'evaporate', 'freeze', 'cool', 'thaw']]
+    for compiled in (False, True):
+        machine = Machine(states=states, initial='solid', transitions=transitions, compiled=compiled)
+        optimized = machine.optimize()
+        assert list(optimized.events) == ['melt', 'evaporate', 'freeze', 'cool', 'thaw']
+        for path in paths:
+            before, after = Matter(), Matter()
+            machine.add_model(before)
+            optimized.add_model(after)
+            assert [fire(before, t) for t in path] == [fire(after, t) for t in path], path
+            assert before.checked == after.checked
+
+
+def test_optimize_keeps_ignored_triggers():
+    ignoring = [{'name': 'solid', 'ignore_invalid_triggers': True}] + states[1:]
+    machine = Machine(states=ignoring, initial='solid', transitions=transitions)
+    model = Matter()
+    machine.optimize(model=model)
+    assert model.thaw() is False and model.state == 'solid'
+    assert model.trigger('freeze') is False
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
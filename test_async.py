@@ -0,0 +1,53 @@
+import asyncio
+
+from Core.AsyncMachine import AsyncMachine
+
+
+states = ['solid', 'liquid', 'gas']
+transitions = [['melt', 'solid', 'liquid'], ['evaporate', 'liquid', 'gas']]
+
+
+def test_async_ordering():
+    order = []
+
+    class Slow(object):
+        async def on_enter_liquid(self):
+            order.append('enter liquid')
+            await asyncio.sleep(0.01)
+            order.append('entered liquid')
+
+        async def on_enter_gas(self):
+            order.append('enter gas')
+
+    async def main():
+        model = Slow()
+        AsyncMachine(model=model, states=states, transitions=transitions, initial='solid')
+        results = await asyncio.gather(model.melt(), model.evaporate())
+        assert results == [True, True]
+        assert model.state == 'gas'
+
+    asyncio.run(main())
+    assert order == ['enter liquid', 'entered liquid', 'enter gas'], order
+
+
+def test_unsupported_options():
+    for option in ('queued', 'compiled', 'state_store', 'memoize_conditions', 'adaptive_conditions'):
+        try:
+            AsyncMachine(states=states, transitions=transitions, initial='solid', **{option: True})
+            assert False, option
+        except ValueError:
+            pass
+    machine = AsyncMachine(states=states, transitions=transitions, initial='solid')
+    try:
+        machine.instrument()
+        assert False, 'instrument'
+    except ValueError:
+        pass
+    assert machine.instrument(False) is None
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
@@ -0,0 +1,61 @@
+from Core.Machine import Machine
+
+
+class Matter(object):
+    def __init__(self):
+        self.entered = []
+
+    def is_valid(self):
+        return True
+
+    def on_enter_solid(self):
+        self.entered.append('solid')
+
+
+states = ['solid', 'liquid', 'gas']
+transitions = [['sublimate', 'solid', 'gas', 'is_valid'], ['solidify', 'liquid', 'solid']]
+
+
+def test_instance_callback_overrides():
+    model = Matter()
+    entered = []
+    model.is_valid = lambda: False
+    model.on_enter_solid = lambda: entered.append('instance')
+    machine = Machine(model=model, states=states, transitions=transitions, initial='liquid')
+    plain = Matter()
+    machine.add_model(plain, initial='liquid')
+    for compiled in (False, True):
+        if compiled:
+            machine.compile()
+        machine.set_state('liquid')
+        assert model.solidify() and plain.solidify()
+        assert not model.sublimate() and model.state == 'solid'
+        assert plain.sublimate() and plain.state == 'gas'
+    assert entered == ['instance', 'instance'] and model.entered == []
+    assert plain.entered == ['solid', 'solid']
+
+
+def test_class_patches_are_used():
+    class Patched(Matter):
+        pass
+
+    for compiled in (False, True):
+        model = Patched()
+        machine = Machine(model=model, states=states, transitions=transitions, initial='liquid', compiled=compiled)
+        assert model.solidify() and model.entered == ['solid']
+        Patched.on_enter_solid = lambda self: self.entered.append('patched')
+        Patched.is_valid = lambda self: False
+        machine.set_state('liquid')
+        assert model.solidify() and model.entered == ['solid', 'patched']
+        assert not model.sublimate()
+        del Patched.on_enter_solid, Patched.is_valid
+        machine.set_state('liquid')
+        assert model.solidify() and model.entered == ['solid', 'patched', 'solid']
+        assert model.sublimate()
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
@@ -0,0 +1,66 @@
+from Core.Machine import Machine, MachineError
+
+
+class Matter(object):
+    def __init__(self):
+        self.entered = []
+
+    def is_valid(self):
+        return True
+
+    def is_not_valid(self):
+        return False
+
+    def on_enter_gas(self):
+        self.entered.append('gas')
+
+
+states = ['solid', 'liquid', 'gas', 'plasma']
+transitions = [
+    ['melt', 'solid', 'liquid'],
+    ['evaporate', 'liquid', 'gas'],
+    ['sublimate', 'solid', 'gas', 'is_valid'],
+    ['ionize', 'gas', 'plasma'],
+    {'trigger': 'freeze', 'source': 'liquid', 'dest': 'solid', 'conditions': 'is_not_valid'},
+    {'trigger': 'freeze', 'source': 'liquid', 'dest': 'gas', 'unless': 'is_not_valid'},
+    ['cool', 'plasma', 'gas'],
+    ['cool', 'gas', 'liquid'],
+]
+
+
+def test_compiled_matches_uncompiled():
+    paths = [['melt', 'evaporate', 'ionize', 'cool', 'cool'], ['sublimate', 'ionize'], ['melt', 'freeze', 'cool']]
+    for path in paths:
+        finals = []
+        for compiled in (False, True):
+            model = Matter()
+            Machine(model=model, states=states, transitions=transitions, initial='solid', compiled=compiled)
+            for trigger in path:
+                assert model.trigger(trigger)
+            finals.append((model.state, model.entered))
+        assert finals[0] == finals[1], (path, finals)
+    model = Matter()
+    Machine(model=model, states=states, transitions=transitions, initial='solid', compiled=True)
+    try:
+        model.ionize()
+        assert False, 'ionize is invalid in solid'
+    except MachineError:
+        pass
+
+
+def test_table_follows_changes():
+    model = Matter()
+    machine = Machine(model=model, states=states, transitions=transitions, initial='solid', compiled=True)
+    table = machine.table
+    machine.add_states({'name': 'frozen', 'ignore_invalid_triggers': True})
+    machine.add_transition('deepfreeze', 'solid', 'frozen')
+    assert machine.table is not table
+    assert model.deepfreeze() and model.state == 'frozen'
+    assert model.melt() is False and model.state == 'frozen'
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
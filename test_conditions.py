@@ -0,0 +1,61 @@
+import time
+
+from Core import Transition
+from Core.Machine import Machine
+
+
+class Guarded(object):
+    def __init__(self):
+        self.calls = []
+
+    def is_cheap_and_failing(self):
+        self.calls.append('cheap')
+        return False
+
+    def is_slow(self):
+        self.calls.append('slow')
+        time.sleep(0.0002)
+        return True
+
+    def is_shared(self):
+        self.calls.append('shared')
+        return True
+
+
+states = ['a', 'b', 'c', 'd']
+candidates = [['go', 'a', 'b', ['is_shared', 'is_cheap_and_failing']], ['go', 'a', 'c', ['is_shared', 'is_slow']],
+              ['go', 'a', 'd', 'is_shared']]
+
+
+def test_memoized_guards_run_once_per_dispatch():
+    for compiled in (False, True):
+        plain, memoized = Guarded(), Guarded()
+        Machine(model=plain, states=states, transitions=candidates, initial='a', compiled=compiled)
+        Machine(model=memoized, states=states, transitions=candidates, initial='a', compiled=compiled,
+                memoize_conditions=True)
+        assert plain.go() and memoized.go() and plain.state == memoized.state == 'c'
+        assert plain.calls == ['shared', 'cheap', 'shared', 'slow']
+        assert memoized.calls == ['shared', 'cheap', 'slow']
+        # the memo only lives for one dispatch
+        memoized.state = 'a'
+        memoized.go()
+        assert memoized.calls.count('shared') == 2
+
+
+def test_adaptive_guards_check_cheap_rejections_first():
+    model = Guarded()
+    machine = Machine(model=model, states=states, initial='a', adaptive_conditions=True,
+                      transitions=[['go', 'a', 'b', ['is_slow', 'is_cheap_and_failing']]])
+    transition = machine.events['go'].transitions['a'][0]
+    for _ in range(Transition.REORDER_INTERVAL):
+        assert not model.go()
+    assert [c.func for c in transition.conditions] == ['is_cheap_and_failing', 'is_slow']
+    del model.calls[:]
+    assert not model.go() and model.calls == ['cheap']
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
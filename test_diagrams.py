@@ -0,0 +1,107 @@
+import pickle
+
+from Core.Diagrams.GraphMachine import GraphMachine
+
+
+class Matter(object):
+    pass
+
+
+states = ['solid', 'liquid', 'gas']
+transitions = [['melt', 'solid', 'liquid'], ['evaporate', 'liquid', 'gas'], ['freeze', 'liquid', 'solid']]
+
+
+def color(graph, name):
+    return graph.get_node(name).attr['color']
+
+
+def test_structure_is_built_lazily_and_shared():
+    a, b = Matter(), Matter()
+    machine = GraphMachine(model=[a, b], states=states, initial='solid', transitions=transitions)
+    assert machine._diagram is None
+    a.get_graph()
+    structure = machine._diagram.graph
+    b.get_graph()
+    machine.add_states('plasma')
+    machine.add_transition('ionize', 'gas', 'plasma')
+    graph = a.get_graph()
+    assert machine._diagram.graph is structure
+    assert graph.has_node('plasma') and graph.has_edge('gas', 'plasma')
+    assert not hasattr(a, 'graph') and not hasattr(b, 'graph')
+
+
+def test_graphs_are_highlighted_per_model():
+    a, b = Matter(), Matter()
+    machine = GraphMachine(model=[a, b], states=states, initial='solid', transitions=transitions)
+    a.melt()
+    shown = a.get_graph()
+    assert color(shown, 'solid') == 'blue' and color(shown, 'liquid') == 'red'
+    assert shown.get_edge('solid', 'liquid').attr['color'] == 'blue'
+    other = b.get_graph()
+    assert color(other, 'solid') == 'red' and color(other, 'liquid') in ('black', '', None)
+    # a graph handed out doesn't change when the model moves on or another model's graph is rendered
+    a.evaporate()
+    assert color(shown, 'liquid') == 'red' and color(shown, 'gas') in ('black', '', None)
+    graph = a.get_graph()
+    assert color(graph, 'liquid') == 'blue' and color(graph, 'gas') == 'red'
+    assert color(graph, 'solid') in ('black', '', None)
+    assert graph.get_edge('solid', 'liquid').attr['color'] in ('black', '', None)
+    assert machine._overlays[id(a)] == {'nodes': {'liquid': 'previous', 'gas': 'active'},
+                                        'edges': {('liquid', 'gas'): 'previous'}}
+
+
+def test_transitions_only_touch_the_overlay():
+    model = Matter()
+    machine = GraphMachine(model=model, states=states + ['plasma'], initial='solid',
+                           transitions=transitions + [['stay', 'gas', 'gas']])
+    model.get_graph()
+    structure = machine._diagram.graph.string()
+    model.melt()
+    model.evaporate()
+    assert machine._diagram.graph.string() == structure
+    model.stay()
+    assert machine._overlays[id(model)] == {'nodes': {'gas': 'active'}, 'edges': {('gas', 'gas'): 'previous'}}
+    graph = model.get_graph()
+    assert color(graph, 'gas') == 'red' and color(graph, 'liquid') in ('black', '', None)
+
+
+def test_inherited_transitions_highlight_the_leaf():
+    model = Matter()
+    machine = GraphMachine(model=model, states=['off', {'name': 'on', 'children': ['low', 'high']}],
+                           initial='off', transitions=[['start', 'off', 'on'], ['up', 'on_low', 'on_high'],
+                                                       ['stop', 'on', 'off']])
+    model.start()
+    model.up()
+    model.stop()
+    assert machine._overlays[id(model)] == {'nodes': {'on_high': 'previous', 'off': 'active'},
+                                            'edges': {('on_high', 'off'): 'previous'}}
+
+
+def test_nested_clusters():
+    machine = GraphMachine(model=Matter(), states=['off', {'name': 'on', 'children': ['low', 'high']}],
+                           initial='off', transitions=[['start', 'off', 'on'], ['up', 'on_low', 'on_high']])
+    model = machine.models[0]
+    model.start()
+    graph = model.get_graph()
+    assert graph.get_subgraph('cluster_on') is not None
+    assert color(graph, 'on_low') == 'red'
+
+
+def test_pickle_after_get_graph():
+    model = Matter()
+    machine = GraphMachine(model=model, states=states, initial='solid', transitions=transitions)
+    model.melt()
+    model.get_graph()
+    machine = pickle.loads(pickle.dumps(machine))
+    model = machine.models[0]
+    assert model.state == 'liquid'
+    assert color(model.get_graph(), 'liquid') == 'red'
+    model.evaporate()
+    assert color(model.get_graph(), 'gas') == 'red'
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
@@ -0,0 +1,76 @@
+from Core.Machine import Machine, MachineError
+
+
+class Matter(object):
+    def is_hot(self):
+        return True
+
+
+states = ['solid', 'liquid', 'gas', 'plasma']
+transitions = [['melt', 'solid', 'liquid'], ['melt', 'liquid', 'liquid'], ['evaporate', 'liquid', 'gas', 'is_hot'],
+               ['ionize', 'gas', 'plasma'], ['freeze', ['liquid', 'gas'], 'solid']]
+
+
+def machines(count):
+    for options in ({}, {'compiled': True}, {'state_store': True}):
+        yield Machine(model=[Matter() for _ in range(count)], states=states, initial='solid',
+                      transitions=transitions, **options)
+
+
+def test_results_match_single_triggers():
+    for machine in machines(6):
+        models = machine.models
+        assert machine.dispatch_many('melt').tolist() == [True] * 6
+        assert machine.dispatch_many('evaporate', models[:3]).tolist() == [True] * 3
+        assert [m.state for m in models] == ['gas'] * 3 + ['liquid'] * 3
+        assert machine.dispatch_many('freeze', models[1:5]).tolist() == [True] * 4
+        assert [m.state for m in models] == ['gas'] + ['solid'] * 4 + ['liquid']
+        assert models[0].ionize() and models[0].state == 'plasma'
+
+
+def test_invalid_trigger_moves_no_model():
+    for machine in machines(4):
+        models = machine.models
+        models[2].melt()
+        models[2].evaporate()
+        try:
+            machine.dispatch_many('melt')
+            assert False, 'melt is invalid in gas'
+        except MachineError:
+            pass
+        assert [m.state for m in models] == ['solid', 'solid', 'gas', 'solid']
+
+
+def test_ignored_models_stay():
+    ignoring = [{'name': 'gas', 'ignore_invalid_triggers': True}] + ['solid', 'liquid', 'plasma']
+    machine = Machine(model=[Matter() for _ in range(3)], states=ignoring, initial='gas',
+                      transitions=transitions, state_store=True)
+    machine.set_state('solid', machine.models[0])
+    assert machine.dispatch_many('melt').tolist() == [True, False, False]
+    assert machine.count_states() == {'gas': 2, 'solid': 0, 'liquid': 1, 'plasma': 0}
+
+
+def test_callbacks_added_later_run():
+    entered = []
+    machine = Machine(model=[Matter() for _ in range(3)], states=states, initial='solid', transitions=transitions,
+                      state_store=True)
+    machine.dispatch_many('melt')
+    machine.get_state('solid').add_callback('enter', lambda: entered.append('solid'))
+    machine.dispatch_many('freeze')
+    assert entered == ['solid'] * 3
+
+
+def test_bulk_transitions_are_counted():
+    machine = Machine(model=[Matter() for _ in range(5)], states=states, initial='solid', transitions=transitions,
+                      state_store=True)
+    instruments = machine.instrument()
+    machine.dispatch_many('melt')
+    machine.dispatch_many('evaporate', machine.models[:2])
+    assert instruments.transitions == {('solid', 'melt', 'liquid'): 5, ('liquid', 'evaporate', 'gas'): 2}
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
@@ -0,0 +1,59 @@
+from Core.Machine import Machine
+
+
+class Matter(object):
+    def __init__(self):
+        self.seen = []
+
+    def on_enter_liquid(self, *args, **kwargs):
+        self.seen.append((args, kwargs))
+
+
+states = ['solid', 'liquid', 'gas']
+transitions = [['melt', 'solid', 'liquid'], ['freeze', 'liquid', 'solid'], ['evaporate', 'liquid', 'gas']]
+
+
+def test_pooled_event_data_is_reused():
+    for compiled in (False, True):
+        model = Matter()
+        machine = Machine(model=model, states=states, transitions=transitions, initial='solid', compiled=compiled)
+        event = machine.events['melt']
+        model.melt(1, heat=True)
+        pooled = list(event._pool)
+        assert len(pooled) == 1 and pooled[0].model is None and pooled[0].args is None
+        model.freeze()
+        model.melt(2)
+        assert event._pool == pooled
+        assert model.seen == [((1,), {'heat': True}), ((2,), {})]
+
+
+def test_nested_triggers_get_their_own_event_data():
+    model = Matter()
+    machine = Machine(model=model, states=states, transitions=[['step', 'solid', 'liquid'], ['step', 'liquid', 'gas']],
+                      initial='solid')
+    liquid = machine.get_state('liquid')
+    liquid.on_enter = [lambda *args, **kwargs: model.step('inner'), 'on_enter_liquid']
+    machine.get_state('gas').add_callback('enter', 'on_enter_liquid')
+    assert model.step('outer') and model.state == 'gas'
+    assert model.seen == [(('inner',), {}), (('outer',), {})]
+    assert len(machine.events['step']._pool) == 2
+
+
+def test_send_event_keeps_event_data():
+    kept = []
+    model = Matter()
+    machine = Machine(model=model, states=states, transitions=transitions, initial='solid', send_event=True)
+    machine.get_state('liquid').on_enter = [kept.append]
+    model.melt(1)
+    model.freeze()
+    model.melt(2)
+    assert kept[0] is not kept[1]
+    assert [e.args for e in kept] == [(1,), (2,)] and kept[0].model is model
+    assert machine.events['melt']._pool == []
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
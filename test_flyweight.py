@@ -0,0 +1,50 @@
+import pickle
+
+from Core.Machine import Machine
+
+
+class Particle(object):
+    pass
+
+
+states = ['solid', 'liquid', 'gas']
+transitions = [['melt', 'solid', 'liquid'], ['evaporate', 'liquid', 'gas']]
+
+
+def test_no_per_instance_bindings():
+    particles = [Particle() for _ in range(3)]
+    machine = Machine(model=particles, states=states, transitions=transitions, initial='solid', flyweight=True)
+    assert all(vars(p) == {'state': 'solid'} for p in particles)
+    assert type(particles[0]) is type(particles[2])
+    machine.add_states('plasma')
+    machine.add_transition('ionize', 'gas', 'plasma')
+    assert particles[0].melt() and particles[0].evaporate() and particles[0].ionize()
+    assert particles[0].is_plasma() and not particles[1].is_plasma()
+    assert particles[1].trigger('melt') and particles[1].state == 'liquid'
+    assert vars(particles[0]) == {'state': 'plasma'}
+
+
+def test_flyweight_pickle_and_remove_model():
+    particles = [Particle() for _ in range(3)]
+    machine = Machine(model=particles, states=states, transitions=transitions, initial='solid', flyweight=True)
+    particles[0].melt()
+    assert type(particles[0]) is not Particle and isinstance(particles[0], Particle)
+
+    restored = pickle.loads(pickle.dumps(machine))
+    assert [m.state for m in restored.models] == ['liquid', 'solid', 'solid']
+    assert restored.models[0].evaporate() and restored.models[0].state == 'gas'
+    assert particles[0].state == 'liquid'
+    assert type(pickle.loads(pickle.dumps(particles[1]))) is Particle
+
+    machine.remove_model(particles[0])
+    assert type(particles[0]) is Particle
+    machine.add_model(particles[0])
+    assert type(particles[0]) is type(particles[1])
+    assert type(particles[0]).__bases__ == (Particle,)
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
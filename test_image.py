@@ -0,0 +1,101 @@
+import io
+import os
+import shutil
+import tempfile
+
+from Core.Machine import Machine, MachineError
+from Core.MachineImage import MachineImage
+
+
+class Matter(object):
+    def __init__(self, state='solid'):
+        self.state = state
+        self.log = []
+
+    def is_valid(self):
+        return True
+
+    def on_enter_liquid(self, *args, **kwargs):
+        self.log.append(('enter liquid', args, kwargs))
+
+    def on_exit_solid(self, *args, **kwargs):
+        self.log.append(('exit solid', args, kwargs))
+
+
+states = [{'name': 'solid', 'on_exit': 'on_exit_solid'}, {'name': 'liquid', 'on_enter': 'on_enter_liquid'},
+          {'name': 'gas', 'ignore_invalid_triggers': True}, {'name': 'plasma', 'accepting': True}]
+transitions = [['melt', 'solid', 'liquid'], {'trigger': 'evaporate', 'source': 'liquid', 'dest': 'solid',
+                                             'unless': 'is_valid'},
+               {'trigger': 'evaporate', 'source': 'liquid', 'dest': 'gas', 'conditions': 'is_valid'},
+               ['ionize', 'gas', 'plasma'], ['cool', 'plasma', 'gas']]
+
+
+def test_dump_and_load():
+    machine = Machine(states=states, transitions=transitions, initial='solid')
+    folder = tempfile.mkdtemp()
+    try:
+        path = os.path.join(folder, 'matter.image')
+        MachineImage.dump(machine, path)
+        image = MachineImage.load(path)
+        try:
+            assert image.state_names == ['solid', 'liquid', 'gas', 'plasma']
+            assert image.to_spec() == {'states': machine.get_spec()['states'], 'initial': 'solid',
+                                       'transitions': machine.get_spec()['transitions']}
+            rebuilt = Machine.from_spec(image.to_spec())
+            assert rebuilt.run(['ionize'], initial='gas') == 'plasma'
+        finally:
+            image.close()
+    finally:
+        shutil.rmtree(folder)
+
+
+def test_trigger():
+    stream = io.BytesIO()
+    MachineImage.dump(Machine(states=states, transitions=transitions, initial='solid'), stream)
+    image = MachineImage(stream.getvalue())
+    model = Matter()
+    assert image.trigger(model, 'melt', 1, heat=True) and model.state == 'liquid'
+    assert model.log == [('exit solid', (1,), {'heat': True}), ('enter liquid', (1,), {'heat': True})]
+    assert image.trigger(model, 'evaporate') and model.state == 'gas'
+    assert image.trigger(model, 'melt') is False and model.state == 'gas'
+    try:
+        image.trigger(Matter('plasma'), 'melt')
+        assert False, 'melt is invalid in plasma'
+    except MachineError:
+        pass
+
+
+def test_run():
+    stream = io.BytesIO()
+    MachineImage.dump(Machine(states=states, transitions=transitions, initial='solid'), stream)
+    image = MachineImage(stream.getvalue())
+    assert image.run(['melt']) == 'liquid'
+    assert image.run(['ionize', 'cool', 'melt'], initial='gas') == 'gas'
+    try:
+        image.run(['melt', 'evaporate'])
+        assert False, 'evaporate is conditional'
+    except MachineError:
+        pass
+
+
+def test_unsupported_machines():
+    for machine in (Machine(states=['a', 'b'], transitions=[['go', 'a', 'b', lambda: True]]),
+                    Machine(states=['a'], send_event=True),
+                    Machine(states=[{'name': 'a', 'children': ['b']}])):
+        try:
+            MachineImage.dump(machine, io.BytesIO())
+            assert False, machine
+        except ValueError:
+            pass
+    try:
+        MachineImage(b'XXXX' + bytes(40))
+        assert False, 'not an image'
+    except ValueError:
+        pass
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
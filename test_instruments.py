@@ -0,0 +1,72 @@
+import json
+
+from Core.Machine import Machine
+
+
+class Matter(object):
+    def is_cold(self):
+        return False
+
+    def on_enter_liquid(self):
+        pass
+
+
+states = ['solid', 'liquid', 'gas']
+transitions = [['melt', 'solid', 'liquid'], ['freeze', 'liquid', 'solid', 'is_cold'], ['evaporate', 'liquid', 'gas'],
+               ['condense', 'gas', 'liquid']]
+
+
+def test_counters():
+    for compiled in (False, True):
+        model = Matter()
+        machine = Machine(model=model, states=states, transitions=transitions, initial='solid', compiled=compiled)
+        assert machine.instruments is None
+        instruments = machine.instrument()
+        assert machine.instrument() is instruments
+        model.melt()
+        assert not model.freeze()
+        model.evaporate()
+        model.condense()
+        assert instruments.transitions == {('solid', 'melt', 'liquid'): 1, ('liquid', 'evaporate', 'gas'): 1,
+                                           ('gas', 'condense', 'liquid'): 1}
+        assert instruments.condition_failures == {('liquid', 'freeze', 'solid', 'is_cold'): 1}
+        assert {name: h.count for name, h in instruments.triggers.items()} == \
+            {'melt': 1, 'freeze': 1, 'evaporate': 1, 'condense': 1}
+        assert list(instruments.callbacks) == [('liquid', 'on_enter', 'on_enter_liquid')]
+        assert instruments.callbacks['liquid', 'on_enter', 'on_enter_liquid'].count == 2
+
+        snapshot = json.loads(json.dumps(instruments.snapshot()))
+        assert snapshot['triggers']['melt']['count'] == 1
+        assert snapshot['condition_failures'][0]['condition'] == 'is_cold'
+        instruments.reset()
+        assert instruments.transitions == {} and instruments.triggers == {}
+        assert machine.instrument(False) is instruments and machine.instruments is None
+        model.evaporate()
+        assert instruments.transitions == {}
+
+
+def test_queue_depth():
+    model = Matter()
+    machine = Machine(model=model, states=states, transitions=transitions, initial='solid', queued=True)
+    instruments = machine.instrument()
+    machine.get_state('liquid').add_callback('enter', lambda: model.evaporate())
+    model.melt()
+    assert model.state == 'gas'
+    assert instruments.queue_depth.count == 2 and instruments.queue_depth.max == 2
+
+
+def test_histogram():
+    machine = Machine(states=states, initial='solid')
+    histogram = machine.instrument().queue_depth
+    for value in (1, 2, 3, 100, 1000):
+        histogram.add(value)
+    assert histogram.min == 1 and histogram.max == 1000 and histogram.total == 1106
+    assert histogram.percentile(0.5) == 4 and histogram.percentile(1.0) == 1000
+    assert histogram.snapshot()['buckets'] == {2: 1, 4: 2, 128: 1, 1024: 1}
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
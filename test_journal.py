@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+
+from Core.Machine import Machine
+
+
+class Matter(object):
+    def __init__(self, id=None):
+        self.id = id
+        self.entered = []
+
+    def is_valid(self):
+        return True
+
+    def on_enter_solid(self):
+        self.entered.append('solid')
+
+
+states = ['solid', 'liquid', 'gas', 'plasma']
+transitions = [['melt', 'solid', 'liquid'], ['sublimate', 'solid', 'gas', 'is_valid'], ['ionize', 'gas', 'plasma']]
+
+
+def journaled(test):
+    def run():
+        folder = tempfile.mkdtemp()
+        try:
+            test(os.path.join(folder, 'matter.journal'))
+        finally:
+            shutil.rmtree(folder)
+    run.__name__ = test.__name__
+    return run
+
+
+@journaled
+def test_journal_restore(path):
+    models = [Matter(i) for i in range(3)]
+    machine = Machine(model=models, states=states, transitions=transitions, initial='solid')
+    machine.journal(path)
+    models[0].melt()
+    models[1].sublimate()
+    models[1].ionize()
+    machine.journal()
+
+    fresh = [Matter(i) for i in range(4)]
+    recovered = Machine(model=fresh, states=states, transitions=transitions, initial='solid')
+    assert recovered.restore(path) == 2
+    assert [m.state for m in fresh] == ['liquid', 'plasma', 'solid', 'solid']
+    assert fresh[0].entered == []
+
+    try:
+        machine.journal(path, key='serial')
+        assert False, 'models have no serial'
+    except ValueError:
+        pass
+
+
+@journaled
+def test_snapshot_after_close(path):
+    models = [Matter(i) for i in range(2)]
+    machine = Machine(model=models, states=states, transitions=transitions, initial='solid')
+    journal = machine.journal(path)
+    models[0].melt()
+    journal.snapshot()
+    models[1].sublimate()
+    machine.journal()
+    try:
+        journal.snapshot()
+        assert False, 'the journal is closed'
+    except ValueError:
+        pass
+    journal.flush()
+    assert Machine(model=[Matter(i) for i in range(2)], states=states, transitions=transitions,
+                   initial='solid').restore(path) == 2
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
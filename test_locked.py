@@ -0,0 +1,74 @@
+import threading
+import time
+
+from Core.LockedMachine import LockedMachine
+
+
+class Matter(object):
+    def is_not_valid(self):
+        return False
+
+
+states = ['solid', 'liquid', 'gas']
+transitions = [
+    ['melt', 'solid', 'liquid'],
+    ['evaporate', 'liquid', 'gas'],
+    {'trigger': 'freeze', 'source': 'liquid', 'dest': 'solid', 'conditions': 'is_not_valid'},
+    {'trigger': 'freeze', 'source': 'liquid', 'dest': 'gas', 'unless': 'is_not_valid'},
+    ['cool', 'gas', 'liquid'],
+    ['tick', 'solid', 'solid'],
+]
+
+
+def test_locked_concurrency():
+    shared = Matter()
+    shared.count = 0
+
+    def count():
+        # not atomic, only correct while the model's triggers are serialized
+        value = shared.count
+        time.sleep(0)
+        shared.count = value + 1
+    machine = LockedMachine(model=shared, states=states, transitions=transitions, initial='solid')
+    machine.get_state('solid').add_callback('enter', count)
+    others = [Matter() for _ in range(4)]
+    machine.add_model(others)
+
+    def work(model):
+        for _ in range(200):
+            shared.tick()
+            assert model.melt() and model.evaporate() and model.cool() and model.freeze()
+            machine.set_state('solid', model)
+
+    threads = [threading.Thread(target=work, args=(model,)) for model in others]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert shared.count == 800
+    assert all(model.state == 'solid' for model in machine.models)
+
+
+def test_set_state_waits_for_running_trigger():
+    started, release = threading.Event(), threading.Event()
+    model = Matter()
+    machine = LockedMachine(model=model, states=states, transitions=transitions, initial='solid')
+    machine.get_state('liquid').add_callback('enter', lambda: started.set() or release.wait(5))
+    trigger = threading.Thread(target=model.melt)
+    trigger.start()
+    assert started.wait(5)
+    setter = threading.Thread(target=machine.set_state, args=('gas', model))
+    setter.start()
+    setter.join(0.05)
+    assert setter.is_alive() and model.state == 'liquid'
+    release.set()
+    trigger.join(5)
+    setter.join(5)
+    assert model.state == 'gas'
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
@@ -0,0 +1,79 @@
+import io
+import json
+
+from Core.Diagrams.Markup import Markup
+from Core.Machine import Machine
+
+
+class Labelled(Machine):
+    show_conditions = True
+
+
+class Matter(object):
+    def is_hot(self):
+        return True
+
+
+states = ['solid', 'liquid', {'name': 'dry ice', 'accepting': True},
+          {'name': 'gas', 'children': ['cold', 'hot']}]
+transitions = [['melt', 'solid', 'liquid'], ['evaporate', 'liquid', 'gas', 'is_hot'], ['sublimate', 'solid', 'dry ice'],
+               {'trigger': 'freeze', 'source': 'gas_hot', 'dest': 'solid', 'unless': 'is_hot'}]
+
+
+def machine():
+    model = Matter()
+    machine = Labelled(model=model, states=states, initial='solid', transitions=transitions)
+    model.melt()
+    return machine, model
+
+
+def test_json():
+    m, model = machine()
+    document = json.loads(Markup(m, 'json').get_graph('Matter', model))
+    assert document['title'] == 'Matter' and document['initial'] == 'solid' and document['active'] == 'liquid'
+    assert [s['name'] for s in document['states']] == ['solid', 'liquid', 'dry ice', 'gas', 'gas_cold', 'gas_hot']
+    assert document['states'][4]['parent'] == 'gas' and document['states'][2]['accepting']
+    assert document['transitions'][1] == {'trigger': 'evaporate', 'source': 'liquid', 'dest': 'gas',
+                                          'conditions': [{'func': 'is_hot', 'target': True}]}
+
+
+def test_dot():
+    m, model = machine()
+    stream = io.StringIO()
+    Markup(m).write(stream, 'Matter', model)
+    dot = stream.getvalue()
+    assert dot.startswith('digraph {\n') and dot.endswith('}\n')
+    assert '"liquid" [color=red];' in dot and '"dry ice" [shape=doublecircle];' in dot
+    assert 'subgraph "cluster_gas" {' in dot
+    assert '"liquid" -> "gas_cold" [label="evaporate [is_hot]", lhead="cluster_gas"];' in dot
+    assert '"gas_hot" -> "solid" [label="freeze [!is_hot]"];' in dot
+    try:
+        import pygraphviz
+    except ImportError:
+        return
+    graph = pygraphviz.AGraph(string=dot)
+    assert graph.has_edge('solid', 'dry ice') and graph.get_subgraph('cluster_gas').has_node('gas_hot')
+
+
+def test_mermaid():
+    m, model = machine()
+    lines = Markup(m, 'mermaid').get_graph('Matter', model).splitlines()
+    assert lines[:4] == ['---', 'title: Matter', '---', 'stateDiagram-v2']
+    assert '  state "dry ice" as s2' in lines and '  solid --> s2 : sublimate' in lines
+    assert '  state gas {' in lines and '    [*] --> gas_cold' in lines
+    assert '  [*] --> solid' in lines and lines[-1] == '  class liquid active'
+
+
+def test_unknown_format():
+    try:
+        Markup(machine()[0], 'svg')
+        assert False, 'svg is not a markup format'
+    except ValueError:
+        pass
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
@@ -0,0 +1,70 @@
+from Core.Machine import Machine, MachineError
+
+
+class Device(object):
+    pass
+
+
+states = ['off', {'name': 'on', 'initial': 'idle', 'children': [
+    'idle', {'name': 'busy', 'initial': 'a', 'children': ['a', 'b']}]}]
+transitions = [['start', 'off', 'on'], ['work', 'on_idle', 'on_busy'], ['next', 'on_busy_a', 'on_busy_b'],
+               ['stop', 'on', 'off']]
+
+
+def test_routes():
+    entered, exited = [], []
+    for compiled in (False, True):
+        del entered[:], exited[:]
+        model = Device()
+        machine = Machine(model=model, states=states, initial='off', compiled=compiled, transitions=transitions)
+        for name in ('on', 'on_busy', 'on_busy_b'):
+            machine.get_state(name).add_callback('enter', lambda n=name: entered.append(n))
+            machine.get_state(name).add_callback('exit', lambda n=name: exited.append(n))
+        assert model.start() and model.state == 'on_idle'
+        assert model.is_on() and not model.is_on_busy()
+        assert model.work() and model.state == 'on_busy_a'
+        assert model.next() and model.state == 'on_busy_b'
+        assert model.stop() and model.state == 'off'
+        assert entered == ['on', 'on_busy', 'on_busy_b'], entered
+        assert exited == ['on_busy_b', 'on_busy', 'on'], exited
+        assert machine.run(['start', 'work', 'next']) == 'on_busy_b'
+        try:
+            model.next()
+            assert False, 'next is invalid in off'
+        except MachineError:
+            pass
+
+
+def test_spec_round_trip():
+    machine = Machine(states=states, initial='off', transitions=transitions)
+    rebuilt = Machine.from_spec(machine.get_spec())
+    assert list(rebuilt.states) == list(machine.states)
+    assert rebuilt.get_state('on').initial.name == 'on_idle'
+    assert rebuilt.run(['start', 'work', 'next', 'stop']) == 'off'
+
+
+def test_queries_follow_the_hierarchy():
+    machine = Machine(states=states, initial='off', transitions=transitions)
+    assert machine.get_triggers('on_busy_b') == ['stop']
+    assert machine.get_successors('on_busy_b') == {'off': ['stop']}
+    assert machine.get_successors('off') == {'on_idle': ['start']}
+    assert machine.reachable_from('on_busy_b') == {'on_busy_b', 'off', 'on_idle', 'on_busy_a'}
+    assert machine.reachable_from('off') == {'off', 'on_idle', 'on_busy_a', 'on_busy_b'}
+    assert machine.path('on_busy_b', 'off') == ['on_busy_b', 'off']
+    assert machine.path('off', 'on_busy_b') == ['off', 'on_idle', 'on_busy_a', 'on_busy_b']
+    assert machine.analyze()['unreachable_states'] == []
+
+    # a new child changes where transitions into its parent land
+    machine.add_states({'name': 'standby', 'children': ['low', 'high']})
+    machine.add_transition('sleep', 'on', 'standby')
+    assert machine.reachable_from('on_busy_b') == {'on_busy_b', 'off', 'on_idle', 'on_busy_a', 'standby_low'}
+    assert machine.get_successors('on_idle') == {'on_busy_a': ['work'], 'off': ['stop'],
+                                                 'standby_low': ['sleep']}
+    assert machine.analyze()['unreachable_states'] == ['standby_high']
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
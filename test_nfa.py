@@ -0,0 +1,46 @@
+from Core.Machine import Machine
+from Core.NFA import NFA
+
+
+def ends_in_ab():
+    # words over a, b ending in "ab"
+    return NFA(states=['0', '1', '2'], initial='0', accepting='2',
+               transitions=[['a', '0', ['0', '1']], ['b', '0', '0'], ['b', '1', '2']])
+
+
+def test_nfa_minimize():
+    nfa = ends_in_ab()
+    assert nfa.accepts('aab') and not nfa.accepts('aba')
+    dfa = nfa.determinize()
+    minimal = dfa.minimize()
+    assert len(minimal.states) == 3, list(minimal.states)
+    for word in ('ab', 'bab', 'aab', 'abab', 'a', 'b', 'aba', 'abb', ''):
+        assert minimal.accepts(word) == nfa.accepts(word) == dfa.accepts(word), word
+
+
+def test_epsilon_transitions():
+    # "a" then optionally "b", the epsilon move skips the "b"
+    nfa = NFA(states=['start', 'middle', 'end'], initial='start', accepting='end',
+              transitions=[['a', 'start', 'middle'], [None, 'middle', 'end'], ['b', 'middle', 'end']])
+    assert sorted(nfa.run('a')) == ['end', 'middle']
+    assert nfa.accepts('a') and nfa.accepts('ab')
+    assert not nfa.accepts('') and not nfa.accepts('abb')
+    assert nfa.run('abb') == []
+    dfa = nfa.determinize()
+    assert [dfa.accepts(word) for word in ('a', 'ab', '', 'abb')] == [True, True, False, False]
+
+
+def test_from_machine():
+    machine = Machine(states=['solid', 'liquid', {'name': 'gas', 'accepting': True}], initial='solid',
+                      transitions=[['heat', 'solid', 'liquid'], ['heat', 'solid', 'gas'], ['heat', 'liquid', 'gas']])
+    nfa = NFA.from_machine(machine)
+    assert sorted(nfa.run(['heat'])) == ['gas', 'liquid']
+    assert nfa.accepts(['heat']) and nfa.accepts(['heat', 'heat'])
+    assert NFA.from_machine(machine, accepting_states='liquid').accepts(['heat'])
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
@@ -0,0 +1,50 @@
+from Core.Machine import Machine
+
+
+states = ['solid', 'liquid', 'gas', 'plasma', 'orphan']
+transitions = [['melt', 'solid', 'liquid'], ['heat', 'liquid', 'gas'], ['evaporate', 'liquid', 'gas'],
+               ['sublimate', 'solid', 'gas'], ['ionize', 'gas', 'plasma'], ['freeze', 'liquid', 'solid'],
+               ['heat', 'solid', 'solid']]
+
+
+def test_triggers_in_definition_order():
+    machine = Machine(states=states, transitions=transitions, initial='solid')
+    # ordered by the first definition of each event
+    assert machine.get_triggers('solid') == ['melt', 'heat', 'sublimate']
+    assert machine.get_triggers('liquid') == ['heat', 'evaporate', 'freeze']
+    assert machine.get_triggers('solid', 'gas') == ['melt', 'heat', 'sublimate', 'ionize']
+    assert machine.get_triggers('orphan') == [] and machine.get_triggers('unknown') == []
+
+
+def test_neighbours():
+    machine = Machine(states=states, transitions=transitions, initial='solid')
+    assert machine.get_successors('liquid') == {'gas': ['heat', 'evaporate'], 'solid': ['freeze']}
+    assert machine.get_predecessors('gas') == ['liquid', 'solid']
+    assert machine.get_predecessors('solid') == ['liquid', 'solid']
+    assert machine.get_successors('orphan') == {} and machine.get_predecessors('orphan') == []
+
+
+def test_paths_follow_new_transitions():
+    machine = Machine(states=states, transitions=transitions, initial='solid')
+    assert machine.reachable_from('solid') == {'solid', 'liquid', 'gas', 'plasma'}
+    assert machine.reachable_from('plasma') == {'plasma'}
+    assert machine.path('solid', 'plasma') == ['solid', 'gas', 'plasma']
+    assert machine.path('plasma', 'solid') is None
+    assert machine.path('gas', 'gas') == ['gas']
+    machine.add_transition('cool', 'plasma', 'orphan')
+    machine.add_transition('recombine', 'orphan', 'liquid')
+    assert machine.reachable_from('plasma') == {'plasma', 'orphan', 'liquid', 'gas', 'solid'}
+    assert machine.path('plasma', 'solid') == ['plasma', 'orphan', 'liquid', 'solid']
+    for query in (lambda: machine.path('solid', 'unknown'), lambda: machine.reachable_from('unknown')):
+        try:
+            query()
+            assert False, 'unknown is not a state'
+        except ValueError:
+            pass
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
@@ -0,0 +1,60 @@
+from Core.Machine import Machine, MachineError
+
+
+states = ['solid', 'liquid', 'gas', {'name': 'plasma', 'accepting': True}]
+transitions = [
+    ['melt', 'solid', 'liquid'],
+    ['evaporate', 'liquid', 'gas'],
+    ['sublimate', 'solid', 'gas', 'is_valid'],
+    ['ionize', 'gas', 'plasma'],
+    ['cool', 'plasma', 'gas'],
+    ['cool', 'gas', 'liquid'],
+]
+
+
+def test_run_and_accepts():
+    machine = Machine(states=states, transitions=transitions, initial='solid')
+    assert machine.run(['melt', 'evaporate', 'ionize']) == 'plasma'
+    assert machine.run([], initial='gas') == 'gas'
+    assert machine.accepts(['melt', 'evaporate', 'ionize'])
+    assert not machine.accepts(['melt', 'evaporate'])
+    assert machine.accepts(['melt'], accepting_states='liquid')
+    assert not machine.accepts(['ionize'])
+    try:
+        machine.run(['ionize'])
+        assert False, 'ionize is invalid in solid'
+    except MachineError:
+        pass
+
+
+def test_symbol_strings_and_buffers():
+    letters = Machine(states=['a', 'b'], transitions=[['x', 'a', 'b'], ['y', 'b', 'a']], initial='a')
+    assert letters.run('xyx') == 'b'
+    assert letters.run(b'xy') == 'a'
+    assert letters.run(bytearray(b'xyxy')) == 'a'
+    assert letters.accepts('xyx', accepting_states='b')
+    assert not letters.accepts(b'xx', accepting_states='b')
+    try:
+        Machine(states=states, transitions=transitions, initial='solid').run('melt')
+        assert False, 'event names are longer than one character'
+    except ValueError:
+        pass
+
+
+def test_conditions_and_ignored_triggers():
+    machine = Machine(states=states, transitions=transitions, initial='solid')
+    try:
+        machine.run(['sublimate'])
+        assert False, 'sublimate is conditional'
+    except MachineError:
+        pass
+    machine.add_states({'name': 'frozen', 'ignore_invalid_triggers': True})
+    machine.add_transition('freeze', 'solid', 'frozen')
+    assert machine.run(['freeze', 'melt', 'ionize']) == 'frozen'
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
@@ -0,0 +1,61 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from Core.Machine import Machine
+from Core.ShardedRunner import ShardedRunner
+
+
+class Matter(object):
+    def __init__(self, id):
+        self.id = id
+
+    def is_even(self):
+        return self.id % 2 == 0
+
+
+class Slotted(Matter):
+    __slots__ = 'charge',
+
+    def __init__(self, id):
+        super(Slotted, self).__init__(id)
+        self.charge = id
+
+
+states = ['solid', 'liquid', 'gas']
+transitions = [['melt', 'solid', 'liquid'], ['evaporate', 'liquid', 'gas', 'is_even'],
+               ['freeze', 'liquid', 'solid']]
+
+
+def test_sharded_matches_local():
+    models = [Matter(i) for i in range(20)] + [Slotted(i) for i in range(20, 24)]
+    local = [Matter(i) for i in range(24)]
+    machine = Machine(model=models, states=states, transitions=transitions, initial='solid')
+    reference = Machine(model=local, states=states, transitions=transitions, initial='solid')
+    runner = ShardedRunner(machine, shards=3, executor=ProcessPoolExecutor(2))
+    try:
+        assert runner.dispatch('melt') == 24
+        assert runner.dispatch('evaporate') == 12
+        reference.dispatch_many('melt')
+        for model in local:
+            model.evaporate()
+        assert [m.state for m in models] == [m.state for m in local]
+        assert all(m.is_liquid() or m.is_gas() for m in models)
+        assert [m.charge for m in models[20:]] == [20, 21, 22, 23]
+
+        # the items of one model run in order, a model that ends where it started doesn't count
+        solid = Matter(24)
+        machine.add_model(solid)
+        liquid = [m for m in models if m.state == 'liquid']
+        batch = [(m, 'freeze') for m in liquid] + [(solid, 'melt'), (solid, 'freeze')] + \
+            [(m, 'melt', (), {}) for m in liquid[:3]]
+        assert runner.run(batch) == len(liquid) - 3
+        assert [m.state for m in liquid] == ['liquid'] * 3 + ['solid'] * (len(liquid) - 3)
+        assert solid.state == 'solid'
+    finally:
+        runner.shutdown()
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
@@ -0,0 +1,66 @@
+import subprocess
+import sys
+
+from Core.Machine import Machine
+
+
+class Matter(object):
+    def is_valid(self):
+        return True
+
+
+states = ['solid', 'liquid', {'name': 'gas', 'on_enter': ['is_valid'], 'ignore_invalid_triggers': True}]
+transitions = [['melt', 'solid', 'liquid'], {'trigger': 'evaporate', 'source': 'liquid', 'dest': 'gas',
+                                             'conditions': 'is_valid', 'unless': ['is_valid']},
+               ['reset', '*', 'solid']]
+
+
+def raises(spec, message):
+    try:
+        Machine.from_spec(spec)
+        assert False, message
+    except ValueError as error:
+        assert message in str(error), error
+
+
+def test_round_trip():
+    machine = Machine(states=states, transitions=transitions, initial='solid')
+    spec = machine.get_spec()
+    rebuilt = Machine.from_spec(spec)
+    assert rebuilt.get_spec() == spec
+    assert rebuilt.get_triggers('gas') == ['reset']
+    assert rebuilt.get_successors('liquid') == {'gas': ['evaporate'], 'solid': ['reset']}
+    model = Matter()
+    Machine.from_spec(spec, model=model, initial='liquid')
+    assert not model.evaporate() and model.reset() and model.state == 'solid'
+
+
+def test_models_without_initial_state():
+    model = Matter()
+    machine = Machine.from_spec({'states': ['a', 'b'], 'transitions': [['go', 'a', 'b']]}, model=model)
+    assert model.state == 'initial' and list(machine.states) == ['initial', 'a', 'b']
+
+
+def test_ordered_transitions():
+    machine = Machine.from_spec({'states': ['a', 'b', 'c'], 'initial': 'a', 'ordered_transitions': True})
+    assert machine.run(['next_state'] * 4) == 'b'
+
+
+def test_invalid_specs():
+    raises({'states': ['a', 'a']}, 'State a is defined twice.')
+    raises({'states': ['a', {'name': 'b', 'children': ['a']}, 'b_a']}, 'State b_a is defined twice.')
+    raises({'states': ['a'], 'transitions': [['go', 'a', 'b']]}, 'State b is not a registered state.')
+    raises({'states': ['a'], 'transitions': [['go', ['a', 'c'], 'a']]}, 'State c is not a registered state.')
+
+
+def test_import_is_lazy():
+    code = ("import sys, Core.Machine, Core.Diagrams.GraphMachine\n"
+            "print(sorted(m for m in ('numpy', 'pygraphviz', 'asyncio', 'Core.StateStore') if m in sys.modules))")
+    assert subprocess.check_output([sys.executable, '-c', code]).decode().strip() == '[]'
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
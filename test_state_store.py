@@ -0,0 +1,65 @@
+import pickle
+
+from Core.Machine import Machine, MachineError
+from Core.StateStore import StateStore
+
+
+class Matter(object):
+    pass
+
+
+states = ['solid', 'liquid', 'gas']
+transitions = [['melt', 'solid', 'liquid'], ['evaporate', 'liquid', 'gas']]
+
+
+def test_bound_store():
+    models = [Matter() for _ in range(5)]
+    machine = Machine(model=models, states=states, transitions=transitions, initial='solid', state_store=True)
+    assert all('state' not in vars(m) for m in models)
+    models[0].melt()
+    models[1].melt()
+    models[1].evaporate()
+    machine.set_state('liquid', models[2])
+    assert machine.count_states() == {'solid': 2, 'liquid': 2, 'gas': 1}
+    assert machine.models_in('liquid') == [models[0], models[2]]
+    assert list(machine.snapshot()) == [1, 2, 1, 0, 0]
+    try:
+        models[3].state = 'plasma'
+        assert False, 'plasma is not a state'
+    except ValueError:
+        pass
+
+    machine.remove_model(models[1])
+    assert models[1].state == 'gas' and type(models[1]) is Matter
+    assert list(machine.snapshot()) == [1, -1, 1, 0, 0]
+    late = Matter()
+    machine.add_model(late, initial='gas')
+    assert list(machine.snapshot()) == [1, 2, 1, 0, 0]
+    assert machine.models_in('gas') == [late]
+
+    restored = pickle.loads(pickle.dumps(machine))
+    assert restored.count_states() == {'solid': 2, 'liquid': 2, 'gas': 1}
+    assert restored.models_in('gas')[0].state == 'gas'
+
+
+def test_detached_store():
+    models = [Matter() for _ in range(3)]
+    machine = Machine(model=models, states=states, transitions=transitions, initial='solid')
+    models[0].melt()
+    store = StateStore(machine)
+    assert store.counts() == {'solid': 2, 'liquid': 1, 'gas': 0}
+    assert store.dispatch('melt', [1, 2]).tolist() == [True, True]
+    assert [m.state for m in models] == ['liquid'] * 3
+    assert StateStore(machine, models[:1]).find('liquid') == [models[0]]
+    try:
+        machine.count_states()
+        assert False, 'the machine has no store of its own'
+    except MachineError:
+        pass
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
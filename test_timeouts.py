@@ -0,0 +1,74 @@
+import time
+
+from Core.LockedMachine import LockedMachine
+from Core.Machine import Machine
+from Core.Scheduler import Scheduler
+
+
+class User(object):
+    pass
+
+
+timed = ['idle', {'name': 'active', 'timeout': 0.05, 'on_timeout': 'expire'}, 'expired']
+timed_transitions = [['login', 'idle', 'active'], ['expire', 'active', 'expired'],
+                     ['logout', 'active', 'idle'], ['touch', 'active', 'active']]
+
+
+def test_timeouts():
+    machine = Machine(states=timed, transitions=timed_transitions, initial='idle')
+    assert machine.scheduler.driver == 'manual'
+    try:
+        Scheduler(machine, 'thread')
+        assert False, 'the thread driver requires a LockedMachine'
+    except ValueError:
+        pass
+
+    users = [User() for _ in range(4)]
+    machine.add_model(users)
+    for user in users:
+        user.login()
+    users[1].logout()
+    machine.set_state('idle', users[2])
+    assert len(machine.scheduler) == 2
+    assert machine.scheduler.run_pending(time.monotonic()) == 0
+    assert machine.scheduler.run_pending(time.monotonic() + 1) == 2
+    assert [u.state for u in users] == ['expired', 'idle', 'idle', 'expired']
+
+    model = User()
+    locked = LockedMachine(model=model, states=timed, transitions=timed_transitions, initial='idle')
+    try:
+        model.login()
+        time.sleep(0.03)
+        model.touch()
+        time.sleep(0.03)
+        assert model.state == 'active'
+        deadline = time.monotonic() + 2
+        while model.state != 'expired' and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert model.state == 'expired'
+    finally:
+        locked.scheduler.close()
+
+
+def test_reentering_restarts_the_timeout():
+    now = [0.0]
+    user = User()
+    machine = Machine(model=user, states=timed, transitions=timed_transitions, initial='idle')
+    machine.scheduler.clock = lambda: now[0]
+    user.login()
+    now[0] = 0.04
+    user.logout()
+    user.login()
+    # the first deadline passed, but the model entered the state again since
+    assert machine.scheduler.run_pending(0.06) == 0 and user.state == 'active'
+    assert machine.scheduler.run_pending(0.1) == 1 and user.state == 'expired'
+    machine.set_state('active', user)
+    assert len(machine.scheduler) == 1
+    assert machine.scheduler.run_pending(0.2) == 1 and user.state == 'expired'
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')
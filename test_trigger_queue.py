@@ -0,0 +1,114 @@
+import threading
+import time
+
+from Core.Machine import Machine, MachineError
+from Core.TriggerQueue import TriggerQueue
+
+
+class Matter(object):
+    def __init__(self, id):
+        self.id = id
+        self.log = []
+
+    def on_enter_liquid(self, *args, **kwargs):
+        self.log.append(('liquid', args, kwargs))
+
+
+states = ['solid', 'liquid', 'gas']
+transitions = [['melt', 'solid', 'liquid'], ['evaporate', 'liquid', 'gas'], ['condense', 'gas', 'liquid']]
+
+
+def machine(count):
+    return Machine(model=[Matter(i) for i in range(count)], states=states, transitions=transitions, initial='solid')
+
+
+def test_drain_keeps_model_order():
+    m = machine(3)
+    a, b, c = m.models
+    queue = TriggerQueue(m, batch=4)
+    queue.put_many([(a, 'melt'), (b, 'melt'), (a, 'evaporate'), (a, 'condense', [1]), (b, 'evaporate'),
+                    (c, 'melt', (), {'heat': True})])
+    queue.put(c, 'evaporate')
+    assert len(queue) == 7
+    assert queue.drain(limit=5) == 5 and len(queue) == 2
+    assert queue.drain() == 2 and queue.processed == 7
+    assert [x.state for x in (a, b, c)] == ['liquid', 'gas', 'gas']
+    assert a.log == [('liquid', (), {}), ('liquid', (1,), {})] and c.log == [('liquid', (), {'heat': True})]
+
+
+def test_errors_fail_only_their_item():
+    m = machine(2)
+    a, b = m.models
+    queue = TriggerQueue(m)
+    queue.put_many([(a, 'evaporate'), (b, 'melt'), (a, 'boil'), (a, 'melt')])
+    assert queue.drain() == 4
+    assert a.state == b.state == 'liquid'
+    assert queue.failed == 2 and [(model, trigger) for model, trigger, _ in queue.errors] == [(a, 'evaporate'),
+                                                                                                (a, 'boil')]
+    assert all(isinstance(error, MachineError) for _, _, error in queue.errors)
+
+    seen = []
+    queue = TriggerQueue(m, on_error=lambda model, trigger, error: seen.append(trigger))
+    queue.put(b, 'melt')
+    queue.drain()
+    assert seen == ['melt'] and len(queue.errors) == 0
+
+
+def test_overflow_policies():
+    m = machine(1)
+    model = m.models[0]
+    items = [(model, 'melt')] * 3
+    queue = TriggerQueue(m, capacity=2, policy='reject')
+    try:
+        queue.put_many(items)
+        assert False, 'the queue is full'
+    except MachineError:
+        assert len(queue) == 0
+
+    queue = TriggerQueue(m, capacity=2, policy='drop_new')
+    assert queue.put_many([(model, 'melt'), (model, 'evaporate'), (model, 'condense')]) == 2
+    assert queue.dropped == 1 and [item[1] for item in queue._items] == ['melt', 'evaporate']
+
+    queue = TriggerQueue(m, capacity=2, policy='drop_old')
+    queue.put(model, 'melt')
+    assert queue.put_many([(model, 'evaporate'), (model, 'condense')]) == 2
+    assert queue.dropped == 1 and [item[1] for item in queue._items] == ['evaporate', 'condense']
+
+    queue = TriggerQueue(m, capacity=1, policy='block', timeout=0.01)
+    queue.put(model, 'melt')
+    try:
+        queue.put(model, 'evaporate')
+        assert False, 'nobody drains'
+    except MachineError:
+        pass
+
+    try:
+        TriggerQueue(m, policy='grow')
+        assert False, 'grow is no policy'
+    except ValueError:
+        pass
+
+
+def test_blocked_producer_and_background_drain():
+    m = machine(50)
+    queue = TriggerQueue(m, capacity=8, policy='block', timeout=5, batch=4)
+    queue.start()
+    producers = [threading.Thread(target=queue.put_many, args=([(model, 'melt'), (model, 'evaporate')],))
+                 for model in m.models]
+    for producer in producers:
+        producer.start()
+    for producer in producers:
+        producer.join()
+    deadline = time.monotonic() + 5
+    while queue.processed < 100 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    queue.stop()
+    assert queue.processed == 100 and queue.failed == 0
+    assert all(model.state == 'gas' for model in m.models)
+
+
+if __name__ == '__main__':
+    for name, test in sorted(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(name, 'ok')